@@ -1,6 +1,7 @@
 from django.contrib import admin
 # из файла models импортируем модель Post
 from .models import Post, Group
+from . import search
 
 class PostAdmin(admin.ModelAdmin):
     # перечисляем поля, которые должны отображаться в админке
@@ -11,6 +12,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ("pub_date",) 
     empty_value_display = '-пусто-' # это свойство сработает для всех колонок: где пусто - там будет эта строка
 
+    def get_search_results(self, request, queryset, search_term):
+        # ищем по полнотекстовому индексу (posts/search.py), а не LIKE по всей таблице
+        if not search.available():
+            return super().get_search_results(request, queryset, search_term)
+        return search.filter_queryset(queryset, search_term), False
+
 class GroupAdmin(admin.ModelAdmin):
     list_display = ("title", "slug", "description",)
     search_fields = ("title",)
@@ -0,0 +1,267 @@
+"""
+JSON API только для чтения: те же данные, что на страницах posts/views.py.
+
+Списки постов листаются курсорами (?after=/?before=, ?limit=), поля можно
+выбрать параметром ?fields=id,author,pub_date. Каждый пост сериализуется
+заранее - по полю - и лежит в кеше под ключом с id и версией поста, так
+что на запрос списка базе достаётся только выборка id/версий страницы,
+а ответ собирается из готовых кусков JSON и отдаётся потоком. Версию
+сдвигают и правки самого поста, и смена имени автора или названия группы
+(counters.touch_posts в posts/signals.py).
+"""
+import functools
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from yatube.db_router import read_from_replica
+
+from .conditional import add_validators, not_modified, validators
+from .models import Comment, Follow, Group, Post, User
+from .pagination import CursorPaginator
+from .timeline import TIMELINE_ORDERING, timeline_posts
+
+POST_FIELDS = ("id", "text", "pub_date", "author", "group", "image", "comment_count", "url")
+COMMENT_FIELDS = ("id", "text", "created", "author")
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def api_view(view):
+    """Ошибки ApiError превращает в JSON-ответ; страницы API только читают."""
+    @read_from_replica
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({"detail": error.detail}, status=error.status)
+    return wrapper
+
+
+def get_or_404(queryset, **lookup):
+    try:
+        return queryset.get(**lookup)
+    except queryset.model.DoesNotExist:
+        raise ApiError(404, "Не найдено.")
+
+
+def cache_timeout():
+    return getattr(settings, "API_POST_CACHE_TIMEOUT", 86400)
+
+
+def requested_fields(request, available):
+    raw = request.GET.get("fields")
+    if not raw:
+        return available
+    fields = tuple(name.strip() for name in raw.split(",") if name.strip())
+    unknown = sorted(set(fields) - set(available))
+    if unknown:
+        raise ApiError(400, "Неизвестные поля: %s. Доступны: %s." % (", ".join(unknown), ", ".join(available)))
+    return fields
+
+
+def requested_limit(request):
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError(400, "limit должен быть числом.")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+# сериализация
+
+
+def author_data(user):
+    return {"username": user.username, "full_name": user.get_full_name()}
+
+
+def post_data(post):
+    image = None
+    if post.image:
+        image = {"url": post.image.url, "width": post.image_width, "height": post.image_height}
+    return {
+        "id": post.pk,
+        "text": post.text,
+        "pub_date": post.pub_date,
+        "author": author_data(post.author),
+        "group": {"slug": post.group.slug, "title": post.group.title} if post.group_id else None,
+        "image": image,
+        "comment_count": post.comment_count,
+        "url": reverse("post", args=[post.author.username, post.pk]),
+    }
+
+
+def encode_fields(data):
+    """{"поле": '"поле":значение'} - готовые куски JSON для сборки объекта."""
+    return {name: encoder.encode(name) + ":" + encoder.encode(value) for name, value in data.items()}
+
+
+def join_fields(fragments, fields):
+    return "{" + ",".join(fragments[name] for name in fields) + "}"
+
+
+def post_cache_key(post_id, version):
+    return "api_post:%s:%s" % (post_id, version)
+
+
+def encoded_posts(posts):
+    """
+    Куски JSON для постов страницы. posts - лёгкие объекты (id и версия),
+    недостающие в кеше посты дочитываются из базы одним запросом.
+    """
+    keys = {post.pk: post_cache_key(post.pk, post.version) for post in posts}
+    cached = cache.get_many(keys.values())
+    missing = [pk for pk, key in keys.items() if key not in cached]
+    if missing:
+        fresh = {}
+        for post in Post.objects.select_related("author", "group").filter(pk__in=missing):
+            # версия могла вырасти между запросами - кладём под ту, что прочитали сейчас
+            fragments = encode_fields(post_data(post))
+            fresh[post_cache_key(post.pk, post.version)] = fragments
+            cached[keys[post.pk]] = fragments
+        cache.set_many(fresh, cache_timeout())
+    return [cached[keys[post.pk]] for post in posts if keys[post.pk] in cached]
+
+
+def page_links(request, paginator, page):
+    def link(**cursor):
+        params = {key: value for key, value in request.GET.items() if key not in ("after", "before")}
+        params.update(cursor)
+        return request.build_absolute_uri(request.path + "?" + urlencode(params))
+    next_link = link(after=page.next_cursor) if page.next_cursor else None
+    previous_link = link(before=page.previous_cursor) if page.previous_cursor else None
+    return next_link, previous_link
+
+
+def stream_list(items, fields, next_link, previous_link):
+    """
+    Отдаёт {"results": [...], "next": ..., "previous": ...} по кускам:
+    объекты собираются из готовых полей по мере отправки.
+    """
+    yield b'{"results":['
+    for index, fragments in enumerate(items):
+        yield (("," if index else "") + join_fields(fragments, fields)).encode()
+    yield ('],"next":%s,"previous":%s}' % (encoder.encode(next_link), encoder.encode(previous_link))).encode()
+
+
+def posts_response(request, queryset, *parts, ordering=("-pub_date", "-id")):
+    fields = requested_fields(request, POST_FIELDS)
+    limit = requested_limit(request)
+    # для страницы нужны только ключ сортировки и версия, остальное - из кеша
+    queryset = queryset.only("id", "pub_date", "version", "updated")
+    paginator = CursorPaginator(queryset, limit, ordering)
+    page = paginator.page(after=request.GET.get("after"), before=request.GET.get("before"))
+    etag, last_modified = validators(request, page, *parts)
+    response = not_modified(request, etag, last_modified)
+    if response is None:
+        next_link, previous_link = page_links(request, paginator, page)
+        response = StreamingHttpResponse(
+            stream_list(encoded_posts(page.object_list), fields, next_link, previous_link),
+            content_type="application/json",
+        )
+    return add_validators(response, etag, last_modified)
+
+
+def json_response(data):
+    return HttpResponse(encoder.encode(data), content_type="application/json")
+
+
+# представления
+
+
+@api_view
+def post_list(request):
+    """Все посты, как на главной."""
+    return posts_response(request, Post.objects.all())
+
+
+@api_view
+def post_detail(request, post_id):
+    fields = requested_fields(request, POST_FIELDS)
+    post = get_or_404(Post.objects.only("id", "version", "updated"), pk=post_id)
+    etag, last_modified = validators(request, [post])
+    response = not_modified(request, etag, last_modified)
+    if response is None:
+        items = encoded_posts([post])
+        if not items:
+            raise ApiError(404, "Не найдено.")
+        response = HttpResponse(join_fields(items[0], fields), content_type="application/json")
+    return add_validators(response, etag, last_modified)
+
+
+@api_view
+def post_comments(request, post_id):
+    fields = requested_fields(request, COMMENT_FIELDS)
+    get_or_404(Post.objects.only("id"), pk=post_id)
+    paginator = CursorPaginator(
+        Comment.objects.select_related("author").filter(post_id=post_id), requested_limit(request),
+        ordering=("created", "id"),
+    )
+    page = paginator.page(after=request.GET.get("after"), before=request.GET.get("before"))
+    items = (
+        encode_fields({
+            "id": comment.pk, "text": comment.text, "created": comment.created,
+            "author": author_data(comment.author),
+        })
+        for comment in page
+    )
+    next_link, previous_link = page_links(request, paginator, page)
+    return StreamingHttpResponse(stream_list(items, fields, next_link, previous_link),
+                                 content_type="application/json")
+
+
+@api_view
+def group_list(request):
+    groups = Group.objects.order_by("title").values("slug", "title", "description")
+    return json_response({"results": list(groups)})
+
+
+@api_view
+def group_detail(request, slug):
+    group = get_or_404(Group.objects.all(), slug=slug)
+    return json_response({"slug": group.slug, "title": group.title, "description": group.description})
+
+
+@api_view
+def group_posts(request, slug):
+    group = get_or_404(Group.objects.all(), slug=slug)
+    return posts_response(request, Post.objects.filter(group=group), group.title, group.description)
+
+
+@api_view
+def profile_detail(request, username):
+    author = get_or_404(User.objects.select_related("stats"), username=username)
+    data = dict(author_data(author), posts_count=author.stats.posts_count,
+                followers_count=author.stats.followers_count, following_count=author.stats.following_count)
+    if request.user.is_authenticated:
+        data["following"] = Follow.objects.filter(user=request.user, author=author).exists()
+    return json_response(data)
+
+
+@api_view
+def profile_posts(request, username):
+    author = get_or_404(User.objects.all(), username=username)
+    return posts_response(request, Post.objects.filter(author=author), author.get_full_name())
+
+
+@api_view
+def follow_feed(request):
+    """Лента подписок текущего пользователя."""
+    if not request.user.is_authenticated:
+        raise ApiError(401, "Нужно войти.")
+    return posts_response(request, timeline_posts(request.user), ordering=TIMELINE_ORDERING)
@@ -0,0 +1,215 @@
+"""
+Замер страниц из posts/urls.py через тестовый клиент Django.
+
+Для каждой страницы считаются задержка (p50, p99, среднее), число
+SQL-запросов и размер ответа. Результат можно сохранить в JSON и потом
+сравнить с ним следующий прогон (manage.py benchmark --baseline).
+Данные для замера удобно создать командой manage.py seed_data.
+
+render_feed() отдельно мерит отрисовку ленты index.html без запросов к
+базе: сколько миллисекунд добавляет каждый пост на странице
+(manage.py benchmark_render).
+"""
+import json
+import math
+import time
+
+from django.db import connection
+from django.template import engines
+from django.template.loader import render_to_string
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from . import urls as posts_urls
+from .models import Group, Post, User, UserStats
+from .pagination import PAGE_SIZE, paginate
+
+# строка запроса для страниц, которым без неё нечего показать
+QUERY_STRINGS = {
+    "search": lambda sample: "?q=" + sample["post"].text.split()[0],
+}
+
+# страницы, которые пишут в базу (подписка на GET, формы публикации): повторные
+# запросы меняли бы данные и упирались в ограничение частоты записей
+WRITE_VIEWS = {"new_post", "post_edit", "add_comment", "profile_follow", "profile_unfollow"}
+
+METRICS = ("p50", "p99", "mean", "queries", "bytes")
+RENDER_METRICS = ("p50", "p99", "per_post")
+
+NO_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+def percentile(values, fraction):
+    """Перцентиль по ближайшему рангу: percentile(values, 0.99)."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered), max(1, math.ceil(fraction * len(ordered)))) - 1
+    return ordered[index]
+
+
+def sample_data(username=None):
+    """
+    Выбирает, кем и на чём мерить: самого активного читателя ленты,
+    свежий пост с комментариями и группу.
+    """
+    if username:
+        user = User.objects.get(username=username)
+    else:
+        stats = UserStats.objects.select_related("user").order_by("-following_count").first()
+        user = stats.user if stats else User.objects.order_by("pk").first()
+    if user is None:
+        raise ValueError("В базе нет пользователей - заполните её командой seed_data")
+    post = (
+        Post.objects.select_related("author").filter(comment_count__gt=0).order_by("-pk").first()
+        or Post.objects.select_related("author").order_by("-pk").first()
+    )
+    if post is None:
+        raise ValueError("В базе нет постов - заполните её командой seed_data")
+    return {"user": user, "post": post, "group": Group.objects.order_by("pk").first()}
+
+
+def url_for(name, pattern, sample):
+    """Адрес страницы на выбранных данных или None, если данных для неё нет."""
+    post = sample["post"]
+    if "slug" in pattern.pattern.converters and sample["group"] is None:
+        return None
+    values = {
+        "slug": sample["group"] and sample["group"].slug,
+        "username": post.author.username,
+        "post_id": post.pk,
+    }
+    kwargs = {key: values[key] for key in pattern.pattern.converters}
+    query = QUERY_STRINGS.get(name)
+    return reverse(name, kwargs=kwargs) + (query(sample) if query else "")
+
+
+def measure(client, url, repeat, warmup):
+    for _ in range(warmup):
+        client.get(url)
+    timings, queries, size, status = [], 0, 0, None
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url)
+            if response.streaming:
+                size = sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                size = len(response.content)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = len(captured.captured_queries)
+        status = response.status_code
+    return {
+        "url": url,
+        "status": status,
+        "p50": percentile(timings, 0.5),
+        "p99": percentile(timings, 0.99),
+        "mean": sum(timings) / len(timings),
+        "queries": queries,
+        "bytes": size,
+    }
+
+
+def run(names=None, repeat=50, warmup=5, username=None):
+    """Замеряет страницы posts/urls.py, кроме WRITE_VIEWS, возвращает {имя: метрики}."""
+    sample = sample_data(username)
+    client = Client()
+    client.force_login(sample["user"])
+    results = {}
+    for pattern in posts_urls.urlpatterns:
+        if pattern.name in WRITE_VIEWS or (names and pattern.name not in names):
+            continue
+        url = url_for(pattern.name, pattern, sample)
+        if url is None:
+            continue
+        results[pattern.name] = measure(client, url, repeat, warmup)
+    return results
+
+
+def timed(function, repeat, warmup):
+    for _ in range(warmup):
+        function()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def render_feed(per_page=PAGE_SIZE, repeat=50, warmup=5, username=None):
+    """
+    Замеряет отрисовку index.html на per_page постах, возвращает {режим: метрики}:
+    cached - как на сайте, с кешем фрагментов post_item; uncached - каждый
+    пост отрисовывается заново; compile - разбор post_item.html без
+    кеширующего загрузчика (раз на страницу, per_post - в пересчёте на пост).
+    """
+    sample = sample_data(username)
+    request = RequestFactory().get("/")
+    request.user = sample["user"]
+
+    def page_of(queryset):
+        paginator, page = paginate(request, queryset, per_page)
+        # посты читаются один раз, дальше мерится только шаблон
+        list(page)
+        return {"page": page, "paginator": paginator}
+
+    full = page_of(Post.objects.select_related("author", "group"))
+    empty = page_of(Post.objects.none())
+    count = len(full["page"])
+
+    def render(context):
+        return lambda: render_to_string("index.html", context, request=request)
+
+    results = {}
+    for mode, overrides in (("cached", {}), ("uncached", {"CACHES": NO_CACHE})):
+        with override_settings(**overrides):
+            timings = timed(render(full), repeat, warmup)
+            base = percentile(timed(render(empty), repeat, warmup), 0.5)
+        p50 = percentile(timings, 0.5)
+        results[mode] = {
+            "posts": count,
+            "p50": p50,
+            "p99": percentile(timings, 0.99),
+            "per_post": (p50 - base) / count if count else 0.0,
+        }
+
+    engine = engines["django"].engine
+    source = engine.find_template("post_item.html")[0].source
+    timings = timed(lambda: engine.from_string(source), repeat, warmup)
+    results["compile"] = {
+        "posts": count,
+        "p50": percentile(timings, 0.5),
+        "p99": percentile(timings, 0.99),
+        "per_post": percentile(timings, 0.5) / count if count else 0.0,
+    }
+    return results
+
+
+def compare(results, baseline, metrics=METRICS):
+    """
+    Сравнивает прогон с сохранённым: {имя: {метрика: (было, стало, изменение в %)}}.
+    Страницы, которых нет в одном из прогонов, пропускаются.
+    """
+    report = {}
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        report[name] = {}
+        for metric in metrics:
+            old, new = before.get(metric, 0), current[metric]
+            change = (new - old) * 100 / old if old else 0.0
+            report[name][metric] = (old, new, change)
+    return report
+
+
+def save(results, path):
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2, ensure_ascii=False, sort_keys=True)
+
+
+def load(path):
+    with open(path) as file:
+        return json.load(file)
@@ -0,0 +1,47 @@
+"""
+Условные GET-запросы (ETag / Last-Modified) для лент и страницы поста.
+
+Валидаторы считаются по уже выбранной странице постов, поэтому на 304
+тратится только запрос самой страницы, а шаблон не отрисовывается.
+
+Last-Modified отдаётся только для страницы одного поста без остального
+содержимого: у списков меняется состав (удалённый пост сдвигает страницу,
+а максимум дат изменения может даже уменьшиться), а счётчики, подписки,
+подсказки и пользователь в дату поста не попадают. Клиент, приславший
+только If-Modified-Since, получил бы 304 на изменившуюся страницу; там
+проверка идёт только по ETag.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def validators(request, posts, *parts):
+    """
+    Возвращает (etag, last_modified) для страницы с постами posts.
+    parts - всё остальное, что видно на странице (группа, счётчики и т.п.).
+    last_modified - None, если страница не определяется одним постом.
+    """
+    posts = list(posts)
+    user = request.user
+    key = [user.pk if user.is_authenticated else None, request.get_full_path()]
+    key.extend((post.pk, post.version) for post in posts)
+    key.extend(parts)
+    etag = 'W/"%s"' % hashlib.md5(repr(key).encode()).hexdigest()
+    last_modified = None
+    if len(posts) == 1 and not parts:
+        last_modified = int(max(post.updated for post in posts).timestamp())
+    return etag, last_modified
+
+
+def not_modified(request, etag, last_modified):
+    """Ответ 304, если у клиента актуальная версия страницы, иначе None."""
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def add_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    return response
@@ -0,0 +1,63 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def change_user_stats(user_id, **deltas):
+    """Сдвигает счётчики пользователя: change_user_stats(1, posts_count=1)."""
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        version=F("version") + 1, **{name: F(name) + delta for name, delta in deltas.items()}
+    )
+    # строки ещё нет (пользователь появился до счётчиков) - считаем честно.
+    # При уменьшении не пересчитываем: строку мог удалить каскад вместе с
+    # пользователем, и новая строка сорвала бы удаление; пересчитает
+    # следующее увеличение или manage.py recount_stats
+    if not updated and all(delta > 0 for delta in deltas.values()):
+        recount(User.objects.filter(pk=user_id))
+
+
+def touch_user_stats(user_id):
+    """Сбрасывает закешированный блок автора, не меняя счётчиков."""
+    UserStats.objects.filter(user_id=user_id).update(version=F("version") + 1)
+
+
+def change_comment_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=F("comment_count") + delta, version=F("version") + 1, updated=timezone.now()
+    )
+
+
+def touch_posts(**lookups):
+    """
+    Сбрасывает закешированные фрагменты постов, не меняя их самих:
+    touch_posts(author_id=1) после смены имени автора.
+    """
+    Post.objects.filter(**lookups).update(version=F("version") + 1, updated=timezone.now())
+
+
+def _count(queryset, field):
+    subquery = queryset.filter(**{field: OuterRef("pk")}).order_by().values(field)
+    return Coalesce(Subquery(subquery.annotate(n=Count("pk")).values("n")), Value(0))
+
+
+def recount(users=None):
+    """Пересчитывает счётчики с нуля для пользователей и их постов."""
+    if users is None:
+        users = User.objects.all()
+    users = users.annotate(
+        n_posts=_count(Post.objects.all(), "author"),
+        n_followers=_count(Follow.objects.all(), "author"),
+        n_following=_count(Follow.objects.all(), "user"),
+    )
+    for user in users.iterator():
+        UserStats.objects.update_or_create(user_id=user.pk, defaults={
+            "posts_count": user.n_posts,
+            "followers_count": user.n_followers,
+            "following_count": user.n_following,
+        })
+        touch_user_stats(user.pk)
+        Post.objects.filter(author_id=user.pk).update(
+            comment_count=_count(Comment.objects.all(), "post")
+        )
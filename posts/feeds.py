@@ -0,0 +1,201 @@
+"""
+Ленты RSS и Atom: все посты, посты группы и посты автора.
+
+Каждая лента строится из последних settings.FEED_SIZE постов одним
+запросом. Готовый XML лежит в кеше под версией области (вся лента,
+группа, автор); версия - время последнего изменения поста в области,
+её сдвигает сигнал при публикации, правке и удалении поста, а также
+при смене имени автора или названия группы (posts/signals.py). Из неё строится ETag, поэтому опрос ленты без
+изменений отвечает 304, не читая посты. Last-Modified не отдаётся: дата
+с точностью до секунды не отличает правку, сделанную в ту же секунду.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+
+from .conditional import add_validators, not_modified
+from .models import Group, Post, User
+
+
+def feed_size():
+    return getattr(settings, "FEED_SIZE", 20)
+
+
+def cache_timeout():
+    return getattr(settings, "FEED_CACHE_TIMEOUT", 86400)
+
+
+def version_key(scope):
+    return "feed_version:%s" % scope
+
+
+def scopes_of(post):
+    """
+    Области лент, в которые попадает пост. Только по id: при удалении
+    группы или автора каскадом их строк в базе уже нет.
+    """
+    scopes = ["all", "author:%s" % post.author_id]
+    if post.group_id:
+        scopes.append("group:%s" % post.group_id)
+    return scopes
+
+
+def touch_scopes(scopes):
+    now = time.time()
+    cache.set_many({version_key(scope): now for scope in scopes}, None)
+
+
+def touch(post):
+    """Сбрасывает закешированные ленты, в которые попадает пост."""
+    touch_scopes(scopes_of(post))
+
+
+def touch_author(author_id):
+    """Имя автора видно в общей ленте, в его ленте и в лентах групп, где он пишет."""
+    groups = Post.objects.filter(author_id=author_id, group__isnull=False).values_list("group_id", flat=True)
+    touch_scopes(["all", "author:%s" % author_id, *("group:%s" % group_id for group_id in groups.distinct())])
+
+
+def touch_group(group_id):
+    """Название группы - категория её постов в общей ленте и в лентах их авторов."""
+    authors = Post.objects.filter(group_id=group_id).values_list("author_id", flat=True)
+    touch_scopes(["all", "group:%s" % group_id, *("author:%s" % author_id for author_id in authors.distinct())])
+
+
+def scope_version(scope):
+    version = cache.get(version_key(scope))
+    if version is None:
+        # версия вытеснена из кеша - считаем, что лента изменилась сейчас
+        version = time.time()
+        cache.add(version_key(scope), version, None)
+    return version
+
+
+class PostsFeed(Feed):
+    title = "Yatube: последние записи"
+    description = "Новые записи на Yatube"
+    description_template = None
+
+    def link(self, obj):
+        return reverse("index")
+
+    def posts(self, obj):
+        return Post.objects.all()
+
+    def items(self, obj):
+        return self.posts(obj).select_related("author", "group").order_by("-pub_date", "-id")[:feed_size()]
+
+    def item_title(self, post):
+        return Truncator(post.text).words(8)
+
+    def item_description(self, post):
+        return post.text
+
+    def item_link(self, post):
+        return reverse("post", args=[post.author.username, post.pk])
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_updateddate(self, post):
+        return post.updated
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_author_link(self, post):
+        return reverse("profile", args=[post.author.username])
+
+    def item_categories(self, post):
+        return [post.group.title] if post.group_id else []
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, group):
+        return group
+
+    def title(self, group):
+        return "Yatube: %s" % group.title
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse("group", args=[group.slug])
+
+    def posts(self, group):
+        return Post.objects.filter(group=group)
+
+
+class AuthorFeed(PostsFeed):
+    def get_object(self, request, author):
+        return author
+
+    def title(self, author):
+        return "Yatube: записи %s" % (author.get_full_name() or author.username)
+
+    def description(self, author):
+        return "Новые записи автора %s" % author.username
+
+    def link(self, author):
+        return reverse("profile", args=[author.username])
+
+    def posts(self, author):
+        return Post.objects.filter(author=author)
+
+
+def atom(feed_class):
+    return type("Atom" + feed_class.__name__, (feed_class,), {"feed_type": Atom1Feed, "subtitle": feed_class.description})
+
+
+FEEDS = {
+    "all": PostsFeed,
+    "group": GroupFeed,
+    "author": AuthorFeed,
+}
+
+
+def serve(request, kind, fmt, obj=None):
+    """
+    Отдаёт ленту из кеша или строит её заново. obj - уже найденные группа
+    или автор: версия заводится только для существующих областей.
+    """
+    scope = kind if obj is None else "%s:%s" % (kind, obj.pk)
+    version = scope_version(scope)
+    etag = 'W/"%s"' % hashlib.md5(("%s:%s:%r" % (fmt, scope, version)).encode()).hexdigest()
+    response = not_modified(request, etag, None)
+    if response is not None:
+        return add_validators(response, etag, None)
+
+    body_key = "feed:%s:%s:%r" % (fmt, hashlib.md5(scope.encode()).hexdigest(), version)
+    cached = cache.get(body_key)
+    if cached is not None:
+        content, content_type = cached
+        response = HttpResponse(content, content_type=content_type)
+    else:
+        feed_class = FEEDS[kind] if fmt == "rss" else atom(FEEDS[kind])
+        response = feed_class()(request, **({} if obj is None else {kind: obj}))
+        # Feed ставит Last-Modified по последнему посту - он не покрывает удаления и переименования
+        del response["Last-Modified"]
+        cache.set(body_key, (response.content, response["Content-Type"]), cache_timeout())
+    return add_validators(response, etag, None)
+
+
+def index_feed(request, fmt):
+    return serve(request, "all", fmt)
+
+
+def group_feed(request, slug, fmt):
+    return serve(request, "group", fmt, get_object_or_404(Group, slug=slug))
+
+
+def author_feed(request, username, fmt):
+    return serve(request, "author", fmt, get_object_or_404(User, username=username))
@@ -1,11 +1,27 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from .models import Post
+from .images import process_upload
 
 class PostForm(forms.ModelForm):
         class Meta:
                 model = Post
                 fields = ["group", "text", "image"]
 
+        def clean_image(self):
+                # новую картинку уменьшаем и чистим от метаданных, её размеры храним в посте
+                image = self.cleaned_data.get("image")
+                if isinstance(image, UploadedFile):
+                        processed = process_upload(image)
+                        self.instance.image_width = processed.width
+                        self.instance.image_height = processed.height
+                        self.instance.image_format = processed.format
+                        return processed.file
+                if not image:
+                        self.instance.image_width = self.instance.image_height = None
+                        self.instance.image_format = ""
+                return image
+
 class CommentForm(forms.ModelForm):
         class Meta:
                 model = Post
@@ -0,0 +1,90 @@
+"""
+Обработка загруженных картинок постов до сохранения.
+
+Картинка уменьшается прямо при декодировании (draft для JPEG), поэтому
+большие фото с телефона не раскладываются в памяти целиком. Метаданные
+(EXIF и т.п.) выбрасываются, а размеры и формат запоминаются в Post,
+чтобы при показе не открывать исходный файл.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# форматы, которые сохраняем как есть; остальное перекодируем в JPEG
+KEEP_FORMATS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+
+
+class ProcessedImage:
+    def __init__(self, file, width, height, format):
+        self.file = file
+        self.width = width
+        self.height = height
+        self.format = format
+
+
+def max_side():
+    return getattr(settings, "POST_IMAGE_MAX_SIDE", 2560)
+
+
+def max_pixels():
+    return getattr(settings, "POST_IMAGE_MAX_PIXELS", 50 * 1000 * 1000)
+
+
+def max_icc_size():
+    return getattr(settings, "POST_IMAGE_MAX_ICC_SIZE", 64 * 1024)
+
+
+def process_upload(upload):
+    """Уменьшает картинку, убирает метаданные и возвращает ProcessedImage."""
+    try:
+        return _process(upload)
+    except (OSError, Image.DecompressionBombError, ValueError) as error:
+        # обрезанный файл проходит проверку ImageField (она читает только
+        # заголовок) и ломается лишь при декодировании
+        raise ValidationError(
+            "Не удалось прочитать картинку: файл повреждён или обрезан.", code="broken_image",
+        ) from error
+
+
+def _process(upload):
+    upload.seek(0)
+    image = Image.open(upload)  # читает только заголовок
+    width, height = image.size
+    if width * height > max_pixels():
+        raise ValidationError(
+            "Слишком большая картинка: %(pixels)s пикселей, допустимо не больше %(limit)s.",
+            code="too_many_pixels",
+            params={"pixels": width * height, "limit": max_pixels()},
+        )
+
+    source_format = image.format
+    output_format = source_format if source_format in KEEP_FORMATS else "JPEG"
+    icc_profile = image.info.get("icc_profile")
+    exif = image.getexif()
+
+    limit = max_side()
+    # для JPEG декодер сразу уменьшает картинку в 2-8 раз (draft),
+    # полный размер в памяти не разворачивается
+    image.thumbnail((limit, limit), reducing_gap=2.0)
+    # поворот по EXIF применяем до того, как выбросить метаданные
+    if exif.get(0x0112, 1) != 1:
+        image.info["exif"] = exif.tobytes()
+        image = ImageOps.exif_transpose(image)
+
+    if output_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    options = {}
+    if icc_profile and len(icc_profile) <= max_icc_size():
+        options["icc_profile"] = icc_profile
+    if output_format == "JPEG":
+        options.update(quality=getattr(settings, "POST_IMAGE_QUALITY", 85), optimize=True)
+
+    buffer = BytesIO()
+    image.save(buffer, format=output_format, **options)
+    name = "%s.%s" % (os.path.splitext(os.path.basename(upload.name))[0], KEEP_FORMATS[output_format])
+    return ProcessedImage(ContentFile(buffer.getvalue(), name=name), image.width, image.height, output_format)
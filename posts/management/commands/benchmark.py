@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = "Замеряет задержку, число SQL-запросов и размер читающих страниц из posts/urls.py"
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help="только эти страницы (имена из posts/urls.py)")
+        parser.add_argument("--repeat", type=int, default=50, help="сколько раз запрашивать каждую страницу")
+        parser.add_argument("--warmup", type=int, default=5, help="сколько запросов не учитывать")
+        parser.add_argument("--user", help="от имени какого пользователя мерить")
+        parser.add_argument("--save", metavar="FILE", help="сохранить результат в JSON")
+        parser.add_argument("--baseline", metavar="FILE", help="сравнить с сохранённым результатом")
+        parser.add_argument("--max-regression", type=float, metavar="PERCENT",
+                            help="завершиться с ошибкой, если p50 или p99 выросли больше чем на столько процентов")
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("--repeat должен быть не меньше 1")
+        try:
+            results = benchmark.run(options["names"], options["repeat"], options["warmup"], options["user"])
+        except ValueError as error:
+            raise CommandError(error)
+
+        self.stdout.write(f"{'страница':<18} {'код':>4} {'p50, мс':>9} {'p99, мс':>9} {'запросов':>9} {'байт':>9}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<18} {result['status']:>4} {result['p50']:>9.2f} {result['p99']:>9.2f} "
+                f"{result['queries']:>9} {result['bytes']:>9}"
+            )
+        if options["save"]:
+            benchmark.save(results, options["save"])
+            self.stdout.write(f"Сохранено в {options['save']}")
+        if options["baseline"]:
+            self.report(benchmark.compare(results, benchmark.load(options["baseline"])), options["max_regression"])
+
+    def report(self, report, max_regression):
+        self.stdout.write("")
+        self.stdout.write("Изменения относительно базового прогона:")
+        regressions = []
+        for name, metrics in report.items():
+            changes = []
+            for metric, (old, new, change) in metrics.items():
+                changes.append(f"{metric} {old:g} -> {new:g} ({change:+.1f}%)")
+                if max_regression is not None and metric in ("p50", "p99") and change > max_regression:
+                    regressions.append(f"{name} {metric} {change:+.1f}%")
+            self.stdout.write(f"{name}: " + ", ".join(changes))
+        if regressions:
+            raise CommandError("Страницы стали медленнее: " + "; ".join(regressions))
@@ -0,0 +1,41 @@
+from django.core.management.base import CommandError
+
+from posts import benchmark
+from posts.pagination import PAGE_SIZE
+
+from .benchmark import Command as BenchmarkCommand
+
+
+class Command(BenchmarkCommand):
+    help = "Замеряет отрисовку ленты index.html: сколько стоит один пост на странице"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=PAGE_SIZE, help="сколько постов на странице")
+        parser.add_argument("--repeat", type=int, default=50, help="сколько раз отрисовывать страницу")
+        parser.add_argument("--warmup", type=int, default=5, help="сколько отрисовок не учитывать")
+        parser.add_argument("--user", help="от имени какого пользователя отрисовывать")
+        parser.add_argument("--save", metavar="FILE", help="сохранить результат в JSON")
+        parser.add_argument("--baseline", metavar="FILE", help="сравнить с сохранённым результатом")
+        parser.add_argument("--max-regression", type=float, metavar="PERCENT",
+                            help="завершиться с ошибкой, если p50 или p99 выросли больше чем на столько процентов")
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1 or options["posts"] < 1:
+            raise CommandError("--repeat и --posts должны быть не меньше 1")
+        try:
+            results = benchmark.render_feed(options["posts"], options["repeat"], options["warmup"], options["user"])
+        except ValueError as error:
+            raise CommandError(error)
+
+        self.stdout.write(f"{'режим':<10} {'постов':>7} {'p50, мс':>9} {'p99, мс':>9} {'на пост, мс':>12}")
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:<10} {result['posts']:>7} {result['p50']:>9.2f} {result['p99']:>9.2f} "
+                f"{result['per_post']:>12.3f}"
+            )
+        if options["save"]:
+            benchmark.save(results, options["save"])
+            self.stdout.write(f"Сохранено в {options['save']}")
+        if options["baseline"]:
+            report = benchmark.compare(results, benchmark.load(options["baseline"]), benchmark.RENDER_METRICS)
+            self.report(report, options["max_regression"])
@@ -0,0 +1,21 @@
+from concurrent.futures import wait
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = "Готовит превью всех размеров для картинок уже опубликованных постов"
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image="").exclude(image__isnull=True).only("id", "image")
+        futures = []
+        for post in posts.iterator():
+            futures.extend(thumbnails.schedule_all(post))
+        done, _ = wait(futures)
+        failed = sum(1 for future in done if future.exception() is not None)
+        self.stdout.write(self.style.SUCCESS(
+            f"Поставлено в работу превью: {len(futures)}, с ошибкой: {failed}"
+        ))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = "Перестраивает подсказки \"кого почитать\" по графу подписок (запускать периодически)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="пользователей в одной пачке расчёта и записи в кеш")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        users = suggestions.rebuild(batch_size=options["batch_size"])
+        backend = "NumPy" if suggestions.numpy is not None else "array"
+        self.stdout.write(self.style.SUCCESS(
+            f"Подсказки перестроены для {users} активных пользователей за {time.monotonic() - started:.1f} с ({backend})"
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает счётчики постов, комментариев и подписок"
+
+    def add_arguments(self, parser):
+        parser.add_argument("usernames", nargs="*", help="только для этих пользователей")
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options["usernames"]:
+            users = users.filter(username__in=options["usernames"])
+        recount(users)
+        self.stdout.write(self.style.SUCCESS(f"Пересчитано пользователей: {users.count()}"))
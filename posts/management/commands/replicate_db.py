@@ -0,0 +1,54 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# обычный SQLite и продакшен-профиль (yatube/sqlite_backend)
+SQLITE_ENGINES = ("django.db.backends.sqlite3", "yatube.sqlite_backend")
+
+
+def replicate(source, target):
+    """
+    Копирует базу SQLite через backup API (согласованный снимок, запись
+    в основную базу при этом не блокируется надолго) и подменяет файл
+    реплики целиком, чтобы читатели не увидели полускопированную базу.
+    """
+    temporary = target + ".tmp"
+    if os.path.exists(temporary):
+        os.remove(temporary)
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(temporary)
+    try:
+        src.backup(dst)
+        # у реплики не должно быть своего -wal файла, иначе подмена файла его потеряет
+        dst.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dst.close()
+        src.close()
+    os.replace(temporary, target)
+
+
+class Command(BaseCommand):
+    help = "Копирует основную базу SQLite в файл реплики (settings.REPLICA_DATABASE_PATH)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", help="куда копировать, по умолчанию REPLICA_DATABASE_PATH")
+        parser.add_argument("--interval", type=float, default=0,
+                            help="повторять каждые N секунд, 0 - скопировать один раз")
+
+    def handle(self, *args, **options):
+        source = settings.DATABASES["default"]
+        if source["ENGINE"] not in SQLITE_ENGINES:
+            raise CommandError("Команда копирует только базы SQLite")
+        target = options["target"] or getattr(settings, "REPLICA_DATABASE_PATH", None)
+        if not target:
+            raise CommandError("Не задан файл реплики: --target или переменная YATUBE_REPLICA_DB")
+        while True:
+            started = time.monotonic()
+            replicate(source["NAME"], target)
+            self.stdout.write(f"Реплика обновлена за {time.monotonic() - started:.2f} с: {target}")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
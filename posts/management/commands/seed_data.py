@@ -0,0 +1,181 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from posts import timeline
+from posts.counters import recount
+from posts.models import Comment, Follow, Group, Post, User
+
+WORDS = (
+    "лето зима город море кино книга музыка кофе утро вечер дорога друг работа код "
+    "питон django база запрос кеш лента пост автор группа фото горы лес река поезд "
+    "выходные погода новости проект релиз ошибка тест идея план отпуск кот собака"
+).split()
+
+
+@contextmanager
+def explicit_dates():
+    """Даёт задать даты постов и комментариев вручную (auto_now их перезаписывает)."""
+    fields = [
+        Post._meta.get_field("pub_date"),
+        Post._meta.get_field("updated"),
+        Comment._meta.get_field("created"),
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = "Заполняет базу синтетическими пользователями, группами, постами, комментариями и подписками"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--groups", type=int, default=20)
+        parser.add_argument("--posts", type=int, default=100000)
+        parser.add_argument("--comments", type=float, default=3,
+                            help="в среднем комментариев на пост")
+        parser.add_argument("--follows", type=float, default=20,
+                            help="в среднем подписок на пользователя")
+        parser.add_argument("--skew", type=float, default=1.1,
+                            help="показатель закона Ципфа для активности и популярности авторов, 0 - равномерно")
+        parser.add_argument("--group-share", type=float, default=0.6,
+                            help="доля постов, опубликованных в группах")
+        parser.add_argument("--days", type=int, default=365, help="за сколько дней раскидать посты")
+        parser.add_argument("--prefix", default="seed", help="префикс имён пользователей и адресов групп")
+        parser.add_argument("--password", default="seed-password")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=0, help="зерно генератора случайных чисел")
+
+    def handle(self, *args, **options):
+        if options["users"] < 2:
+            raise CommandError("Нужно хотя бы два пользователя")
+        prefix = options["prefix"]
+        if User.objects.filter(username__startswith=prefix + "_").exists():
+            raise CommandError(f"Пользователи с префиксом {prefix!r} уже есть, укажите другой --prefix")
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+
+        users = self.create_users(prefix, options["users"], options["password"])
+        groups = self.create_groups(prefix, options["groups"])
+        # одни и те же авторы пишут больше других и собирают больше подписчиков
+        self.rng.shuffle(users)
+        weights = [1 / (rank + 1) ** options["skew"] for rank in range(len(users))]
+        cum_weights = list(accumulate(weights))
+
+        with explicit_dates():
+            first_post = self.create_posts(users, cum_weights, groups, options)
+            self.create_comments(users, first_post, options["comments"])
+        self.create_follows(users, cum_weights, options["follows"])
+
+        self.stdout.write("Пересчитываю счётчики и ленты...")
+        seeded = User.objects.filter(pk__in=users)
+        recount(seeded)
+        with transaction.atomic():
+            for author_id in users:
+                timeline.refill(author_id)
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово: пользователей {len(users)}, групп {len(groups)}, постов {options['posts']}"
+        ))
+
+    def bulk_create(self, model, objects, **kwargs):
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) == self.batch_size:
+                with transaction.atomic():
+                    model.objects.bulk_create(batch, **kwargs)
+                batch = []
+        if batch:
+            with transaction.atomic():
+                model.objects.bulk_create(batch, **kwargs)
+
+    def create_users(self, prefix, count, password):
+        password = make_password(password)  # хешируем один раз на всех
+        self.bulk_create(User, (
+            User(username=f"{prefix}_{i}", first_name="Пользователь", last_name=str(i), password=password)
+            for i in range(count)
+        ))
+        return list(User.objects.filter(username__startswith=prefix + "_").values_list("pk", flat=True))
+
+    def create_groups(self, prefix, count):
+        self.bulk_create(Group, (
+            Group(title=f"Группа {i}", slug=f"{prefix}-{i}", description=" ".join(self.words(10, 30)))
+            for i in range(count)
+        ))
+        return list(Group.objects.filter(slug__startswith=prefix + "-").values_list("pk", flat=True))
+
+    def words(self, low, high):
+        return self.rng.choices(WORDS, k=self.rng.randint(low, high))
+
+    def create_posts(self, users, cum_weights, groups, options):
+        count = options["posts"]
+        last = Post.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+        start = timezone.now() - timedelta(days=options["days"])
+        step = timedelta(days=options["days"]) / max(count, 1)
+
+        def posts():
+            authors = self.rng.choices(users, cum_weights=cum_weights, k=count)
+            for i, author_id in enumerate(authors):
+                # даты растут вместе с id, как при настоящей публикации
+                date = start + step * i
+                group_id = None
+                if groups and self.rng.random() < options["group_share"]:
+                    group_id = self.rng.choice(groups)
+                yield Post(text=" ".join(self.words(5, 60)), author_id=author_id, group_id=group_id,
+                           pub_date=date, updated=date)
+
+        self.stdout.write(f"Посты: {count}")
+        self.bulk_create(Post, posts())
+        return last
+
+    def create_comments(self, users, first_post, mean):
+        if mean <= 0:
+            return
+        new_posts = Post.objects.filter(pk__gt=first_post).order_by("pk").values_list("pk", "pub_date")
+        now = timezone.now()
+
+        def comments():
+            for post_id, pub_date in new_posts.iterator():
+                # число комментариев распределено геометрически: у большинства
+                # постов их мало, у некоторых - много
+                for _ in range(int(self.rng.expovariate(1 / mean))):
+                    created = min(now, pub_date + timedelta(minutes=self.rng.randint(1, 60 * 24 * 3)))
+                    yield Comment(post_id=post_id, author_id=self.rng.choice(users),
+                                  text=" ".join(self.words(2, 20)), created=created)
+
+        self.stdout.write("Комментарии...")
+        self.bulk_create(Comment, comments())
+
+    def create_follows(self, users, cum_weights, mean):
+        if mean <= 0:
+            return
+
+        def follows():
+            for user_id in users:
+                wanted = min(int(self.rng.expovariate(1 / mean)), len(users) - 1)
+                authors = set()
+                # популярных авторов выбирают чаще; повторы и себя отбрасываем
+                for _ in range(wanted * 3):
+                    if len(authors) == wanted:
+                        break
+                    author_id = self.rng.choices(users, cum_weights=cum_weights)[0]
+                    if author_id != user_id:
+                        authors.add(author_id)
+                for author_id in authors:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        self.stdout.write("Подписки...")
+        self.bulk_create(Follow, follows())
+
@@ -0,0 +1,125 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from .replicate_db import SQLITE_ENGINES, replicate
+
+MARKER = "stress-writes"
+
+
+def worker(profile, database, post_id, user_id, seconds, threads, write_share):
+    """
+    Процесс нагрузки: потоки пишут комментарии и читают главную ленту
+    в копии базы database. Профиль базы выбирается до настройки Django,
+    поэтому процесс запускается с нуля (spawn). Возвращает
+    (записей, "database is locked", чтений).
+    """
+    os.environ["YATUBE_DB_PROFILE"] = profile
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yatube.settings")
+    import django
+    django.setup()
+    from django.conf import settings
+    # соединения ещё не открыты - подменяем файл до первого запроса
+    settings.DATABASES["default"]["NAME"] = database
+    from django.db import OperationalError, connections, transaction
+    from posts import writes
+    from posts.models import Comment, Post
+
+    totals = {"writes": 0, "locked": 0, "reads": 0}
+    guard = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def create():
+        return Comment.objects.create(post_id=post_id, author_id=user_id, text=MARKER)
+
+    def loop():
+        done = {"writes": 0, "locked": 0, "reads": 0}
+        rng = random.Random()
+        try:
+            while time.monotonic() < deadline:
+                if rng.random() < write_share:
+                    try:
+                        if profile == "production":
+                            writes.run(create)
+                        else:
+                            with transaction.atomic():
+                                create()
+                        done["writes"] += 1
+                    except (OperationalError, writes.Overloaded):
+                        done["locked"] += 1
+                else:
+                    list(Post.objects.select_related("author", "group").order_by("-pub_date", "-id")[:10])
+                    done["reads"] += 1
+        finally:
+            connections.close_all()
+        with guard:
+            for key, value in done.items():
+                totals[key] += value
+
+    pool = [threading.Thread(target=loop) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return totals["writes"], totals["locked"], totals["reads"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагружает копию базы конкурентными записями комментариев и чтением ленты "
+        "и показывает пропускную способность записи"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profile", choices=["development", "production"],
+                            help="профиль базы (settings.DATABASE_PROFILE); без него - сравнить оба")
+        parser.add_argument("--workers", type=int, default=4, help="процессов")
+        parser.add_argument("--threads", type=int, default=4, help="потоков в каждом процессе")
+        parser.add_argument("--seconds", type=float, default=5)
+        parser.add_argument("--write-share", type=float, default=0.3, help="доля записей среди операций")
+
+    def handle(self, *args, **options):
+        from posts.models import Post
+        if settings.DATABASES["default"]["ENGINE"] not in SQLITE_ENGINES:
+            raise CommandError("Команда рассчитана на SQLite")
+        post = Post.objects.select_related("author").order_by("-pk").first()
+        if post is None:
+            raise CommandError("Нужен хотя бы один пост - заполните базу командой seed_data")
+
+        profiles = [options["profile"]] if options["profile"] else ["development", "production"]
+        # нагрузка идёт на копию: режим журнала, комментарии и счётчики
+        # рабочей базы не меняются, каждый профиль начинает с одних данных
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in profiles:
+                path = os.path.join(directory, "%s.sqlite3" % profile)
+                replicate(settings.DATABASES["default"]["NAME"], path)
+                self.run(profile, path, post, options)
+
+    def run(self, profile, path, post, options):
+        # режим журнала сохраняется в файле базы; копия создаётся с обычным журналом
+        if profile == "production":
+            db = sqlite3.connect(path)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.close()
+
+        args = (profile, path, post.pk, post.author_id, options["seconds"], options["threads"], options["write_share"])
+        started = time.monotonic()
+        with ProcessPoolExecutor(max_workers=options["workers"],
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = [pool.submit(worker, *args) for _ in range(options["workers"])]
+            results = [future.result() for future in results]
+        elapsed = time.monotonic() - started
+        written, locked, reads = (sum(values) for values in zip(*results))
+        self.stdout.write(
+            f"{profile:<12} записей: {written} ({written / options['seconds']:.0f}/с), "
+            f"'database is locked': {locked}, чтений: {reads} ({reads / options['seconds']:.0f}/с), "
+            f"всего {elapsed:.1f} с"
+        )
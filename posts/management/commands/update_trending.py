@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = "Сдвигает окно популярного и пересчитывает рейтинги постов и групп в кеше"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=0,
+                            help="повторять каждые N секунд, 0 - пересчитать один раз")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            posts = trending.rebuild()
+            self.stdout.write(f"Популярное пересчитано за {time.monotonic() - started:.2f} с, постов в рейтинге: {posts}")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
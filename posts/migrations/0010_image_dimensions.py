@@ -0,0 +1,45 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:10
+
+from django.core.exceptions import SuspiciousOperation
+from django.db import migrations, models
+
+
+def fill_dimensions(apps, schema_editor):
+    # размеры уже загруженных картинок читаем из заголовков файлов
+    from PIL import Image
+    Post = apps.get_model('posts', 'Post')
+    for post in Post.objects.exclude(image='').exclude(image__isnull=True).iterator():
+        try:
+            with post.image.open('rb') as file:
+                image = Image.open(file)
+                post.image_width, post.image_height = image.size
+                post.image_format = image.format or ''
+        except (OSError, ValueError, SuspiciousOperation):
+            continue
+        post.save(update_fields=['image_width', 'image_height', 'image_format'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_format',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_dimensions, migrations.RunPython.noop),
+    ]
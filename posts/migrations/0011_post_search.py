@@ -0,0 +1,66 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:30
+
+from django.db import migrations
+
+# Полнотекстовый индекс SQLite FTS5 по постам и комментариям.
+# rowid: 2 * id для поста, 2 * id + 1 для комментария.
+CREATE_SQL = [
+    """CREATE VIRTUAL TABLE posts_search USING fts5(
+        body, post_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER posts_search_post_insert AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_search (rowid, body, post_id) VALUES (NEW.id * 2, NEW.text, NEW.id);
+    END""",
+    """CREATE TRIGGER posts_search_post_update AFTER UPDATE OF text ON posts_post BEGIN
+        UPDATE posts_search SET body = NEW.text WHERE rowid = NEW.id * 2;
+    END""",
+    """CREATE TRIGGER posts_search_post_delete AFTER DELETE ON posts_post BEGIN
+        DELETE FROM posts_search WHERE rowid = OLD.id * 2;
+    END""",
+    """CREATE TRIGGER posts_search_comment_insert AFTER INSERT ON posts_comment
+    WHEN NEW.post_id IS NOT NULL BEGIN
+        INSERT INTO posts_search (rowid, body, post_id) VALUES (NEW.id * 2 + 1, NEW.text, NEW.post_id);
+    END""",
+    """CREATE TRIGGER posts_search_comment_update AFTER UPDATE OF text, post_id ON posts_comment BEGIN
+        DELETE FROM posts_search WHERE rowid = OLD.id * 2 + 1;
+        INSERT INTO posts_search (rowid, body, post_id)
+            SELECT NEW.id * 2 + 1, NEW.text, NEW.post_id WHERE NEW.post_id IS NOT NULL;
+    END""",
+    """CREATE TRIGGER posts_search_comment_delete AFTER DELETE ON posts_comment BEGIN
+        DELETE FROM posts_search WHERE rowid = OLD.id * 2 + 1;
+    END""",
+    """INSERT INTO posts_search (rowid, body, post_id) SELECT id * 2, text, id FROM posts_post""",
+    """INSERT INTO posts_search (rowid, body, post_id)
+        SELECT id * 2 + 1, text, post_id FROM posts_comment WHERE post_id IS NOT NULL""",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS posts_search_post_insert",
+    "DROP TRIGGER IF EXISTS posts_search_post_update",
+    "DROP TRIGGER IF EXISTS posts_search_post_delete",
+    "DROP TRIGGER IF EXISTS posts_search_comment_insert",
+    "DROP TRIGGER IF EXISTS posts_search_comment_update",
+    "DROP TRIGGER IF EXISTS posts_search_comment_delete",
+    "DROP TABLE IF EXISTS posts_search",
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        # на других СУБД поиск работает через LIKE (posts/search.py)
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_image_dimensions'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE_SQL), run(DROP_SQL)),
+    ]
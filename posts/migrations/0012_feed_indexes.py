@@ -0,0 +1,53 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:25
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def drop_duplicate_follows(apps, schema_editor):
+    # до ограничения уникальности повторные подписки могли попасть в базу
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    duplicates = (
+        Follow.objects.filter(user__isnull=False).values('user', 'author')
+        .annotate(keep=Min('id'), n=Count('id')).filter(n__gt=1)
+        .values_list('user', 'author', 'keep')
+    )
+    for user_id, author_id, keep in list(duplicates):
+        Follow.objects.filter(user_id=user_id, author_id=author_id).exclude(id=keep).delete()
+        # счётчики считали и повторные подписки
+        UserStats.objects.filter(user_id=user_id).update(
+            following_count=Follow.objects.filter(user_id=user_id).count())
+        UserStats.objects.filter(user_id=author_id).update(
+            followers_count=Follow.objects.filter(author_id=author_id).count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'user'], name='follow_author_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'pub_date'], name='post_author_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'pub_date'], name='post_group_date_idx'),
+        ),
+        migrations.RunPython(drop_duplicate_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='follow_user_author_unique'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_userstats_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.PositiveIntegerField()),
+                ('comments', models.PositiveIntegerField(default=0)),
+                ('posts', models.PositiveIntegerField(default=0)),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Group')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='trendcounter',
+            index=models.Index(fields=['bucket'], name='trend_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='trendcounter',
+            constraint=models.UniqueConstraint(fields=('post', 'bucket'), name='trend_post_bucket_unique'),
+        ),
+    ]
@@ -21,20 +21,120 @@ class Post(models.Model):
     )
     # поле для картинки
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    # размеры и формат картинки запоминаются при загрузке (posts/images.py),
+    # чтобы при показе не открывать исходный файл
+    image_width = models.PositiveIntegerField(blank=True, null=True)
+    image_height = models.PositiveIntegerField(blank=True, null=True)
+    image_format = models.CharField(max_length=10, blank=True)
+    # число комментариев поддерживается при записи (posts/counters.py)
+    comment_count = models.PositiveIntegerField(default=0)
+    # версия для ключа кеша отрисованного поста: растёт при правке и новых комментариях
+    version = models.PositiveIntegerField(default=0)
+    # время последнего изменения поста или его комментариев (для Last-Modified)
+    updated = models.DateTimeField("Дата изменения", auto_now=True)
 
     def __str__(self):
         # выводим текст поста 
         return self.text
 
+    def save(self, *args, **kwargs):
+        updating = not self._state.adding
+        if updating and kwargs.get("update_fields") is None:
+            # счётчик и версия меняются только атомарными UPDATE, не затираем их
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ("comment_count", "version")
+            ]
+        super().save(*args, **kwargs)
+        if updating:
+            Post.objects.filter(pk=self.pk).update(version=models.F("version") + 1)
+            self.version += 1
+
+    class Meta:
+        # ленты автора и группы: WHERE author/group = ? ORDER BY pub_date DESC, id DESC
+        # читаются по индексу без сортировки
+        indexes = [
+            models.Index(fields=["author", "pub_date"], name="post_author_date_idx"),
+            models.Index(fields=["group", "pub_date"], name="post_group_date_idx"),
+        ]
+
 class Comment(models.Model):
     post = models.ForeignKey(Post, blank=True, null=True, on_delete=models.CASCADE, related_name="comments")
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="comments")
     text = models.TextField()
     created = models.DateTimeField("Дата публикации", auto_now_add=True, db_index=True)
 
+    class Meta:
+        # комментарии к посту по порядку
+        indexes = [
+            models.Index(fields=["post", "created"], name="comment_post_created_idx"),
+        ]
+
 class Follow(models.Model):
     user = models.ForeignKey(User, blank=True, null=True, on_delete=models.CASCADE, related_name="follower") #который подписывается
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="following")
 
     def __str__(self):
         return f'follower - {self.user} following - {self.author}'
+
+    class Meta:
+        constraints = [
+            # повторная подписка упирается в ограничение (см. profile_follow)
+            models.UniqueConstraint(fields=["user", "author"], name="follow_user_author_unique"),
+        ]
+        indexes = [
+            # подписчики автора (раскладка ленты, счётчики) - только по индексу
+            models.Index(fields=["author", "user"], name="follow_author_user_idx"),
+        ]
+
+
+class UserStats(models.Model):
+    # счётчики пользователя, которые иначе пришлось бы считать на каждой странице
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="stats")
+    posts_count = models.PositiveIntegerField(default=0)
+    # сколько пользователей подписано на него
+    followers_count = models.PositiveIntegerField(default=0)
+    # на скольких авторов подписан он сам
+    following_count = models.PositiveIntegerField(default=0)
+    # растёт при каждом изменении счётчиков или профиля - ключ кеша блока автора
+    version = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'stats - {self.user}'
+
+
+class TimelineEntry(models.Model):
+    # лента подписок, разложенная по подписчикам при публикации (fan-out on write):
+    # одна запись на каждого подписчика автора поста
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="timeline")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="timeline_entries")
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "post"], name="timeline_user_post_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-pub_date", "-post"], name="timeline_user_date_idx"),
+            models.Index(fields=["user", "author"], name="timeline_user_author_idx"),
+        ]
+
+
+
+class TrendCounter(models.Model):
+    # активность поста за один интервал времени для раздела "Популярное" (posts/trending.py)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="+")
+    group = models.ForeignKey(Group, blank=True, null=True, on_delete=models.CASCADE, related_name="+")
+    # номер интервала: unix-время // TRENDING_BUCKET_SECONDS
+    bucket = models.PositiveIntegerField()
+    comments = models.PositiveIntegerField(default=0)
+    posts = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["post", "bucket"], name="trend_post_bucket_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["bucket"], name="trend_bucket_idx"),
+        ]
@@ -0,0 +1,173 @@
+import datetime
+
+from django.core.paginator import Paginator
+from django.db.models import DateTimeField, Q
+from django.utils import timezone
+
+# сколько записей показывать на странице ленты
+PAGE_SIZE = 10
+# сколько комментариев показывать под постом сразу и подгружать за раз
+COMMENTS_PAGE_SIZE = 20
+COMMENT_ORDERING = ("created", "id")
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_value(value):
+    if isinstance(value, datetime.datetime):
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value, timezone.utc)
+        delta = value - EPOCH
+        return str((delta.days * 86400 + delta.seconds) * 10 ** 6 + delta.microseconds)
+    return str(value)
+
+
+def decode_value(field, raw):
+    number = int(raw)
+    if isinstance(field, DateTimeField):
+        return EPOCH + datetime.timedelta(microseconds=number)
+    return number
+
+
+class CursorPage:
+    """
+    Страница ленты, полученная по курсору. Повторяет интерфейс
+    django.core.paginator.Page, который нужен шаблонам.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return self.paginator.cursor_for(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return self.paginator.cursor_for(self.object_list[0])
+        return None
+
+
+class CursorPaginator:
+    """
+    Постраничный вывод по ключу (keyset): вместо OFFSET берём записи
+    строго после (или до) курсора, поэтому стоимость страницы не зависит
+    от её глубины и не нужен COUNT(*).
+
+    ordering - поля сортировки или аннотации, последнее из них должно быть
+    уникальным.
+    """
+
+    def __init__(self, object_list, per_page, ordering=("-pub_date", "-id")):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip("-") for name in self.ordering]
+        self.descending = [name.startswith("-") for name in self.ordering]
+
+    def cursor_for(self, obj):
+        return "_".join(encode_value(getattr(obj, name)) for name in self.fields)
+
+    def decode(self, cursor):
+        """Разбирает курсор; на испорченный курсор возвращает None."""
+        parts = (cursor or "").split("_")
+        if len(parts) != len(self.fields):
+            return None
+        try:
+            return [decode_value(self._field(name), raw) for name, raw in zip(self.fields, parts)]
+        except (ValueError, OverflowError):
+            return None
+
+    def _field(self, name):
+        # сортировать можно и по аннотации, например по полю связанной таблицы
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.object_list.model._meta.get_field(name)
+
+    def _seek(self, values, forward):
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+        condition = Q()
+        for index, name in enumerate(self.fields):
+            later = self.descending[index] == forward
+            lookup = "%s__%s" % (name, "lt" if later else "gt")
+            step = Q(**{lookup: values[index]})
+            for prev_name, prev_value in zip(self.fields[:index], values[:index]):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        return condition
+
+    def _reverse_ordering(self):
+        return [name[1:] if name.startswith("-") else "-" + name for name in self.ordering]
+
+    def page(self, after=None, before=None):
+        queryset = self.object_list
+        if before:
+            values = self.decode(before)
+            if values is not None:
+                rows = list(
+                    queryset.filter(self._seek(values, forward=False))
+                    .order_by(*self._reverse_ordering())[:self.per_page + 1]
+                )
+                has_previous = len(rows) > self.per_page
+                rows = rows[:self.per_page]
+                rows.reverse()
+                return CursorPage(rows, self, has_next=True, has_previous=has_previous)
+
+        values = self.decode(after) if after else None
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, forward=True))
+        rows = list(queryset.order_by(*self.ordering)[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return CursorPage(rows[:self.per_page], self, has_next=has_next,
+                          has_previous=values is not None)
+
+
+def paginate(request, queryset, per_page=PAGE_SIZE, ordering=("-pub_date", "-id")):
+    """
+    Возвращает (paginator, page) для ленты.
+
+    Если в запросе есть ?after= или ?before=, страница выбирается по курсору.
+    Первая страница - обычная django.core.paginator.Page, но без COUNT(*):
+    читается на одну запись больше страницы, и Paginator строится по этому
+    списку. Номеров страниц нет (?page= не учитывается) - дальше листают
+    только по курсору из ссылки "Следующая", без OFFSET.
+    """
+    cursor_paginator = CursorPaginator(queryset, per_page, ordering)
+    after = request.GET.get("after")
+    before = request.GET.get("before")
+    if after or before:
+        return cursor_paginator, cursor_paginator.page(after=after, before=before)
+
+    rows = list(queryset.order_by(*ordering)[:per_page + 1])
+    paginator = Paginator(rows, per_page)
+    page = paginator.page(1)
+    page.next_cursor = None
+    if page.has_next():
+        page.next_cursor = cursor_paginator.cursor_for(page[-1])
+    return paginator, page
@@ -0,0 +1,127 @@
+"""
+Полнотекстовый поиск по постам и комментариям к ним.
+
+Индекс - виртуальная таблица SQLite FTS5 posts_search (миграция 0011),
+его держат в актуальном состоянии триггеры на posts_post и posts_comment.
+Пост находится и по своему тексту, и по тексту комментариев; порядок -
+по релевантности (bm25), страницы - по курсору (оценка, id поста).
+На других СУБД поиск сводится к LIKE по тексту.
+"""
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Group, Post
+from .pagination import PAGE_SIZE, CursorPage, paginate
+
+User = get_user_model()
+
+TABLE = "posts_search"
+
+
+def available():
+    return connection.vendor == "sqlite"
+
+
+def build_query(text):
+    """
+    Превращает строку пользователя в запрос FTS5: каждое слово берётся
+    в кавычки, поэтому операторы и спецсимволы FTS5 не срабатывают.
+    """
+    words = re.findall(r"\w+", text or "")
+    return " ".join('"%s"' % word for word in words)
+
+
+def matching_posts_sql(query):
+    """(sql, params) подзапроса с id подходящих постов - для фильтра id__in."""
+    return "SELECT post_id FROM %s WHERE %s MATCH %%s" % (TABLE, TABLE), [query]
+
+
+class SearchPaginator:
+    """Страницы результатов поиска по ключу (оценка, id поста)."""
+
+    def __init__(self, query, per_page=PAGE_SIZE, group=None, author=None):
+        self.query = query
+        self.per_page = per_page
+        self.group = group
+        self.author = author
+
+    def cursor_for(self, post):
+        return "%r_%d" % (post.search_score, post.pk)
+
+    def decode(self, cursor):
+        try:
+            score, pk = (cursor or "").split("_")
+            return float(score), int(pk)
+        except ValueError:
+            return None
+
+    def _ranked_ids(self, after):
+        # bm25 нельзя звать внутри агрегата, а скрытый столбец rank - можно;
+        # меньше - релевантнее
+        sql = [
+            "SELECT s.post_id, s.score FROM ("
+            " SELECT post_id, MIN(rank) AS score FROM {search} WHERE {search} MATCH %s GROUP BY post_id"
+            ") AS s JOIN {post} AS p ON p.id = s.post_id WHERE 1 = 1"
+        ]
+        params = [self.query]
+        if self.group:
+            sql.append("AND p.group_id = (SELECT id FROM {group} WHERE slug = %s)")
+            params.append(self.group)
+        if self.author:
+            sql.append("AND p.author_id = (SELECT id FROM {user} WHERE username = %s)")
+            params.append(self.author)
+        if after is not None:
+            sql.append("AND (s.score > %s OR (s.score = %s AND s.post_id > %s))")
+            params.extend([after[0], after[0], after[1]])
+        sql.append("ORDER BY s.score, s.post_id LIMIT %s")
+        params.append(self.per_page + 1)
+        sql = " ".join(sql).format(
+            search=TABLE, post=Post._meta.db_table, group=Group._meta.db_table, user=User._meta.db_table
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def page(self, after=None):
+        values = self.decode(after) if after else None
+        rows = self._ranked_ids(values)
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        posts = Post.objects.select_related("author", "group").in_bulk([pk for pk, _ in rows])
+        object_list = []
+        for pk, score in rows:
+            post = posts.get(pk)
+            if post is not None:
+                post.search_score = score
+                object_list.append(post)
+        # назад по результатам поиска не листаем - только "В начало"
+        return CursorPage(object_list, self, has_next=has_next, has_previous=False)
+
+
+def search(request, text, group=None, author=None, per_page=PAGE_SIZE):
+    """Возвращает (paginator, page) с результатами поиска."""
+    if not available():
+        posts = Post.objects.select_related("author", "group").filter(
+            Q(text__icontains=text) | Q(comments__text__icontains=text)
+        ).distinct()
+        if group:
+            posts = posts.filter(group__slug=group)
+        if author:
+            posts = posts.filter(author__username=author)
+        return paginate(request, posts, per_page)
+    paginator = SearchPaginator(build_query(text), per_page, group, author)
+    if not paginator.query:
+        return paginator, CursorPage([], paginator, has_next=False, has_previous=False)
+    return paginator, paginator.page(after=request.GET.get("after"))
+
+
+def filter_queryset(queryset, text):
+    """Оставляет в queryset постов только найденные по тексту (для админки)."""
+    query = build_query(text)
+    if not query:
+        return queryset
+    return queryset.filter(id__in=RawSQL(*matching_posts_sql(query)))
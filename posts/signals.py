@@ -0,0 +1,94 @@
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from yatube import auth
+
+from . import counters, feeds, suggestions, timeline, trending
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+# поля автора, которые видны во фрагментах постов (post_item.html, API)
+AUTHOR_FIELDS = {"username", "first_name", "last_name"}
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+    else:
+        # имя в блоке автора могло измениться
+        counters.touch_user_stats(instance.pk)
+        # правка в админке, новый пароль, last_login при входе
+        auth.forget(instance.pk)
+        # вход сохраняет только last_login - посты автора не трогаем
+        if update_fields is None or AUTHOR_FIELDS & set(update_fields):
+            counters.touch_posts(author_id=instance.pk)
+            # touch_posts - массовый update() без сигналов, ленты сбрасываем сами
+            feeds.touch_author(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+def group_changed(sender, instance, created, **kwargs):
+    if not created:
+        # название и адрес группы показываются в каждом её посте
+        counters.touch_posts(group_id=instance.pk)
+        feeds.touch_group(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    auth.forget(instance.pk)
+
+
+@receiver(user_logged_out)
+def session_ended(sender, request, user, **kwargs):
+    if user is not None:
+        auth.forget(user.pk)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_stats(instance.author_id, posts_count=1)
+        timeline.fan_out(instance)
+        trending.record(instance.pk, posts=1)
+    feeds.touch(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user_stats(instance.author_id, posts_count=-1)
+    feeds.touch(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created and instance.post_id:
+        counters.change_comment_count(instance.post_id, 1)
+        trending.record(instance.post_id, comments=1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id:
+        counters.change_comment_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if not created:
+        return
+    counters.change_user_stats(instance.author_id, followers_count=1)
+    if instance.user_id:
+        counters.change_user_stats(instance.user_id, following_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        suggestions.followed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user_stats(instance.author_id, followers_count=-1)
+    if instance.user_id:
+        counters.change_user_stats(instance.user_id, following_count=-1)
+        timeline.purge(instance.user_id, instance.author_id)
+        suggestions.unfollowed(instance.user_id, instance.author_id)
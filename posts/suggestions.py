@@ -0,0 +1,300 @@
+"""
+Подсказки "кого почитать".
+
+Кандидаты для пользователя - авторы, на которых подписаны его авторы
+(друзья друзей), и самые активные авторы групп, в которых пишут он сам
+и его авторы. Оценка кандидата - сколько его авторов подписано на
+кандидата плюс settings.SUGGESTIONS_GROUP_WEIGHT за каждую общую группу.
+
+Считать это запросом к Follow для всех пользователей сразу слишком
+дорого, поэтому команда manage.py rebuild_suggestions загружает граф
+подписок в память массивами в формате CSR (списки смежности подряд в
+одном массиве плюс массив смещений), считает оценки пачками и кладёт
+лучшие settings.SUGGESTIONS_SIZE кандидатов каждого пользователя в кеш
+на settings.SUGGESTIONS_CACHE_TIMEOUT секунд. Считаются только активные
+пользователи - зарегистрированные или входившие за последние
+settings.SUGGESTIONS_ACTIVE_DAYS дней. Страницы читают готовый список
+одним обращением к кешу.
+
+Оценки считаются векторно на NumPy (есть в requirements.txt) сразу для
+всей пачки пользователей. Без NumPy - по одному на массивах array из
+стандартной библиотеки, заметно медленнее; результаты у обоих путей
+одинаковые (tests/test_suggestions.py).
+
+Между перестроениями список поправляется при подписке и отписке
+(posts/signals.py): меняются оценки авторов, на которых подписан новый
+(бывший) автор пользователя. Подписки его подписчиков и группы при этом
+не пересчитываются - это сделает следующее перестроение.
+"""
+import heapq
+from array import array
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Follow, Group, Post, User
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - запасной путь без NumPy
+    numpy = None
+
+# множитель для пары (номер пользователя в пачке, id) в одном int64
+PAIR = 1 << 32
+
+
+def size():
+    return getattr(settings, "SUGGESTIONS_SIZE", 20)
+
+
+def group_weight():
+    return getattr(settings, "SUGGESTIONS_GROUP_WEIGHT", 0.5)
+
+
+def group_candidates():
+    # сколько самых активных авторов группы рассматривать кандидатами
+    return getattr(settings, "SUGGESTIONS_GROUP_CANDIDATES", 50)
+
+
+def cache_timeout():
+    # с запасом больше периода запуска rebuild_suggestions
+    return getattr(settings, "SUGGESTIONS_CACHE_TIMEOUT", 2 * 24 * 60 * 60)
+
+
+def active_days():
+    return getattr(settings, "SUGGESTIONS_ACTIVE_DAYS", 30)
+
+
+def cache_key(user_id):
+    return "suggestions:%s" % user_id
+
+
+def for_user(user, limit=5):
+    """[(id, username), ...] - лучшие подсказки для пользователя."""
+    if not user.is_authenticated:
+        return []
+    entries = cache.get(cache_key(user.pk)) or []
+    return [(author_id, username) for author_id, username, _ in entries[:limit]]
+
+
+def store_many(entries_by_user):
+    """{user_id: {author_id: [username, score]}} -> кеш, лучшие size() на пользователя."""
+    data, empty = {}, []
+    for user_id, entries in entries_by_user.items():
+        ranked = sorted(
+            ((author_id, username, score) for author_id, (username, score) in entries.items() if score > 0),
+            key=lambda entry: (-entry[2], entry[0]),
+        )
+        if ranked:
+            data[cache_key(user_id)] = ranked[:size()]
+        else:
+            # без кандидатов запись не нужна, старую убираем
+            empty.append(cache_key(user_id))
+    if data:
+        cache.set_many(data, cache_timeout())
+    if empty:
+        cache.delete_many(empty)
+
+
+# поправки при подписке и отписке
+
+
+def _update(user_id, author_id, delta):
+    entries = {entry[0]: [entry[1], entry[2]] for entry in cache.get(cache_key(user_id)) or []}
+    entries.pop(author_id, None)
+    following = set(Follow.objects.filter(user_id=user_id).values_list("author_id", flat=True))
+    for candidate, username in Follow.objects.filter(user_id=author_id).values_list("author_id", "author__username"):
+        if candidate == user_id or candidate in following:
+            continue
+        entries.setdefault(candidate, [username, 0])[1] += delta
+    store_many({user_id: entries})
+
+
+def followed(user_id, author_id):
+    _update(user_id, author_id, 1)
+
+
+def unfollowed(user_id, author_id):
+    _update(user_id, author_id, -1)
+
+
+# граф подписок в памяти
+
+
+class Adjacency:
+    """
+    Списки смежности в формате CSR: соседи вершины i - это
+    indices[indptr[i]:indptr[i + 1]]. Вершины - id пользователей и групп.
+    """
+
+    def __init__(self, pairs, rows):
+        """pairs - пары (вершина, сосед), отсортированные по вершине."""
+        counts = array("q", bytes(8 * (rows + 1)))
+        indices = array("q")
+        for row, neighbour in pairs:
+            if row >= rows:
+                # вершина появилась уже во время загрузки графа
+                continue
+            counts[row + 1] += 1
+            indices.append(neighbour)
+        for row in range(rows):
+            counts[row + 1] += counts[row]
+        self.indptr, self.indices = counts, indices
+        if numpy is not None:
+            self.indptr = numpy.array(counts, dtype=numpy.int64)
+            self.indices = numpy.array(indices, dtype=numpy.int64)
+
+    def row(self, i):
+        if i + 1 >= len(self.indptr):
+            return self.indices[:0]
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def gather(self, rows, owners=False):
+        """
+        Соседи всех вершин rows подряд, с повторами. С owners=True ещё и
+        номер вершины в rows для каждого соседа.
+        """
+        if numpy is None:
+            result, positions = array("q"), array("q")
+            for position, i in enumerate(rows):
+                neighbours = self.row(i)
+                result.extend(neighbours)
+                positions.extend([position] * len(neighbours))
+            return (result, positions) if owners else result
+        rows = numpy.asarray(rows, dtype=numpy.int64)
+        inside = rows + 1 < len(self.indptr)
+        rows = numpy.where(inside, rows, 0)
+        starts = self.indptr[rows]
+        lengths = numpy.where(inside, self.indptr[rows + 1] - starts, 0)
+        # сосед номер k в результате лежит в indices[starts[j] + (k - начало куска j)]
+        offsets = numpy.repeat(starts - (numpy.cumsum(lengths) - lengths), lengths)
+        result = self.indices[offsets + numpy.arange(offsets.size)]
+        if owners:
+            return result, numpy.repeat(numpy.arange(rows.size), lengths)
+        return result
+
+
+class FollowGraph:
+    """Подписки, группы авторов и активные авторы групп."""
+
+    def __init__(self):
+        rows = (User.objects.order_by("-pk").values_list("pk", flat=True).first() or 0) + 1
+        follows = (
+            Follow.objects.filter(user__isnull=False).order_by("user_id", "author_id")
+            .values_list("user_id", "author_id").distinct()
+        )
+        self.following = Adjacency(follows.iterator(), rows)
+        groups = (
+            Post.objects.filter(group__isnull=False).order_by("author_id", "group_id")
+            .values_list("author_id", "group_id").distinct()
+        )
+        self.groups = Adjacency(groups.iterator(), rows)
+        group_rows = (Group.objects.order_by("-pk").values_list("pk", flat=True).first() or 0) + 1
+        self.group_authors = Adjacency(self._active_authors(), group_rows)
+
+    def _active_authors(self):
+        # по group_candidates() авторов с наибольшим числом постов в каждой группе
+        limit = group_candidates()
+        taken = Counter()
+        counts = (
+            Post.objects.filter(group__isnull=False).values_list("group_id", "author_id")
+            .order_by().annotate(n=Count("id")).order_by("group_id", "-n", "author_id")
+        )
+        for group_id, author_id, _ in counts.iterator():
+            if taken[group_id] < limit:
+                taken[group_id] += 1
+                yield group_id, author_id
+
+    def top(self, user_id, limit):
+        """Лучшие кандидаты для пользователя: [(кандидат, оценка), ...] по убыванию оценки."""
+        if numpy is not None:
+            return self.top_many([user_id], limit)[user_id]
+        follows = self.following.row(user_id)
+        fof = self.following.gather(follows)
+        interests = self.groups.gather([user_id, *follows])
+        scores = self._score_python(user_id, follows, fof, interests)
+        return heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def top_many(self, user_ids, limit):
+        """{user_id: лучшие кандидаты, как в top()} для пачки пользователей."""
+        if numpy is None:
+            return {user_id: self.top(user_id, limit) for user_id in user_ids}
+        return self._top_numpy(user_ids, limit)
+
+    def _score_python(self, user_id, follows, fof, interests):
+        interests = set(interests)
+        scores = Counter(fof)
+        for candidate in self.group_authors.gather(interests):
+            scores.setdefault(candidate, 0)
+        excluded = set(follows)
+        excluded.add(user_id)
+        weight = group_weight()
+        return {
+            candidate: count + weight * sum(1 for group in self.groups.row(candidate) if group in interests)
+            for candidate, count in scores.items() if candidate not in excluded
+        }
+
+    def _top_numpy(self, user_ids, limit):
+        # пары (номер пользователя в пачке, id) кодируются одним числом
+        # owner * PAIR + id, чтобы считать всю пачку сразу
+        users = numpy.asarray(user_ids, dtype=numpy.int64)
+        follows, follow_owner = self.following.gather(users, owners=True)
+        fof, fof_link = self.following.gather(follows, owners=True)
+        fof_keys = follow_owner[fof_link] * PAIR + fof
+
+        # интересы - группы пользователя и его авторов
+        own_groups, own_owner = self.groups.gather(users, owners=True)
+        their_groups, their_link = self.groups.gather(follows, owners=True)
+        interests = numpy.unique(numpy.concatenate([
+            own_owner * PAIR + own_groups, follow_owner[their_link] * PAIR + their_groups,
+        ]))
+        members, member_link = self.group_authors.gather(interests % PAIR, owners=True)
+
+        # кандидаты из групп попали в список без подписок - их счёт за подписки 0
+        keys = numpy.unique(numpy.concatenate([fof_keys, (interests // PAIR)[member_link] * PAIR + members]))
+        owner, candidate = keys // PAIR, keys % PAIR
+        fof_ids, fof_counts = numpy.unique(fof_keys, return_counts=True)
+        friends = numpy.zeros(keys.size)
+        friends[numpy.searchsorted(keys, fof_ids)] = fof_counts
+        # сколько групп кандидата входит в интересы его пользователя
+        candidate_groups, link = self.groups.gather(candidate, owners=True)
+        shared = numpy.bincount(link, weights=numpy.isin(owner[link] * PAIR + candidate_groups, interests),
+                                minlength=keys.size)
+        scores = friends + group_weight() * shared
+
+        keep = ~(numpy.isin(keys, follow_owner * PAIR + follows) | (candidate == users[owner]))
+        owner, candidate, scores = owner[keep], candidate[keep], scores[keep]
+        order = numpy.lexsort((candidate, -scores, owner))
+        owner, candidate, scores = owner[order], candidate[order], scores[order]
+        # место кандидата в списке своего пользователя
+        rank = numpy.arange(owner.size) - numpy.searchsorted(owner, owner)
+        best = rank < limit
+        result = {user_id: [] for user_id in user_ids}
+        for position, author_id, score in zip(owner[best].tolist(), candidate[best].tolist(), scores[best].tolist()):
+            result[user_ids[position]].append((author_id, score))
+        return result
+
+
+def active_users():
+    since = timezone.now() - timedelta(days=active_days())
+    return User.objects.filter(Q(last_login__gte=since) | Q(date_joined__gte=since))
+
+
+def rebuild(batch_size=1000):
+    """Перестраивает подсказки активных пользователей пачками. Возвращает их число."""
+    graph = FollowGraph()
+    usernames = dict(User.objects.values_list("pk", "username").iterator())
+    user_ids = list(active_users().order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        top = graph.top_many(batch, size())
+        store_many({
+            user_id: {candidate: [usernames[candidate], score] for candidate, score in top[user_id]
+                      if candidate in usernames}
+            for user_id in batch
+        })
+    return len(user_ids)
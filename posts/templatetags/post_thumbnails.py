@@ -0,0 +1,18 @@
+import logging
+
+from django import template
+
+from posts.thumbnails import ready_thumbnail as get_ready_thumbnail
+
+register = template.Library()
+logger = logging.getLogger(__name__)
+
+
+@register.simple_tag
+def ready_thumbnail(post, geometry, **options):
+    # превью, подготовленное в фоне (posts/thumbnails.py), или None, пока его нет
+    try:
+        return get_ready_thumbnail(post, geometry, **options)
+    except Exception:
+        logger.exception("Не удалось получить превью для поста %s", post.pk)
+        return None
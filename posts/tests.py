@@ -1,10 +1,24 @@
 from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.core.files.images import ImageFile
-from posts.models import Post, Group, Follow
+from posts.models import Post, Group, Follow, TimelineEntry, Comment, UserStats
+from django.core.management import call_command, CommandError
+from django.utils import timezone
+from django.utils.http import http_date
+from posts import thumbnails, benchmark
 from django.shortcuts import get_object_or_404
 from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 import time
+from io import BytesIO
+from PIL import Image
+from concurrent.futures import wait
+from unittest import mock
+from io import StringIO
+import os
+import tempfile
 
 
 
@@ -13,8 +27,10 @@ User = get_user_model()
 
 # Create your tests here.
 
+@override_settings(CACHES=settings.TEST_LOCMEM_CACHES)
 class ProfileTest(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = Client()
         self.user = User.objects.create_user(
             username="sarah", email="connor.s@skynet.com", password="12345678")
@@ -99,13 +115,51 @@ class ProfileTest(TestCase):
             response = self.client.post("/new/", {'text': 'post with image', 'image': img})
         self.assertEqual(response.status_code, 200)
 
-    # Кеширование
+    # Кеширование: посты кешируются по версии, поэтому новые записи и правки видны сразу
 
     def test_cache(self):
         self.client.login(username='sarah', password='12345678')
+        self.client.get("/")
         self.client.post("/new/", {"text": "Не появился ли текст сразу?"})
         response = self.client.get("/")
-        self.assertNotContains(response, "Не появился ли текст сразу?")
+        self.assertContains(response, "Не появился ли текст сразу?")
+
+    def test_cached_post_is_refreshed_after_edit_and_comment(self):
+        self.client.login(username='sarah', password='12345678')
+        new = Post.objects.create(author=self.user, text=self.test_post)
+        self.client.get("/")
+        self.client.post(f"/sarah/{new.id}/edit/", {"text": "modified"})
+        response = self.client.get("/")
+        self.assertContains(response, "modified")
+        self.assertNotContains(response, self.test_post)
+
+        self.client.post(f"/sarah/{new.id}/comment/", {"text": "Comment"})
+        response = self.client.get("/")
+        self.assertContains(response, "1 комментариев")
+
+    def test_cached_post_is_refreshed_after_author_or_group_rename(self):
+        group = Group.objects.create(title='Old group', slug='old_group', description='Group')
+        post = Post.objects.create(author=self.user, group=group, text=self.test_post)
+        self.client.get("/")
+        self.user.username = "sarah_c"
+        self.user.save()
+        group.title = 'New group'
+        group.save()
+        response = self.client.get("/")
+        self.assertContains(response, "@sarah_c")
+        self.assertContains(response, "#New group")
+        self.assertNotContains(response, "Old group")
+        # вход обновляет только last_login - версия поста не меняется
+        version = Post.objects.get(pk=post.pk).version
+        self.client.login(username='sarah_c', password='12345678')
+        self.assertEqual(Post.objects.get(pk=post.pk).version, version)
+
+    def test_cached_post_shows_edit_link_only_to_author(self):
+        Post.objects.create(author=self.user, text=self.test_post)
+        self.client.login(username='sarah', password='12345678')
+        self.assertContains(self.client.get("/"), "Редактировать")
+        self.client.login(username='Joe', password='12345678')
+        self.assertNotContains(self.client.get("/"), "Редактировать")
 
     # Авторизованный пользователь может подписываться на других пользователей и удалять их из подписок.
 
@@ -149,21 +203,532 @@ class ProfileTest(TestCase):
 
         with self.assertRaises(AttributeError):
             self.another_user2.post(f'/{self.another_user1.username}/{new.id}/comment/', {"text": "Comment"})
-          
-        
 
+    def test_follow_twice_keeps_one_subscription(self):
+        self.client.login(username='sarah', password='12345678')
+        self.client.get("/Joe/follow")
+        response = self.client.get("/Joe/follow")
+        self.assertRedirects(response, "/Joe/")
+        self.assertEqual(Follow.objects.filter(user=self.user, author=self.another_user1).count(), 1)
+        self.assertEqual(UserStats.objects.get(user=self.another_user1).followers_count, 1)
 
 
+@override_settings(CACHES=settings.TEST_LOCMEM_CACHES)
+class CursorPaginationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="sarah", email="connor.s@skynet.com", password="12345678")
+        self.group = Group.objects.create(title='Test_group', slug='test_gr', description='It is test group')
+        for i in range(25):
+            Post.objects.create(author=self.user, group=self.group, text=f'Post number {i}')
+
+    def collect(self, url):
+        # проходит ленту по ссылкам "Следующая" и собирает id постов
+        seen = []
+        response = self.client.get(url)
+        while True:
+            page = response.context['page']
+            seen.extend(post.id for post in page)
+            if not page.has_next():
+                return seen, response
+            response = self.client.get(url, {'after': page.next_cursor})
+
+    @override_settings(CACHES=settings.TEST_CACHES)
+    def test_cursor_walk_covers_feed_in_order(self):
+        expected = list(Post.objects.order_by('-pub_date', '-id').values_list('id', flat=True))
+        for url in ('/', f'/group/{self.group.slug}', '/sarah/'):
+            seen, response = self.collect(url)
+            self.assertEqual(seen, expected)
+            self.assertTrue(response.context['page'].is_cursor)
+
+    @override_settings(CACHES=settings.TEST_CACHES)
+    def test_before_cursor_returns_previous_page(self):
+        first = self.client.get('/').context['page']
+        second = self.client.get('/', {'after': first.next_cursor}).context['page']
+        back = self.client.get('/', {'before': second.previous_cursor}).context['page']
+        self.assertEqual([p.id for p in back], [p.id for p in first])
+        self.assertFalse(back.has_previous())
+
+    def test_first_page_without_count_and_page_numbers(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/', {'page': 2})
+        self.assertFalse([q for q in queries.captured_queries if 'COUNT(' in q['sql'] and 'posts_post' in q['sql']])
+        # ?page= не учитывается, номеров страниц нет - дальше только по курсору
+        self.assertEqual([p.id for p in response.context['page']],
+                         list(Post.objects.order_by('-pub_date', '-id').values_list('id', flat=True)[:10]))
+        self.assertNotContains(response, 'page=')
+        self.assertContains(response, 'after=' + response.context['page'].next_cursor)
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        response = self.client.get('/', {'after': 'garbage'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page']), 10)
 
 
+@override_settings(CACHES=settings.TEST_LOCMEM_CACHES)
+class CommentPaginationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="sarah", email="connor.s@skynet.com", password="12345678")
+        self.post = Post.objects.create(author=self.user, text='Viral post')
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, text=f'Comment {i}') for i in range(45))
+        Post.objects.filter(pk=self.post.pk).update(comment_count=45)
+
+    def page_texts(self, items):
+        return [comment.text for comment in items]
+
+    @override_settings(CACHES=settings.TEST_CACHES)
+    def test_load_more_walks_whole_thread(self):
+        response = self.client.get(f'/sarah/{self.post.id}/')
+        seen = self.page_texts(response.context['items'])
+        self.assertEqual(len(seen), 20)
+        cursor = response.context['next_cursor']
+        self.assertContains(response, f'/sarah/{self.post.id}/comments/?after={cursor}')
+        while cursor:
+            response = self.client.get(f'/sarah/{self.post.id}/comments/', {'after': cursor})
+            seen += self.page_texts(response.context['items'])
+            cursor = response.context['next_cursor']
+        expected = self.page_texts(Comment.objects.filter(post=self.post).order_by('created', 'id'))
+        self.assertEqual(seen, expected)
+        self.assertNotContains(response, 'Показать ещё')
+
+    @override_settings(CACHES=settings.TEST_CACHES)
+    def test_large_thread_costs_as_much_as_small(self):
+        small = Post.objects.create(author=self.user, text='Quiet post')
+        Comment.objects.create(post=small, author=self.user, text='Only comment')
+        counts = []
+        for post in (small, self.post):
+            self.client.get(f'/sarah/{post.id}/')
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(f'/sarah/{post.id}/')
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_comments_of_other_author_not_found(self):
+        User.objects.create_user(username="joe", password="12345678")
+        response = self.client.get(f'/joe/{self.post.id}/comments/')
+        self.assertEqual(response.status_code, 404)
 
-       
-        
 
+@override_settings(CACHES=settings.TEST_LOCMEM_CACHES)
+class PostDetailTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="sarah", email="connor.s@skynet.com", password="12345678")
+        self.reader = User.objects.create_user(username="joe", password="12345678")
+        self.group = Group.objects.create(title='Test_group', slug='test_gr', description='It is test group')
+        self.post = Post.objects.create(author=self.user, group=self.group, text='Post with sidebar')
+        Comment.objects.create(post=self.post, author=self.reader, text='First!')
+
+    @override_settings(CACHES=settings.TEST_CACHES)
+    def test_post_and_comments_in_two_queries(self):
+        # пост с автором, группой и счётчиками + первая страница комментариев
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/sarah/{self.post.id}/')
+        self.assertContains(response, 'Test_group')
+        self.assertContains(response, 'First!')
+
+    def test_post_of_other_author_not_found(self):
+        response = self.client.get(f'/joe/{self.post.id}/')
+        self.assertEqual(response.status_code, 404)
 
-    
+    def test_sidebar_refreshed_when_author_changes(self):
+        url = f'/sarah/{self.post.id}/'
+        self.assertContains(self.client.get(url), 'Подписчиков: 0')
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.assertContains(self.client.get(url), 'Подписчиков: 1')
+        self.user.first_name, self.user.last_name = 'Sarah', 'Connor'
+        self.user.save()
+        self.assertContains(self.client.get(url), 'Sarah Connor')
 
 
+@override_settings(CACHES=settings.TEST_LOCMEM_CACHES)
+class TimelineTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.reader = User.objects.create_user(username="reader", password="12345678")
+        self.author = User.objects.create_user(username="writer", password="12345678")
+        self.client.login(username='reader', password='12345678')
 
+    def feed_texts(self):
+        response = self.client.get("/follow/")
+        return [post.text for post in response.context['page']]
+
+    def test_new_post_fans_out_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(author=self.author, text='fresh')
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader, post__text='fresh').exists())
+        self.assertEqual(self.feed_texts(), ['fresh'])
+
+    def test_follow_backfills_and_unfollow_purges(self):
+        Post.objects.create(author=self.author, text='old one')
+        self.client.get("/writer/follow")
+        self.assertEqual(self.feed_texts(), ['old one'])
+        self.client.get("/writer/unfollow")
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed_texts(), [])
+
+    @override_settings(CACHES=settings.TEST_CACHES)
+    def test_cursor_walk_covers_feed_in_order(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(25):
+            Post.objects.create(author=self.author, text=f'Post number {i}')
+        expected = list(Post.objects.order_by('-pub_date', '-id').values_list('id', flat=True))
+        for fanout_limit in (5000, 0):
+            with self.settings(TIMELINE_FANOUT_LIMIT=fanout_limit):
+                seen, page = [], self.client.get('/follow/').context['page']
+                while True:
+                    seen.extend(post.id for post in page)
+                    if not page.has_next():
+                        break
+                    page = self.client.get('/follow/', {'after': page.next_cursor}).context['page']
+                self.assertEqual(seen, expected)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_posts_are_merged_at_read_time(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(author=self.author, text='for millions')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed_texts(), ['for millions'])
+
+
+@override_settings(CACHES=settings.TEST_LOCMEM_CACHES)
+class CountersTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username="sarah", password="12345678")
+        self.author = User.objects.create_user(username="Joe", password="12345678")
+        self.client.login(username='sarah', password='12345678')
 
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        self.client.post("/new/", {"text": "first"})
+        post = Post.objects.get(text="first")
+        self.client.post(f"/sarah/{post.id}/comment/", {"text": "nice"})
+        self.client.get("/Joe/follow")
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+        self.client.get("/Joe/unfollow")
+        self.assertEqual(self.stats(self.user).following_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+
+    def test_recount_command_repairs_counters(self):
+        post = Post.objects.create(author=self.author, text="text")
+        Comment.objects.create(author=self.user, post=post, text="hi")
+        Follow.objects.create(user=self.user, author=self.author)
+        UserStats.objects.update(posts_count=42, followers_count=42, following_count=42)
+        Post.objects.update(comment_count=42)
+
+        call_command("recount_stats", stdout=open(os.devnull, "w"))
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        self.assertEqual(self.stats(self.user).posts_count, 0)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+    def test_deleting_user_with_posts_comments_and_follows(self):
+        post = Post.objects.create(author=self.author, text="text")
+        Comment.objects.create(author=self.user, post=post, text="hi")
+        Comment.objects.create(author=self.author, post=post, text="hello")
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.author, author=self.user)
+        self.author.delete()
+        self.assertFalse(User.objects.filter(username="Joe").exists())
+        self.assertFalse(UserStats.objects.filter(user_id=self.author.pk).exists())
+        self.assertEqual(self.stats(self.user).following_count, 0)
+        self.assertEqual(self.stats(self.user).followers_count, 0)
+
+    def test_profile_shows_counters(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.client.get("/Joe/")
+        self.assertContains(response, "Подписчиков: 1")
 
+
+@override_settings(CACHES=settings.TEST_LOCMEM_CACHES)
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username="sarah", password="12345678")
+        self.group = Group.objects.create(title='Test_group', slug='test_gr', description='It is test group')
+        self.post = Post.objects.create(author=self.user, group=self.group, text='Conditional')
+
+    def assert_revalidates(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # дата изменения постов не покрывает счётчики, подписки и удаления
+        self.assertNotIn('Last-Modified', response)
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
+        return response['ETag']
+
+    def test_unchanged_pages_answer_not_modified(self):
+        for url in ('/', f'/group/{self.group.slug}', '/sarah/', f'/sarah/{self.post.id}/'):
+            self.assert_revalidates(url)
+
+    def test_new_comment_changes_validators(self):
+        url = f'/sarah/{self.post.id}/'
+        etag = self.assert_revalidates(url)
+        Comment.objects.create(author=self.user, post=self.post, text='new comment')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'new comment')
+
+    def test_if_modified_since_alone_does_not_hide_changes(self):
+        since = http_date(time.time() + 3600)
+        self.client.get('/sarah/')
+        Follow.objects.create(user=User.objects.create_user(username='reader'), author=self.user)
+        response = self.client.get('/sarah/', HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Подписчиков: 1')
+        other = Post.objects.create(author=self.user, text='Other')
+        self.client.get('/')
+        other.delete()
+        self.assertEqual(self.client.get('/', HTTP_IF_MODIFIED_SINCE=since).status_code, 200)
+
+    def test_validators_depend_on_user(self):
+        etag = self.assert_revalidates('/')
+        self.client.login(username='sarah', password='12345678')
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CACHES=settings.TEST_LOCMEM_CACHES)
+class ThumbnailPipelineTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username="sarah", password="12345678")
+        self.client.login(username='sarah', password='12345678')
+
+    def upload(self):
+        with open('img_test/1.jpg', 'rb') as img:
+            self.client.post("/new/", {'text': 'post with image', 'image': img})
+        return Post.objects.get(text='post with image')
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_thumbnail_is_ready_before_first_view(self):
+        post = self.upload()
+        _, thumbnail, _ = thumbnails.thumbnail_file(post.image, "960x339", {"crop": "center", "upscale": True})
+        self.assertTrue(thumbnail.exists())
+        response = self.client.get(f"/sarah/{post.id}/")
+        self.assertContains(response, thumbnail.url)
+
+    def test_pending_thumbnail_falls_back_to_original(self):
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            post = self.upload()
+            _, thumbnail, _ = thumbnails.thumbnail_file(post.image, "960x339", {"crop": "center", "upscale": True})
+            thumbnail.delete()
+            response = self.client.get(f"/sarah/{post.id}/")
+        self.assertTrue(schedule.called)
+        self.assertContains(response, post.image.url)
+
+    def test_worker_pool_generates_thumbnails(self):
+        with open('img_test/2.jpg', 'rb') as img:
+            post = Post.objects.create(author=self.user, text='pool', image=ImageFile(img, name='2.jpg'))
+        _, thumbnail, _ = thumbnails.thumbnail_file(post.image, "960x339", {"crop": "center", "upscale": True})
+        self.assertFalse(thumbnail.exists())
+        wait(thumbnails.schedule_all(post), timeout=60)
+        self.assertTrue(thumbnail.exists())
+
+
+@override_settings(CACHES=settings.TEST_LOCMEM_CACHES)
+class ImageIngestionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username="sarah", password="12345678")
+        self.client.login(username='sarah', password='12345678')
+
+    @staticmethod
+    def photo(size, name='photo.jpg'):
+        exif = Image.Exif()
+        exif[0x010F] = 'Phone maker ' * 1000
+        buffer = BytesIO()
+        Image.new('RGB', size, (200, 10, 10)).save(buffer, 'JPEG', exif=exif.tobytes())
+        buffer.seek(0)
+        buffer.name = name
+        return buffer
+
+    @override_settings(THUMBNAIL_WORKERS=0, POST_IMAGE_MAX_SIDE=1000)
+    def test_large_photo_is_reduced_and_dimensions_are_stored(self):
+        self.client.post("/new/", {'text': 'big photo', 'image': self.photo((4000, 3000))})
+        post = Post.objects.get(text='big photo')
+        self.assertEqual((post.image_width, post.image_height, post.image_format), (1000, 750, 'JPEG'))
+        with post.image.open('rb') as stored:
+            image = Image.open(stored)
+            self.assertEqual(image.size, (1000, 750))
+            self.assertNotIn('exif', image.info)
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000 * 1000)
+    def test_too_many_pixels_are_rejected(self):
+        response = self.client.post("/new/", {'text': 'huge photo', 'image': self.photo((2000, 1000))})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Post.objects.filter(text='huge photo').exists())
+
+    def test_truncated_photo_is_rejected(self):
+        # шум не сжимается, и половина файла - это обрезанные данные, а не заголовок
+        buffer = BytesIO()
+        Image.effect_noise((800, 600), 50).convert('RGB').save(buffer, 'JPEG')
+        data = buffer.getvalue()
+        truncated = BytesIO(data[:len(data) // 2])
+        truncated.name = 'broken.jpg'
+        response = self.client.post("/new/", {'text': 'broken photo', 'image': truncated})
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response, 'form', 'image', 'Не удалось прочитать картинку: файл повреждён или обрезан.')
+        self.assertFalse(Post.objects.filter(text='broken photo').exists())
+        post = Post.objects.create(author=self.user, text='old text')
+        truncated.seek(0)
+        response = self.client.post(f"/sarah/{post.id}/edit/", {'text': 'new text', 'image': truncated})
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response, 'form', 'image', 'Не удалось прочитать картинку: файл повреждён или обрезан.')
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'old text')
+
+
+@override_settings(CACHES=settings.TEST_LOCMEM_CACHES)
+class SearchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username="sarah", password="12345678")
+        self.other = User.objects.create_user(username="Joe", password="12345678")
+        self.group = Group.objects.create(title="Кино", slug="cinema", description="Про кино")
+
+    def found(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [post.pk for post in response.context['page']]
+
+    def test_post_found_by_text_and_by_comment(self):
+        by_text = Post.objects.create(author=self.user, text="Смотрели терминатора вчера")
+        by_comment = Post.objects.create(author=self.other, text="Что посмотреть?")
+        Comment.objects.create(post=by_comment, author=self.user, text="Терминатор, конечно")
+        Post.objects.create(author=self.user, text="Про котиков")
+        self.assertCountEqual(self.found("/search/?q=терминатора"), [by_text.pk])
+        self.assertCountEqual(self.found("/search/?q=Терминатор"), [by_comment.pk])
+        self.assertEqual(self.found("/search/?q=котиков OR"), [])
+
+    def test_filters_by_group_and_author(self):
+        in_group = Post.objects.create(author=self.user, text="новости", group=self.group)
+        by_other = Post.objects.create(author=self.other, text="новости")
+        self.assertEqual(self.found("/search/?q=новости&group=cinema"), [in_group.pk])
+        self.assertEqual(self.found("/search/?q=новости&author=Joe"), [by_other.pk])
+
+    def test_index_follows_edits_and_deletes(self):
+        post = Post.objects.create(author=self.user, text="старый текст")
+        post.text = "новый текст"
+        post.save()
+        self.assertEqual(self.found("/search/?q=старый"), [])
+        self.assertEqual(self.found("/search/?q=новый"), [post.pk])
+        post.delete()
+        self.assertEqual(self.found("/search/?q=новый"), [])
+
+    def test_results_are_paged_by_cursor(self):
+        for i in range(25):
+            Post.objects.create(author=self.user, text="слон %s" % i)
+        response = self.client.get("/search/?q=слон&author=sarah")
+        page = response.context['page']
+        seen = [post.pk for post in page]
+        self.assertContains(response, "q=%D1%81%D0%BB%D0%BE%D0%BD&amp;author=sarah&amp;after=")
+        while page.has_next():
+            response = self.client.get("/search/?q=слон&author=sarah&after=" + page.next_cursor)
+            page = response.context['page']
+            seen += [post.pk for post in page]
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+    def test_admin_search_uses_index(self):
+        User.objects.create_superuser(username="admin", email="a@a.ru", password="12345678")
+        self.client.login(username="admin", password="12345678")
+        Post.objects.create(author=self.user, text="зелёный крокодил")
+        Post.objects.create(author=self.user, text="синий кит")
+        response = self.client.get("/admin/posts/post/?q=крокодил")
+        self.assertContains(response, "зелёный крокодил")
+        self.assertNotContains(response, "синий кит")
+
+
+@override_settings(CACHES=settings.TEST_LOCMEM_CACHES)
+class SeedBenchmarkTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def seed(self, **options):
+        options = dict(dict(users=8, groups=2, posts=60, comments=2, follows=3, stdout=StringIO()), **options)
+        call_command('seed_data', **options)
+
+    def test_seed_creates_consistent_data(self):
+        self.seed()
+        self.assertEqual(User.objects.filter(username__startswith='seed_').count(), 8)
+        self.assertEqual(Post.objects.count(), 60)
+        dates = list(Post.objects.order_by('pk').values_list('pub_date', flat=True))
+        self.assertEqual(dates, sorted(dates))
+        self.assertLess(dates[0], dates[-1] - timezone.timedelta(days=30))
+        # счётчики и ленты совпадают с тем, что дали бы сигналы
+        for stats in UserStats.objects.filter(user__username__startswith='seed_'):
+            self.assertEqual(stats.posts_count, Post.objects.filter(author=stats.user_id).count())
+            self.assertEqual(stats.followers_count, Follow.objects.filter(author=stats.user_id).count())
+        for follow in Follow.objects.all():
+            self.assertEqual(
+                TimelineEntry.objects.filter(user=follow.user_id, author=follow.author_id).count(),
+                Post.objects.filter(author=follow.author_id).count())
+
+    def test_seed_refuses_existing_prefix(self):
+        self.seed(posts=1)
+        with self.assertRaises(CommandError):
+            self.seed(posts=1)
+
+    def test_benchmark_reports_every_url_and_compares(self):
+        self.seed()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            call_command('benchmark', repeat=2, warmup=0, save=path, stdout=StringIO())
+            saved = benchmark.load(path)
+            self.assertFalse(set(saved) & benchmark.WRITE_VIEWS)
+            self.assertEqual(saved['index']['status'], 200)
+            self.assertGreater(saved['index']['queries'], 0)
+            self.assertGreater(saved['index']['bytes'], 0)
+            out = StringIO()
+            call_command('benchmark', 'index', repeat=2, warmup=0, baseline=path, stdout=out)
+            self.assertIn('index: p50', out.getvalue())
+            saved['index']['p50'] = saved['index']['p99'] = 0.0001
+            benchmark.save(saved, path)
+            with self.assertRaises(CommandError):
+                call_command('benchmark', 'index', repeat=2, warmup=0, baseline=path,
+                             max_regression=50, stdout=StringIO())
+
+    def test_benchmark_render_reports_cost_per_post(self):
+        self.seed()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'render.json')
+            call_command('benchmark_render', repeat=2, warmup=0, save=path, stdout=StringIO())
+            saved = benchmark.load(path)
+            self.assertEqual(set(saved), {'cached', 'uncached', 'compile'})
+            self.assertEqual(saved['uncached']['posts'], 10)
+            self.assertGreater(saved['compile']['p50'], 0)
+            out = StringIO()
+            call_command('benchmark_render', repeat=2, warmup=0, baseline=path, stdout=out)
+            self.assertIn('uncached: p50', out.getvalue())
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 0.5), 50)
+        self.assertEqual(benchmark.percentile(values, 0.99), 99)
+        self.assertEqual(benchmark.percentile([7], 0.99), 7)
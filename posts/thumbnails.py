@@ -0,0 +1,159 @@
+"""
+Фоновая подготовка превью картинок постов.
+
+Превью всех размеров из settings.THUMBNAIL_GEOMETRIES готовятся в пуле
+процессов сразу после сохранения поста, а не при первом показе. Пока
+превью нет, ready_thumbnail() возвращает None и шаблон показывает
+запасной вариант.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.db.models import F
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.parsers import parse_geometry
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def geometries():
+    return getattr(settings, "THUMBNAIL_GEOMETRIES", [])
+
+
+def thumbnail_options(source, options):
+    """Дополняет опции так же, как sorl при get_thumbnail(), чтобы совпали имена файлов."""
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault("format", backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_file(image, geometry, options):
+    source = ImageFile(image)
+    options = thumbnail_options(source, options)
+    name = default.backend._get_thumbnail_filename(source, geometry, options)
+    return source, ImageFile(name, default.storage), options
+
+
+def render_thumbnail(source_name, thumbnail_name, geometry, options):
+    """Декодирует исходник и записывает превью. Выполняется в процессе пула."""
+    thumbnail = ImageFile(thumbnail_name, default.storage)
+    if thumbnail.exists():
+        return thumbnail_name
+    source_image = default.engine.get_image(ImageFile(source_name))
+    try:
+        options = dict(options, image_info=default.engine.get_image_info(source_image))
+        ratio = default.engine.get_image_ratio(source_image, options)
+        image = default.engine.create(source_image, parse_geometry(geometry, ratio), options)
+        default.engine.write(image, options, thumbnail)
+    finally:
+        default.engine.cleanup(source_image)
+    return thumbnail_name
+
+
+def _init_worker():
+    # процесс пула запускается с нуля (spawn) и сам настраивает Django;
+    # к базе он не обращается, только к файлам
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yatube.settings")
+    import django
+    django.setup()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+    return _executor
+
+
+def _finished(post_id, name, future):
+    with _lock:
+        _pending.discard(name)
+    if future.exception() is not None:
+        logger.error("Не удалось подготовить превью %s", name, exc_info=future.exception())
+        return
+    from .models import Post
+    try:
+        # новая версия поста сбрасывает закешированную разметку с заглушкой
+        Post.objects.filter(pk=post_id).update(version=F("version") + 1)
+    except DatabaseError as error:
+        # не страшно: заглушка останется в кеше до следующей правки поста
+        logger.info("Не удалось обновить версию поста %s: %s", post_id, error)
+    finally:
+        close_old_connections()
+
+
+def schedule(post, geometry, options):
+    """Ставит превью в очередь, если его ещё нет и оно не готовится."""
+    source, thumbnail, full_options = thumbnail_file(post.image, geometry, options)
+    with _lock:
+        if thumbnail.name in _pending or thumbnail.exists():
+            return None
+        _pending.add(thumbnail.name)
+    args = (source.name, thumbnail.name, geometry, full_options)
+    if not settings.THUMBNAIL_WORKERS:
+        # без пула готовим сразу, в текущем процессе
+        try:
+            render_thumbnail(*args)
+        finally:
+            with _lock:
+                _pending.discard(thumbnail.name)
+        return None
+    future = _get_executor().submit(render_thumbnail, *args)
+    future.add_done_callback(lambda future: _finished(post.pk, thumbnail.name, future))
+    return future
+
+
+def schedule_all(post):
+    """Ставит в очередь превью всех настроенных размеров для картинки поста."""
+    if not post.image:
+        return []
+    futures = [schedule(post, geometry, options) for geometry, options in geometries()]
+    return [future for future in futures if future is not None]
+
+
+def ready_thumbnail(post, geometry, **options):
+    """
+    Готовое превью картинки поста или None. Исходник в запросе не декодируем:
+    если превью ещё нет, ставим его в очередь.
+    """
+    if not post.image:
+        return None
+    source, thumbnail, _ = thumbnail_file(post.image, geometry, options)
+    cached = default.kvstore.get(thumbnail)
+    if cached:
+        return cached
+    if not thumbnail.exists():
+        schedule(post, geometry, options)
+        if not thumbnail.exists():
+            return None
+    # файл уже записан пулом - регистрируем его в хранилище ключей sorl;
+    # размеры исходника берём из поста, а не из файла
+    if post.image_width and post.image_height:
+        source.set_size((post.image_width, post.image_height))
+    default.kvstore.get_or_set(source)
+    default.kvstore.set(thumbnail, source)
+    return thumbnail
@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+BATCH_SIZE = 500
+# сортировка ленты подписок: по полям записи TimelineEntry, чтобы страница
+# читалась из индекса timeline_user_date_idx без сортировки
+TIMELINE_ORDERING = ("-feed_date", "-feed_post")
+
+
+def fanout_limit():
+    # авторы, у которых подписчиков больше этого числа, не раскладываются по лентам
+    # при публикации: их посты подмешиваются в ленту при чтении
+    return getattr(settings, "TIMELINE_FANOUT_LIMIT", 5000)
+
+
+def backfill_size():
+    # сколько последних постов автора добавляется в ленту при подписке
+    return getattr(settings, "TIMELINE_BACKFILL_SIZE", 500)
+
+
+def is_celebrity(author_id):
+    return UserStats.objects.filter(user_id=author_id, followers_count__gt=fanout_limit()).exists()
+
+
+def celebrity_authors(user):
+    """id авторов из подписок пользователя, посты которых не раскладываются."""
+    return list(
+        Follow.objects.filter(user=user, author__stats__followers_count__gt=fanout_limit())
+        .values_list("author", flat=True)
+    )
+
+
+def _entries(post, user_ids):
+    return [
+        TimelineEntry(user_id=user_id, post_id=post.id, author_id=post.author_id, pub_date=post.pub_date)
+        for user_id in user_ids
+    ]
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам всех подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = (
+        Follow.objects.filter(author_id=post.author_id, user__isnull=False)
+        .values_list("user", flat=True)
+        .iterator()
+    )
+    batch = []
+    for user_id in followers:
+        batch.append(user_id)
+        if len(batch) == BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(_entries(post, batch), ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(_entries(post, batch), ignore_conflicts=True)
+
+
+def backfill(user_id, author_id):
+    """После подписки добавляет в ленту последние посты автора."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by("-pub_date", "-id")[:backfill_size()]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=post.id, author_id=author_id, pub_date=post.pub_date)
+            for post in posts.only("id", "pub_date")
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def refill(author_id):
+    """
+    Раскладывает последние посты автора по лентам всех его подписчиков.
+    Нужно после массовой загрузки, когда сигналы не срабатывали; записи
+    создаются одним INSERT ... SELECT, без объектов в памяти.
+    """
+    if is_celebrity(author_id):
+        return
+    sql = (
+        "INSERT INTO {entry} (user_id, post_id, author_id, pub_date) "
+        "SELECT f.user_id, p.id, p.author_id, p.pub_date FROM {follow} AS f, ("
+        " SELECT id, author_id, pub_date FROM {post} WHERE author_id = %s"
+        " ORDER BY pub_date DESC, id DESC LIMIT %s"
+        ") AS p WHERE f.author_id = %s AND f.user_id IS NOT NULL "
+        "ON CONFLICT DO NOTHING"
+    ).format(entry=TimelineEntry._meta.db_table, follow=Follow._meta.db_table, post=Post._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [author_id, backfill_size(), author_id])
+
+
+def purge(user_id, author_id):
+    """После отписки убирает посты автора из ленты."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def timeline_posts(user):
+    """
+    Посты ленты подписок: чтение по индексу из TimelineEntry
+    плюс посты "популярных" авторов, которые подмешиваются при чтении.
+    Сортировать и листать по TIMELINE_ORDERING.
+    """
+    celebrities = celebrity_authors(user)
+    if not celebrities:
+        return Post.objects.filter(timeline_entries__user=user).annotate(
+            feed_date=F("timeline_entries__pub_date"), feed_post=F("timeline_entries__post_id"))
+    entries = TimelineEntry.objects.filter(user=user).values("post")
+    return Post.objects.filter(Q(id__in=entries) | Q(author_id__in=celebrities)).annotate(
+        feed_date=F("pub_date"), feed_post=F("id"))
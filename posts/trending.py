@@ -0,0 +1,153 @@
+"""
+Популярное: посты и группы с наибольшей активностью за последние часы.
+
+Новый пост и новый комментарий добавляют единицу в счётчик поста за
+текущий интервал времени (TrendCounter, один интервал -
+settings.TRENDING_BUCKET_SECONDS), это одна вставка с ON CONFLICT
+без чтения posts_comment.
+
+Команда manage.py update_trending (запускать периодически или с
+--interval) удаляет интервалы старше окна settings.TRENDING_WINDOW,
+складывает оставшиеся с затуханием settings.TRENDING_DECAY за каждый
+интервал давности и кладёт в кеш готовые рейтинги: постов всего сайта,
+постов каждой группы и групп. Страницы листают готовый рейтинг по курсору
+и читают из базы только посты текущей страницы.
+"""
+import time
+from bisect import bisect_right
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .models import Group, Post, TrendCounter
+from .pagination import CursorPage
+
+
+def bucket_seconds():
+    return getattr(settings, "TRENDING_BUCKET_SECONDS", 60 * 60)
+
+
+def window():
+    # сколько последних интервалов учитывается в рейтинге
+    return getattr(settings, "TRENDING_WINDOW", 24)
+
+
+def decay():
+    # вес активности, которой на один интервал больше
+    return getattr(settings, "TRENDING_DECAY", 0.8)
+
+
+def post_weight():
+    # новый пост весит как столько комментариев
+    return getattr(settings, "TRENDING_POST_WEIGHT", 3)
+
+
+def list_size():
+    return getattr(settings, "TRENDING_SIZE", 500)
+
+
+def current_bucket(now=None):
+    return int((time.time() if now is None else now) // bucket_seconds())
+
+
+def cache_key(scope):
+    return "trending:%s" % scope
+
+
+def record(post_id, comments=0, posts=0, now=None):
+    """Добавляет активность посту в текущем интервале."""
+    table = TrendCounter._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (post_id, group_id, bucket, comments, posts) "
+            f"SELECT id, group_id, %s, %s, %s FROM {Post._meta.db_table} WHERE id = %s "
+            f"ON CONFLICT (post_id, bucket) DO UPDATE SET "
+            f"comments = comments + excluded.comments, posts = posts + excluded.posts",
+            [current_bucket(now), comments, posts, post_id],
+        )
+
+
+def _ranked(scores):
+    return sorted(((score, pk) for pk, score in scores.items()), key=lambda entry: (-entry[0], entry[1]))
+
+
+def rebuild(now=None):
+    """Сдвигает окно и пересчитывает рейтинги в кеше. Возвращает число постов в рейтинге."""
+    bucket = current_bucket(now)
+    oldest = bucket - window() + 1
+    TrendCounter.objects.filter(bucket__lt=oldest).delete()
+
+    post_scores = defaultdict(float)
+    group_posts = defaultdict(dict)
+    group_scores = defaultdict(float)
+    counters = TrendCounter.objects.filter(bucket__gte=oldest).values_list(
+        "post_id", "group_id", "bucket", "comments", "posts")
+    for post_id, group_id, post_bucket, comments, posts in counters.iterator():
+        activity = (comments + posts * post_weight()) * decay() ** (bucket - post_bucket)
+        post_scores[post_id] += activity
+        if group_id:
+            group_posts[group_id][post_id] = post_scores[post_id]
+            group_scores[group_id] += activity
+
+    size = list_size()
+    data = {
+        cache_key("posts"): _ranked(post_scores)[:size],
+        cache_key("groups"): _ranked(group_scores)[:size],
+    }
+    # группы, которые выпали из рейтинга, тоже получают пустой список
+    previous = cache.get(cache_key("group_ids")) or []
+    for group_id in set(previous) | set(group_posts):
+        data[cache_key("group:%s" % group_id)] = _ranked(group_posts.get(group_id, {}))[:size]
+    data[cache_key("group_ids")] = list(group_posts)
+    cache.set_many(data, None)
+    return len(post_scores)
+
+
+def ranked_posts(group=None):
+    """[(оценка, id поста), ...] по убыванию оценки."""
+    scope = "posts" if group is None else "group:%s" % group.pk
+    return cache.get(cache_key(scope)) or []
+
+
+def top_groups(limit=10):
+    """[(группа, оценка), ...] - самые активные группы."""
+    ranked = (cache.get(cache_key("groups")) or [])[:limit]
+    groups = Group.objects.in_bulk([pk for _, pk in ranked])
+    return [(groups[pk], score) for score, pk in ranked if pk in groups]
+
+
+class TrendingPaginator:
+    """
+    Листает готовый рейтинг [(оценка, id), ...] по курсору "оценка_id":
+    следующая страница начинается сразу за последним показанным постом.
+    """
+
+    def __init__(self, ranked, per_page):
+        self.ranked = ranked
+        self.per_page = per_page
+
+    def cursor_for(self, post):
+        return "%r_%d" % (post.trend_score, post.pk)
+
+    def _start(self, cursor):
+        try:
+            score, pk = cursor.split("_")
+            key = (-float(score), int(pk))
+        except ValueError:
+            return 0
+        return bisect_right([(-score, pk) for score, pk in self.ranked], key)
+
+    def page(self, after=None):
+        start = self._start(after) if after else 0
+        chunk = self.ranked[start:start + self.per_page + 1]
+        shown = chunk[:self.per_page]
+        posts = Post.objects.select_related("author", "group").in_bulk([pk for _, pk in shown])
+        items = []
+        for score, pk in shown:
+            # удалённый после пересчёта пост просто пропускаем
+            if pk in posts:
+                posts[pk].trend_score = score
+                items.append(posts[pk])
+        return CursorPage(items, self, has_next=len(chunk) > self.per_page, has_previous=False)
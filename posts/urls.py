@@ -1,24 +1,38 @@
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 urlpatterns = [
     path("", views.index, name="index"),
     path("group/<str:slug>",views.group_posts, name='group'),
+    # ленты RSS и Atom
+    path("feed/rss/", feeds.index_feed, {"fmt": "rss"}, name="feed_rss"),
+    path("feed/atom/", feeds.index_feed, {"fmt": "atom"}, name="feed_atom"),
+    path("group/<str:slug>/rss/", feeds.group_feed, {"fmt": "rss"}, name="group_rss"),
+    path("group/<str:slug>/atom/", feeds.group_feed, {"fmt": "atom"}, name="group_atom"),
+    # популярное за последние часы
+    path("trending/", views.trending, name="trending"),
+    path("group/<str:slug>/trending/", views.group_trending, name="group_trending"),
 
     #раздел добавления публикации
     path("new/", views.new_post, name="new_post"),
 
     path("follow/", views.follow_index, name="follow_index"),
+    # поиск по постам и комментариям
+    path("search/", views.search, name="search"),
     path("<username>/follow", views.profile_follow, name="profile_follow"), 
     path("<username>/unfollow", views.profile_unfollow, name="profile_unfollow"),
     
     # Профайл пользователя
     path("<username>/", views.profile, name="profile"),
+    path("<username>/rss/", feeds.author_feed, {"fmt": "rss"}, name="profile_rss"),
+    path("<username>/atom/", feeds.author_feed, {"fmt": "atom"}, name="profile_atom"),
     # Просмотр записи
     path("<username>/<int:post_id>/", views.post_view, name="post"),
     path("<username>/<int:post_id>/edit/", views.post_edit, name="post_edit"),
     path("<username>/<int:post_id>/comment/", views.add_comment, name="add_comment"),
+    # следующие страницы комментариев
+    path("<username>/<int:post_id>/comments/", views.post_comments, name="post_comments"),
 
 
 ]
\ No newline at end of file
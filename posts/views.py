@@ -1,35 +1,68 @@
 import datetime
+from urllib.parse import urlencode
 from django.shortcuts import render, redirect, get_object_or_404
 from django.http import HttpResponse
-from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
+from django.db import IntegrityError
 #from django.views.decorators.cache import cache_page
 from .models import Post, Group, User, Comment, Follow
 from .forms import PostForm, CommentForm
+from .pagination import COMMENT_ORDERING, COMMENTS_PAGE_SIZE, PAGE_SIZE, CursorPaginator, paginate
+from .conditional import validators, not_modified, add_validators
+from .timeline import TIMELINE_ORDERING, timeline_posts
+from . import thumbnails, writes
+from . import search as post_search
+from . import suggestions as follow_suggestions
+from . import trending as post_trending
+from yatube.db_router import read_from_replica
+from yatube.ratelimit import rate_limit
 
 
 # Убрал лишнии комментарии, оставил только важные
 
+# ленты и страницы постов только читают - их можно отдавать из реплики
 #@cache_page(20)
+@read_from_replica
 def index(request):
-        post_list = Post.objects.order_by("-pub_date").all()
-        paginator = Paginator(post_list, 10)  # показывать по 10 записей на странице.
-        page_number = request.GET.get('page')  # переменная в URL с номером запрошенной страницы
-        page = paginator.get_page(page_number)  # получить записи с нужным смещением
-
-        return render(request, 'index.html', {'page': page, 'paginator': paginator})
+        post_list = Post.objects.select_related('author', 'group')
+        # по 10 записей на странице: ?page=<номер> или курсоры ?after=/?before=
+        paginator, page = paginate(request, post_list)
+        # если у клиента та же страница - отвечаем 304 без отрисовки шаблона
+        etag, last_modified = validators(request, page, page.has_next())
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+                response = render(request, 'index.html', {'page': page, 'paginator': paginator})
+        return add_validators(response, etag, last_modified)
 
 
+@read_from_replica
 def group_posts(request, slug):
         # функция get_object_or_404 позволяет получить объект из базы данных
         # по заданным критериям или вернуть сообщение об ошибке если объект не найден
         group = get_object_or_404(Group, slug=slug)
-        posts = Post.objects.filter(group=group).order_by(
-                "-pub_date").all()  # filter - аналог WHERE group_id = {group_id}
-        paginator = Paginator(posts, 10)
-        page_number = request.GET.get('page')
-        page = paginator.get_page(page_number)
-        return render(request, "group.html", {"group": group, "posts": posts, 'paginator': paginator, 'page': page})
+        posts = Post.objects.select_related('author', 'group').filter(group=group)  # filter - аналог WHERE group_id = {group_id}
+        paginator, page = paginate(request, posts)
+        etag, last_modified = validators(request, page, page.has_next(),
+                                         group.title, group.description)
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+                response = render(request, "group.html", {"group": group, 'paginator': paginator, 'page': page})
+        return add_validators(response, etag, last_modified)
+
+# популярное готовит заранее команда update_trending (posts/trending.py)
+@read_from_replica
+def trending(request):
+        paginator = post_trending.TrendingPaginator(post_trending.ranked_posts(), PAGE_SIZE)
+        page = paginator.page(after=request.GET.get('after'))
+        return render(request, "trending.html", {'page': page, 'paginator': paginator,
+                                                 'groups': post_trending.top_groups()})
+
+@read_from_replica
+def group_trending(request, slug):
+        group = get_object_or_404(Group, slug=slug)
+        paginator = post_trending.TrendingPaginator(post_trending.ranked_posts(group), PAGE_SIZE)
+        page = paginator.page(after=request.GET.get('after'))
+        return render(request, "trending.html", {'page': page, 'paginator': paginator, 'group': group})
 
 # Оставил эту функцию как важный альтернативный петтерн 
 #@login_required здесь не получается так как нужно перенаправлять пользователя на главную стр если он не прошел регистрацию а хочет добавить пост
@@ -53,6 +86,7 @@ def group_posts(request, slug):
 #         return redirect(
 #                 '/')  # Если пользователь не авторизован и пытается войти на стр new то его сразу перенаправляет на главную
 
+@rate_limit("post")
 def new_post(request):
         if request.user.is_authenticated:  # Праверка авторизации
                 if request.method == 'POST':
@@ -60,42 +94,83 @@ def new_post(request):
                         if form.is_valid():
                                 post = form.save(commit=False)
                                 post.author = request.user
-                                post.save()
+                                # пост и счётчики автора (posts/signals.py) пишутся одной транзакцией
+                                # через очередь записей (posts/writes.py)
+                                writes.run(post.save)
+                                # превью картинки готовится в фоне, а не при первом показе
+                                thumbnails.schedule_all(post)
                                 return redirect('/')
-                form = PostForm()
+                else:
+                        form = PostForm()
+                # при ошибке показываем ту же форму с сообщениями
                 return render(request, 'new.html', {'form': form})
         return redirect(
                 '/')  # Если пользователь не авторизован и пытается войти на стр new то его сразу перенаправляет на главную
 
 
+@read_from_replica
 def profile(request, username):
-        author_profile = User.objects.get(username=username)
-        posts = Post.objects.filter(author=author_profile).order_by("-pub_date")
-        paginator = Paginator(posts, 10)
-        page_number = request.GET.get('page')
-        page = paginator.get_page(page_number)
+        author_profile = User.objects.select_related('stats').get(username=username)
+        posts = Post.objects.select_related('author', 'group').filter(author=author_profile)
+        paginator, page = paginate(request, posts)
         following = False
         #Follow.objects.filter(user=request.user).exclude(author=author).count() == 0:
         my_profile = False
         if request.user.is_authenticated:
-                following = Follow.objects.filter(user=request.user).filter(author=author_profile)
+                following = Follow.objects.filter(user=request.user).filter(author=author_profile).exists()
                 my_profile = request.user
-        return render(request, "profile.html",
-                      {"posts": posts, "username": username, "author_profile": author_profile, 'page': page,
-                       'paginator': paginator, 'following':following, 'my_profile': my_profile})
+        stats = author_profile.stats
+        # подсказки "кого почитать" готовы заранее (posts/suggestions.py)
+        suggestions = follow_suggestions.for_user(request.user)
+        etag, last_modified = validators(
+                request, page, page.has_next(), following, author_profile.get_full_name(),
+                stats.posts_count, stats.followers_count, stats.following_count, suggestions)
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+                response = render(request, "profile.html",
+                                  {"posts": posts, "username": username, "author_profile": author_profile, 'page': page,
+                                   'paginator': paginator, 'following':following, 'my_profile': my_profile,
+                                   'suggestions': suggestions})
+        return add_validators(response, etag, last_modified)
 
 
+@read_from_replica
 def post_view(request, username, post_id):
-        #author_profile = User.objects.get(username=username)
-        #post = Post.objects.filter(author=author_profile).get(id=post_id)
-        author_profile = get_object_or_404(User, username=username)
-        post = get_object_or_404(Post, id=post_id)
-        number = Post.objects.filter(author=author_profile).count()
+        # пост, автор, группа и счётчики автора - одним запросом; пост ищем только у этого автора
+        post = get_object_or_404(Post.objects.select_related('author', 'group', 'author__stats'),
+                                 id=post_id, author__username=username)
+        author_profile = post.author
+        stats = author_profile.stats
+        number = stats.posts_count
+        # версия и дата изменения поста меняются и при новых комментариях
+        etag, last_modified = validators(
+                request, [post], author_profile.get_full_name(),
+                stats.posts_count, stats.followers_count, stats.following_count)
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+                return add_validators(response, etag, last_modified)
         form = CommentForm()
-        items = Comment.objects.filter(post=post).order_by("created")
-        return render(request, "post.html",
-                      {"post": post, "username": username, 
-                      "author_profile": author_profile, "number": number, "form": form, "items":items})
+        # сразу показываем первую страницу комментариев, остальные подгружает post_comments
+        comments = Comment.objects.select_related('author').filter(post=post)
+        items = comments.order_by(*COMMENT_ORDERING)[:COMMENTS_PAGE_SIZE]
+        next_cursor = None
+        if post.comment_count > COMMENTS_PAGE_SIZE and items:
+                next_cursor = CursorPaginator(comments, COMMENTS_PAGE_SIZE, COMMENT_ORDERING).cursor_for(items[len(items) - 1])
+        response = render(request, "post.html",
+                          {"post": post, "username": username, 
+                          "author_profile": author_profile, "number": number, "form": form, "items":items,
+                           "next_cursor": next_cursor})
+        return add_validators(response, etag, last_modified)
+
+@read_from_replica
+def post_comments(request, username, post_id):
+        """Следующая страница комментариев к посту (кусок HTML для кнопки "Показать ещё")."""
+        post = get_object_or_404(Post.objects.select_related('author'), id=post_id, author__username=username)
+        paginator = CursorPaginator(Comment.objects.select_related('author').filter(post=post),
+                                    COMMENTS_PAGE_SIZE, COMMENT_ORDERING)
+        page = paginator.page(after=request.GET.get("after"))
+        return render(request, "comments_page.html",
+                      {"post": post, "items": page, "next_cursor": page.next_cursor})
 
 @login_required
 def post_edit(request, username, post_id):
@@ -108,7 +183,8 @@ def post_edit(request, username, post_id):
 
     if request.method == "POST":
         if form.is_valid():
-            form.save()
+            post = form.save()
+            thumbnails.schedule_all(post)
             return redirect("post", username=request.user.username, post_id=post_id)
 
     return render(
@@ -116,38 +192,60 @@ def post_edit(request, username, post_id):
     )
     
 @login_required
+@rate_limit("comment")
 def add_comment(request, username, post_id):       
         post = get_object_or_404(Post, pk=post_id)
         if request.method == 'POST':
                 form = CommentForm(request.POST)
                 if form.is_valid():                      
-                        Comment.objects.create(author=request.user, post=post, text=form.cleaned_data['text'])
+                        writes.run(Comment.objects.create, author=request.user, post=post,
+                                   text=form.cleaned_data['text'])
         return redirect('post',username, post_id)
 
 # Куда будут выведены посты авторов, на которых подписан текущий пользователь.
 @login_required
+@read_from_replica
 def follow_index(request):
-        f = Follow.objects.filter(user=request.user).values('author')
-        post_list=Post.objects.select_related('author').filter(author__in=f).order_by("-pub_date")
-        paginator = Paginator(post_list, 10)  
-        page_number = request.GET.get('page')  
-        page = paginator.get_page(page_number)  
+        # лента собирается заранее при публикации (см. posts/timeline.py)
+        post_list = timeline_posts(request.user).select_related('author', 'group')
+        paginator, page = paginate(request, post_list, ordering=TIMELINE_ORDERING)
+
+        return render(request, 'follow.html', {'page': page, 'paginator': paginator,
+                                               'suggestions': follow_suggestions.for_user(request.user)})
 
-        return render(request, 'follow.html', {'page': page, 'paginator': paginator})
+def search(request):
+        text = request.GET.get('q', '').strip()
+        group = request.GET.get('group', '').strip()
+        author = request.GET.get('author', '').strip()
+        paginator, page = None, None
+        if text:
+                paginator, page = post_search.search(request, text, group or None, author or None)
+        # параметры поиска сохраняем в ссылках паджинатора
+        query = urlencode([(name, value) for name, value in
+                           (('q', text), ('group', group), ('author', author)) if value])
+        return render(request, 'search.html', {'page': page, 'paginator': paginator, 'q': text,
+                                               'group': group, 'author': author, 'query': query})
 
 # Подписки на интересного автора
 @login_required
+@rate_limit("follow", methods=("GET", "POST"))
 def profile_follow(request, username):
         author = User.objects.get(username=username)
-        if request.user.username != username and Follow.objects.filter(user=request.user, author=author).count() == 0 :
-                Follow.objects.create(user=request.user, author=author)
+        if request.user.username != username:
+                # повторную подписку отсекает ограничение уникальности (user, author),
+                # без предварительной проверки, которую два запроса могут пройти одновременно
+                try:
+                        writes.run(Follow.objects.create, user=request.user, author=author)
+                except IntegrityError:
+                        pass
         return redirect('profile', username)
 
 # Отписка от автора
 @login_required
+@rate_limit("follow", methods=("GET", "POST"))
 def profile_unfollow(request, username):
         author = User.objects.get(username=username)
-        Follow.objects.filter(author=author, user=request.user).delete()
+        writes.run(Follow.objects.filter(author=author, user=request.user).delete)
         return redirect('profile', request.user.username)
 
 
@@ -0,0 +1,118 @@
+"""
+Координатор коротких пишущих транзакций.
+
+SQLite пропускает только одного писателя за раз. Внутри процесса
+записи выстраиваются в очередь на блокировке, поэтому потоки одного
+воркера не толкаются за блокировку базы. Если базу держит другой
+процесс ("database is locked" при начале транзакции, во время записи или
+при COMMIT), транзакция откатывается и запись повторяется целиком с
+растущей паузой. Поэтому func должна быть безопасна для повтора - как
+create() или save(). Остальные ошибки (например, IntegrityError)
+пробрасываются как есть. Внутри чужой транзакции повторяется только её
+начало: блокировку держит внешняя транзакция, и повтор записи не поможет.
+
+Очередь ограничена, но только в пределах процесса: в каждом воркере
+одновременно выполняются или ждут не больше settings.WRITE_MAX_IN_FLIGHT
+записей, так что N воркеров пускают до N * WRITE_MAX_IN_FLIGHT. Между
+процессами записи разводит сама SQLite (её блокировка и повторы выше).
+Запись, которой не досталось места за settings.WRITE_QUEUE_TIMEOUT
+секунд, получает Overloaded - лучше сразу ответить 503, чем копить
+ждущие запросы, пока база занята.
+
+    writes.run(Comment.objects.create, post=post, author=user, text=text)
+"""
+import random
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, transaction
+
+_locks = {}
+_slots = {}
+_locks_guard = threading.Lock()
+_local = threading.local()
+
+
+class Overloaded(Exception):
+    """Очередь записей переполнена."""
+
+
+def attempts():
+    return getattr(settings, "WRITE_RETRY_ATTEMPTS", 5)
+
+
+def base_delay():
+    # пауза перед первым повтором, дальше удваивается
+    return getattr(settings, "WRITE_RETRY_DELAY", 0.05)
+
+
+def max_in_flight():
+    # на один процесс-воркер
+    return getattr(settings, "WRITE_MAX_IN_FLIGHT", 8)
+
+
+def queue_timeout():
+    return getattr(settings, "WRITE_QUEUE_TIMEOUT", 2)
+
+
+def _lock(using):
+    with _locks_guard:
+        return _locks.setdefault(using, threading.RLock())
+
+
+def _slot(using):
+    limit = max_in_flight()
+    with _locks_guard:
+        return _slots.setdefault((using, limit), threading.BoundedSemaphore(limit))
+
+
+def is_locked(error):
+    message = str(error).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+def run(func, *args, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Выполняет func(*args, **kwargs) в транзакции, по одной записи за раз."""
+    if getattr(_local, "depth", 0):
+        # вложенная запись уже заняла место в очереди
+        return _run(func, args, kwargs, using)
+    slot = _slot(using)
+    if not slot.acquire(timeout=queue_timeout()):
+        raise Overloaded("слишком много записей в очереди")
+    _local.depth = 1
+    try:
+        return _run(func, args, kwargs, using)
+    finally:
+        _local.depth = 0
+        slot.release()
+
+
+def _run(func, args, kwargs, using):
+    # запись целиком повторяем, только если транзакция наша, а не вложенная
+    own_transaction = not transaction.get_connection(using).in_atomic_block
+    for attempt in range(attempts()):
+        last = attempt == attempts() - 1
+        with _lock(using):
+            atomic = transaction.atomic(using=using)
+            try:
+                atomic.__enter__()
+            except OperationalError as error:
+                if not is_locked(error) or last:
+                    raise
+            else:
+                try:
+                    try:
+                        result = func(*args, **kwargs)
+                    except BaseException:
+                        atomic.__exit__(*sys.exc_info())
+                        raise
+                    # COMMIT тоже может упереться в чужую блокировку - тогда откат
+                    atomic.__exit__(None, None, None)
+                    return result
+                except OperationalError as error:
+                    if not (own_transaction and is_locked(error)) or last:
+                        raise
+        # спим уже без блокировки, чтобы не задерживать остальных писателей процесса
+        time.sleep(base_delay() * 2 ** attempt * (1 + random.random()))
@@ -1,4 +1,16 @@
+import pytest
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def test_cache(settings):
+    # рабочий кеш (cache.sqlite3) общий с запущенными воркерами - тесты пишут в свой,
+    # в памяти, и очищают его, чтобы записи одного теста не попали в другой
+    settings.CACHES = settings.TEST_LOCMEM_CACHES
+    from django.core.cache import cache
+    cache.clear()
+
@@ -0,0 +1,125 @@
+import json
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def get_json(client, url, **extra):
+    response = client.get(url, **extra)
+    assert response.status_code == 200, response
+    content = b''.join(response.streaming_content) if response.streaming else response.content
+    return response, json.loads(content.decode())
+
+
+@pytest.fixture
+def posts(user, group):
+    from posts.models import Post
+    return [Post.objects.create(text=f'Пост {i}', author=user, group=group if i % 2 else None) for i in range(25)]
+
+
+@pytest.mark.django_db
+class TestPostsApi:
+
+    def test_list_is_cursor_paginated(self, client, posts):
+        seen = []
+        url = '/api/v1/posts/?limit=10'
+        while url:
+            _, data = get_json(client, url)
+            seen += [item['id'] for item in data['results']]
+            url = data['next']
+        assert seen == [post.pk for post in reversed(posts)]
+        _, data = get_json(client, '/api/v1/posts/?limit=10')
+        _, second = get_json(client, data['next'])
+        _, back = get_json(client, second['previous'])
+        assert back['results'] == data['results']
+
+    def test_post_payload(self, client, posts, user, group):
+        post = posts[1]
+        _, data = get_json(client, f'/api/v1/posts/{post.pk}/')
+        assert data['text'] == 'Пост 1'
+        assert data['author'] == {'username': user.username, 'full_name': user.get_full_name()}
+        assert data['group'] == {'slug': group.slug, 'title': group.title}
+        assert data['url'] == f'/{user.username}/{post.pk}/'
+        assert data['image'] is None
+
+    def test_sparse_fields(self, client, posts):
+        _, data = get_json(client, '/api/v1/posts/?fields=id,pub_date')
+        assert set(data['results'][0]) == {'id', 'pub_date'}
+        response = client.get('/api/v1/posts/?fields=id,password')
+        assert response.status_code == 400
+        assert 'password' in response.json()['detail']
+
+    def test_group_and_profile(self, client, posts, user, group):
+        _, data = get_json(client, f'/api/v1/groups/{group.slug}/posts/')
+        assert [item['id'] for item in data['results']] == [post.pk for post in reversed(posts) if post.group_id]
+        _, data = get_json(client, f'/api/v1/profiles/{user.username}/')
+        assert data['posts_count'] == 25
+        _, data = get_json(client, '/api/v1/groups/')
+        assert data['results'][0]['slug'] == group.slug
+        assert client.get('/api/v1/groups/missing/').status_code == 404
+
+    def test_feed_requires_login(self, user_client, user, django_user_model):
+        from django.test import Client
+        from posts.models import Follow, Post
+        assert Client().get('/api/v1/feed/').status_code == 401
+        author = django_user_model.objects.create_user(username='author')
+        Follow.objects.create(user=user, author=author)
+        post = Post.objects.create(text='Для подписчиков', author=author)
+        _, data = get_json(user_client, '/api/v1/feed/')
+        assert [item['id'] for item in data['results']] == [post.pk]
+
+    def test_comments(self, client, posts, user):
+        from posts.models import Comment
+        for i in range(3):
+            Comment.objects.create(post=posts[0], author=user, text=f'Комментарий {i}')
+        _, data = get_json(client, f'/api/v1/posts/{posts[0].pk}/comments/?limit=2')
+        assert [item['text'] for item in data['results']] == ['Комментарий 0', 'Комментарий 1']
+        _, data = get_json(client, data['next'])
+        assert [item['text'] for item in data['results']] == ['Комментарий 2']
+
+    def test_not_modified(self, client, posts):
+        response, _ = get_json(client, '/api/v1/posts/')
+        response = client.get('/api/v1/posts/', HTTP_IF_NONE_MATCH=response['ETag'])
+        assert response.status_code == 304
+
+    def test_last_modified_only_for_single_post(self, client, posts):
+        # у списка меняется состав, дата изменения постов его не покрывает
+        response, _ = get_json(client, '/api/v1/posts/')
+        assert 'Last-Modified' not in response
+        response, _ = get_json(client, f'/api/v1/posts/{posts[0].pk}/')
+        response = client.get(f'/api/v1/posts/{posts[0].pk}/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        assert response.status_code == 304
+
+
+@pytest.mark.django_db
+class TestPreSerializedPosts:
+
+    def test_cached_pages_read_only_ids_and_versions(self, client, posts):
+        get_json(client, '/api/v1/posts/')
+        with CaptureQueriesContext(connection) as queries:
+            _, data = get_json(client, '/api/v1/posts/?fields=id,text')
+        assert len(queries) == 1, [query['sql'] for query in queries.captured_queries]
+        assert '"text"' not in queries.captured_queries[0]['sql']
+        assert data['results'][0]['text'] == 'Пост 24'
+
+    def test_new_version_is_reserialized(self, client, posts, user):
+        from posts.models import Comment
+        post = posts[-1]
+        get_json(client, f'/api/v1/posts/{post.pk}/')
+        post.text = 'Исправленный пост'
+        post.save()
+        Comment.objects.create(post=post, author=user, text='Первый')
+        _, data = get_json(client, f'/api/v1/posts/{post.pk}/')
+        assert data['text'] == 'Исправленный пост'
+        assert data['comment_count'] == 1
+
+    def test_author_and_group_rename_is_reserialized(self, client, posts, user, group):
+        get_json(client, '/api/v1/posts/')
+        user.first_name, user.last_name = 'Сара', 'Коннор'
+        user.save()
+        group.title = 'Новое название'
+        group.save()
+        _, data = get_json(client, '/api/v1/posts/')
+        assert all(item['author']['full_name'] == 'Сара Коннор' for item in data['results'])
+        assert {item['group']['title'] for item in data['results'] if item['group']} == {'Новое название'}
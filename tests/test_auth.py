@@ -0,0 +1,81 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from yatube import auth
+
+
+def auth_queries(client, url='/'):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    tables = ('"auth_user"', '"django_session"')
+    return response, [query['sql'] for query in queries.captured_queries
+                      if any(f'FROM {table}' in query['sql'] for table in tables)]
+
+
+@pytest.mark.django_db
+class TestCachedUser:
+
+    def test_session_and_user_come_from_cache(self, user_client, user):
+        user_client.get('/')
+        response, queries = auth_queries(user_client)
+        assert response.context['user'] == user
+        assert queries == []
+
+    def test_user_edit_updates_snapshot(self, user_client, user):
+        user_client.get('/')
+        user.first_name = 'Новое имя'
+        user.save()
+        assert cache.get(auth.cache_key(user.pk)) is None
+        response, queries = auth_queries(user_client)
+        assert response.context['user'].first_name == 'Новое имя'
+        assert len(queries) == 1
+
+    def test_deactivated_user_is_logged_out(self, user_client, user):
+        user_client.get('/')
+        user.is_active = False
+        user.save()
+        assert not user_client.get('/').context['user'].is_authenticated
+
+    def test_password_change_ends_other_sessions(self, user, client):
+        other = Client()
+        assert client.login(username='TestUser', password='1234567')
+        assert other.login(username='TestUser', password='1234567')
+        other.get('/')
+        response = client.post('/auth/password_change/', {
+            'old_password': '1234567', 'new_password1': 'Ytr-12345-kl', 'new_password2': 'Ytr-12345-kl'})
+        assert response.status_code == 302
+        assert client.get('/').context['user'].is_authenticated
+        assert not other.get('/').context['user'].is_authenticated
+
+    def test_logout_forgets_user(self, user, client):
+        assert client.login(username='TestUser', password='1234567')
+        client.get('/')
+        assert cache.get(auth.cache_key(user.pk)) is not None
+        client.get('/auth/logout/')
+        assert cache.get(auth.cache_key(user.pk)) is None
+        assert not client.get('/').context['user'].is_authenticated
+
+    def test_snapshot_has_no_password(self, user_client, user):
+        user_client.get('/')
+        data = cache.get(auth.cache_key(user.pk))
+        assert user.password not in repr(data)
+        restored = auth.restore(data)
+        assert (restored.pk, restored.username, restored.is_authenticated) == (user.pk, 'TestUser', True)
+        assert 'password' not in restored.__dict__
+
+    def test_password_change_with_snapshot_keeps_other_fields(self, user, client, django_user_model):
+        user.email = 'test@example.com'
+        user.save()
+        assert client.login(username='TestUser', password='1234567')
+        client.get('/')
+        # второй запрос получает пользователя из снимка
+        response = client.post('/auth/password_change/', {
+            'old_password': '1234567', 'new_password1': 'Ytr-12345-kl', 'new_password2': 'Ytr-12345-kl'})
+        assert response.status_code == 302
+        saved = django_user_model.objects.get(pk=user.pk)
+        assert saved.check_password('Ytr-12345-kl')
+        assert (saved.email, saved.date_joined) == ('test@example.com', user.date_joined)
+
@@ -0,0 +1,73 @@
+import multiprocessing
+import time
+
+import pytest
+
+from yatube.sqlite_cache import SQLiteCache
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'cache.sqlite3')
+
+
+def make_cache(path, **options):
+    return SQLiteCache(path, {'OPTIONS': options})
+
+
+def increment(path, times):
+    cache = make_cache(path)
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class TestSQLiteCache:
+
+    def test_basic_operations(self, cache_path):
+        cache = make_cache(cache_path)
+        cache.set('key', {'a': 1})
+        assert cache.get('key') == {'a': 1}
+        assert cache.add('key', 'other') is False
+        assert cache.add('new', 'value') is True
+        assert cache.get_many(['key', 'new', 'missing']) == {'key': {'a': 1}, 'new': 'value'}
+        cache.delete('key')
+        assert cache.get('key', 'default') == 'default'
+        cache.clear()
+        assert cache.get('new') is None
+
+    def test_expired_values_are_not_returned(self, cache_path):
+        cache = make_cache(cache_path)
+        cache.set('short', 'value', timeout=0.2)
+        assert cache.has_key('short')
+        time.sleep(0.3)
+        assert cache.get('short') is None
+        assert cache.add('short', 'again') is True
+
+    def test_least_recently_used_entries_are_evicted(self, cache_path):
+        cache = make_cache(cache_path, MAX_ENTRIES=10, CULL_FREQUENCY=5)
+        for i in range(10):
+            cache.set(f'key{i}', i)
+        # первым ключам обновляем время чтения, они должны пережить вытеснение
+        cache._connection().execute("UPDATE cache SET accessed = accessed + 100 WHERE key LIKE '%key0'")
+        cache.set('key10', 10)
+        assert cache.get('key0') == 0
+        assert cache.get('key1') is None
+        assert cache.get('key10') == 10
+
+    def test_size_budget(self, cache_path):
+        cache = make_cache(cache_path, MAX_SIZE=10000)
+        for i in range(50):
+            cache.set(f'key{i}', 'x' * 1000)
+        size, = cache._connection().execute('SELECT size FROM cache_totals').fetchone()
+        assert size <= 10000
+        assert cache.get('key49') == 'x' * 1000
+
+    def test_shared_between_processes(self, cache_path):
+        cache = make_cache(cache_path)
+        cache.set('counter', 0)
+        workers = [multiprocessing.Process(target=increment, args=(cache_path, 50)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert cache.get('counter') == 200
@@ -0,0 +1,143 @@
+import time
+from xml.etree import ElementTree
+
+import pytest
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+@pytest.fixture
+def posts(user, group):
+    from posts.models import Post
+    return [Post.objects.create(text=f'Пост {i}', author=user, group=group if i % 2 else None) for i in range(25)]
+
+
+@pytest.mark.django_db
+class TestFeeds:
+
+    def test_rss(self, client, posts, settings):
+        response = client.get('/feed/rss/')
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('application/rss+xml')
+        items = ElementTree.fromstring(response.content).findall('channel/item')
+        assert len(items) == settings.FEED_SIZE
+        assert items[0].find('title').text == 'Пост 24'
+        assert items[0].find('link').text.endswith(f'/{posts[-1].author.username}/{posts[-1].pk}/')
+
+    def test_atom(self, client, posts, group):
+        response = client.get(f'/group/{group.slug}/atom/')
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('application/atom+xml')
+        entries = ElementTree.fromstring(response.content).findall(f'{ATOM}entry')
+        assert [entry.find(f'{ATOM}title').text for entry in entries] == \
+            [post.text for post in reversed(posts) if post.group_id]
+
+    def test_author_feed(self, client, posts, user, django_user_model):
+        from posts.models import Post
+        other = django_user_model.objects.create_user(username='other')
+        Post.objects.create(text='Чужой пост', author=other)
+        response = client.get(f'/{user.username}/rss/')
+        titles = [item.find('title').text for item in ElementTree.fromstring(response.content).iter('item')]
+        assert 'Чужой пост' not in titles
+        assert client.get('/nobody/rss/').status_code == 404
+
+    def test_items_in_one_query(self, client, posts):
+        with CaptureQueriesContext(connection) as queries:
+            client.get('/feed/atom/')
+        post_queries = [query for query in queries.captured_queries if '"posts_post"' in query['sql']]
+        assert len(post_queries) == 1
+
+
+@pytest.mark.django_db
+class TestCachedFeeds:
+
+    def test_not_modified_without_queries(self, client, posts):
+        response = client.get('/feed/rss/')
+        with CaptureQueriesContext(connection) as queries:
+            by_etag = client.get('/feed/rss/', HTTP_IF_NONE_MATCH=response['ETag'])
+        assert by_etag.status_code == 304
+        assert not [query for query in queries.captured_queries if 'posts_' in query['sql']]
+
+    def test_no_last_modified(self, client, posts, user):
+        # версия - время с долями секунды, дата в заголовке их теряет
+        url = f'/{user.username}/rss/'
+        response = client.get(url)
+        assert 'Last-Modified' not in response
+        posts[-1].text = 'Правка в ту же секунду'
+        posts[-1].save()
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 1))
+        assert response.status_code == 200
+        assert 'Правка в ту же секунду' in response.content.decode()
+
+    def test_cached_body(self, client, posts, group):
+        first = client.get(f'/group/{group.slug}/rss/')
+        with CaptureQueriesContext(connection) as queries:
+            second = client.get(f'/group/{group.slug}/rss/')
+        assert second.content == first.content
+        # группа ищется до кеша, посты не читаются
+        assert not [query for query in queries.captured_queries if '"posts_post"' in query['sql']]
+
+    def test_new_post_resets_only_its_scopes(self, client, posts, user, group, django_user_model):
+        from posts.models import Post
+        urls = ['/feed/rss/', f'/group/{group.slug}/rss/', f'/{user.username}/atom/']
+        etags = {url: client.get(url)['ETag'] for url in urls}
+        other = django_user_model.objects.create_user(username='other')
+        Post.objects.create(text='Новый пост', author=other)
+
+        assert 'Новый пост' in client.get('/feed/rss/').content.decode()
+        for url in urls[1:]:
+            assert client.get(url, HTTP_IF_NONE_MATCH=etags[url]).status_code == 304
+
+        Post.objects.create(text='Пост в группе', author=user, group=group)
+        for url in urls[1:]:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            assert response.status_code == 200
+            assert 'Пост в группе' in response.content.decode()
+
+    def test_edit_and_delete_reset_feed(self, client, posts, user):
+        url = f'/{user.username}/rss/'
+        client.get(url)
+        post = posts[-1]
+        post.text = 'Исправленный пост'
+        post.save()
+        assert 'Исправленный пост' in client.get(url).content.decode()
+        post.delete()
+        assert 'Исправленный пост' not in client.get(url).content.decode()
+
+    def test_group_and_author_rename_reset_feeds(self, client, posts, user, group):
+        urls = ['/feed/rss/', f'/group/{group.slug}/rss/', f'/{user.username}/rss/']
+        etags = {url: client.get(url)['ETag'] for url in urls}
+        group.title = 'Новое название'
+        group.save()
+        for url in urls:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            assert response.status_code == 200
+            assert '<category>Новое название</category>' in response.content.decode()
+            etags[url] = response['ETag']
+        user.first_name, user.last_name = 'Новое', 'Имя'
+        user.save()
+        for url in urls:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            assert response.status_code == 200
+            assert 'Новое Имя' in response.content.decode()
+
+    def test_deleting_group_and_author_with_posts(self, client, posts, user, group):
+        from posts.models import Group, Post
+        client.get(f'/group/{group.slug}/rss/')
+        group.delete()
+        assert not Group.objects.exists()
+        assert client.get(f'/group/{group.slug}/rss/').status_code == 404
+        user.delete()
+        assert not Post.objects.exists()
+        assert client.get(f'/{user.username}/rss/').status_code == 404
+
+    def test_unknown_scope_creates_no_version(self, client):
+        for url in ('/group/missing/rss/', '/nobody/atom/'):
+            response = client.get(url)
+            assert response.status_code == 404
+            assert not response.has_header('ETag')
+        assert len(caches['default']._cache) == 0
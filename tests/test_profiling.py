@@ -0,0 +1,100 @@
+import re
+
+import pytest
+from django.test import RequestFactory
+
+from yatube import profiling
+
+
+@pytest.fixture(autouse=True)
+def empty_registry():
+    profiling.registry.reset()
+
+
+def parse_server_timing(header):
+    metrics = {}
+    for part in header.split(','):
+        name, *params = part.strip().split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+class TestProfilingMiddleware:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_server_timing_header(self, user_client, post):
+        response = user_client.get('/')
+        assert response.status_code == 200
+        timing = parse_server_timing(response['Server-Timing'])
+        assert set(timing) == {'sql', 'tpl', 'cache', 'total'}
+        assert re.match(r'"SQL \((\d+)\)"', timing['sql']['desc'])
+        assert int(re.search(r'\d+', timing['sql']['desc']).group()) > 0
+        assert float(timing['tpl']['dur']) > 0
+        assert float(timing['total']['dur']) >= float(timing['sql']['dur'])
+        assert re.match(r'"hit=\d+ miss=\d+"', timing['cache']['desc'])
+
+    @pytest.mark.django_db(transaction=True)
+    def test_histograms_by_view_name(self, user_client, post):
+        user_client.get('/')
+        user_client.get('/')
+        user_client.get(f'/{post.author.username}/')
+        text = profiling.registry.exposition()
+        assert 'yatube_request_duration_seconds_count{view="index"} 2' in text
+        assert 'yatube_request_duration_seconds_count{view="profile"} 1' in text
+        assert '# TYPE yatube_sql_queries histogram' in text
+        assert 'yatube_request_duration_seconds_bucket{view="index",le="+Inf"} 2' in text
+        assert 'yatube_cache_misses_total{view="index"}' in text
+
+    @pytest.mark.django_db(transaction=True)
+    def test_fragment_cache_reads_are_counted(self, client, user):
+        from posts.models import Post
+        for i in range(3):
+            Post.objects.create(text=f'Пост {i}', author=user)
+
+        def cache_counts():
+            desc = parse_server_timing(client.get('/')['Server-Timing'])['cache']['desc']
+            return [int(number) for number in re.findall(r'\d+', desc)]
+
+        # {% cache %} у каждого поста читается во время отрисовки шаблона
+        cold_hits, cold_misses = cache_counts()
+        warm_hits, warm_misses = cache_counts()
+        assert cold_misses >= 3
+        assert warm_hits >= cold_hits + 3
+
+    def test_cache_hits_and_misses_are_counted(self):
+        from django.core.cache.backends.locmem import LocMemCache
+        cache = LocMemCache('profiling-test', {})
+        profiling._patch(LocMemCache, 'get', profiling._counted_get)
+        profiling._patch(LocMemCache, 'get_many', profiling._counted_get_many)
+        cache.set('a', 1)
+        profile = profiling._local.profile = profiling.RequestProfile()
+        try:
+            assert cache.get('a') == 1
+            assert cache.get('b', 'default') == 'default'
+            assert cache.get_many(['a', 'c']) == {'a': 1}
+        finally:
+            profiling._local.profile = None
+        assert (profile.cache_hits, profile.cache_misses) == (2, 2)
+
+
+class TestMetricsView:
+
+    def request(self, user):
+        request = RequestFactory().get('/metrics/')
+        request.user = user
+        return request
+
+    def test_disabled_by_default(self, settings, admin_user):
+        from django.http import Http404
+        settings.PROFILING_METRICS_URL = None
+        with pytest.raises(Http404):
+            profiling.metrics(self.request(admin_user))
+
+    def test_staff_only(self, settings, user, admin_user):
+        from django.core.exceptions import PermissionDenied
+        settings.PROFILING_METRICS_URL = 'metrics/'
+        with pytest.raises(PermissionDenied):
+            profiling.metrics(self.request(user))
+        response = profiling.metrics(self.request(admin_user))
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
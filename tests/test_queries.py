@@ -0,0 +1,152 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import urls as posts_urls
+
+# Максимальное число SQL-запросов для каждой страницы из posts/urls.py.
+# Новая страница без бюджета или превышение бюджета роняет тесты.
+# Сессия и пользователь читаются из кеша (yatube/auth.py) и в бюджет не входят.
+QUERY_BUDGETS = {
+    'index': 2,
+    'group': 2,
+    'new_post': 1,
+    'follow_index': 2,
+    'profile_follow': 3,
+    'profile_unfollow': 3,
+    'profile': 3,
+    'post': 2,
+    'post_edit': 2,
+    'add_comment': 1,
+    'post_comments': 2,
+    'search': 2,
+    'trending': 2,
+    'group_trending': 2,
+    'feed_rss': 1,
+    'feed_atom': 1,
+    'group_rss': 2,
+    'group_atom': 2,
+    'profile_rss': 2,
+    'profile_atom': 2,
+}
+
+# строка запроса для страниц, которым без неё нечего показать
+URL_QUERIES = {
+    'search': '?q=Пост',
+}
+
+POSTS_ON_PAGE = 12
+
+
+@pytest.fixture
+def feed(user, group, django_user_model):
+    from posts.models import Comment, Follow, Post
+    authors = [django_user_model.objects.create_user(username=f'author_{i}') for i in range(3)]
+    for i in range(POSTS_ON_PAGE):
+        post = Post.objects.create(text=f'Пост {i}', author=authors[i % 3], group=group)
+        Comment.objects.create(post=post, author=user, text='Комментарий')
+    for author in authors:
+        Follow.objects.create(user=user, author=author)
+    return {'author': authors[0], 'post': post, 'group': group}
+
+
+def url_kwargs(name, feed):
+    post = feed['post']
+    kwargs = {
+        'group': {'slug': feed['group'].slug},
+        'group_rss': {'slug': feed['group'].slug},
+        'group_atom': {'slug': feed['group'].slug},
+        'group_trending': {'slug': feed['group'].slug},
+        'profile_follow': {'username': feed['author'].username},
+        'profile_unfollow': {'username': feed['author'].username},
+        'profile': {'username': post.author.username},
+        'profile_rss': {'username': post.author.username},
+        'profile_atom': {'username': post.author.username},
+        'post': {'username': post.author.username, 'post_id': post.id},
+        'post_edit': {'username': post.author.username, 'post_id': post.id},
+        'add_comment': {'username': post.author.username, 'post_id': post.id},
+        'post_comments': {'username': post.author.username, 'post_id': post.id},
+    }
+    return kwargs.get(name, {})
+
+
+class TestQueryBudgets:
+
+    def test_every_url_has_budget(self):
+        names = {pattern.name for pattern in posts_urls.urlpatterns}
+        missing = names - set(QUERY_BUDGETS)
+        assert not missing, f'Задайте бюджет SQL-запросов для страниц: {sorted(missing)}'
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('name', sorted(QUERY_BUDGETS))
+    def test_query_budget(self, name, user_client, user, feed):
+        url = reverse(name, kwargs=url_kwargs(name, feed)) + URL_QUERIES.get(name, '')
+        # первый запрос прогревает сессию и кеши, считаем второй
+        user_client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = user_client.get(url)
+        assert response.status_code in (200, 301, 302), f'Страница `{url}` вернула {response.status_code}'
+        executed = len(queries.captured_queries)
+        assert executed <= QUERY_BUDGETS[name], \
+            f'Страница `{url}` выполнила {executed} SQL-запросов, бюджет {QUERY_BUDGETS[name]}:\n' + \
+            '\n'.join(query['sql'] for query in queries.captured_queries)
+
+
+def query_plan(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+@pytest.mark.skipif(connection.vendor != 'sqlite', reason='планы запросов SQLite')
+class TestQueryPlans:
+    """Запросы лент идут по составным индексам, без полного просмотра и сортировки."""
+
+    def assert_uses_index(self, queryset, table, index):
+        plan = query_plan(queryset)
+        steps = [step for step in plan if f' {table} ' in f' {step} ']
+        assert steps and all(f'INDEX {index} ' in step for step in steps), plan
+        assert not any('TEMP B-TREE' in step for step in plan), plan
+
+    @pytest.mark.django_db
+    def test_profile_feed(self, user):
+        from posts.models import Post
+        queryset = Post.objects.select_related('author', 'group').filter(author=user)
+        self.assert_uses_index(queryset.order_by('-pub_date', '-id')[:11], 'posts_post', 'post_author_date_idx')
+        # следующая страница по курсору - тот же индекс с границей по дате
+        page = queryset.filter(pub_date__lt=timezone.now()).order_by('-pub_date', '-id')[:11]
+        self.assert_uses_index(page, 'posts_post', 'post_author_date_idx')
+
+    @pytest.mark.django_db
+    def test_group_feed(self, group):
+        from posts.models import Post
+        queryset = Post.objects.select_related('author', 'group').filter(group=group)
+        self.assert_uses_index(queryset.order_by('-pub_date', '-id')[:11], 'posts_post', 'post_group_date_idx')
+
+    @pytest.mark.django_db
+    def test_follow_feed(self, user):
+        from posts.timeline import TIMELINE_ORDERING, timeline_posts
+        queryset = timeline_posts(user).select_related('author', 'group')
+        self.assert_uses_index(queryset.order_by(*TIMELINE_ORDERING)[:11],
+                               'posts_timelineentry', 'timeline_user_date_idx')
+        page = queryset.filter(feed_date__lt=timezone.now()).order_by(*TIMELINE_ORDERING)[:11]
+        self.assert_uses_index(page, 'posts_timelineentry', 'timeline_user_date_idx')
+
+    @pytest.mark.django_db
+    def test_post_comments(self, post):
+        from posts.models import Comment
+        queryset = Comment.objects.filter(post=post).order_by('created')
+        self.assert_uses_index(queryset, 'posts_comment', 'comment_post_created_idx')
+
+    @pytest.mark.django_db
+    def test_follow_lookups_are_index_only(self, user, django_user_model):
+        from posts.models import Follow
+        author = django_user_model.objects.create_user(username='author')
+        plan = query_plan(Follow.objects.filter(user=user, author=author))
+        assert any('COVERING INDEX' in step for step in plan), plan
+        followers = Follow.objects.filter(author=author).values_list('user', flat=True)
+        self.assert_uses_index(followers, 'posts_follow', 'follow_author_user_idx')
+        assert any('COVERING INDEX' in step for step in query_plan(followers))
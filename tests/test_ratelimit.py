@@ -0,0 +1,98 @@
+import pytest
+
+from posts import writes
+from yatube import ratelimit
+
+
+class TestTokenBucket:
+
+    def test_bucket_refills_over_time(self):
+        assert ratelimit.take('bucket', '2/m', now=0) == 0
+        assert ratelimit.take('bucket', '2/m', now=0) == 0
+        assert ratelimit.take('bucket', '2/m', now=0) == pytest.approx(30)
+        # за 15 секунд вернулась половина токена
+        assert ratelimit.take('bucket', '2/m', now=15) == pytest.approx(15)
+        assert ratelimit.take('bucket', '2/m', now=30) == 0
+
+    def test_client_ip_behind_trusted_proxy(self, rf, settings):
+        def ip(remote, forwarded=None):
+            extra = {'HTTP_X_FORWARDED_FOR': forwarded} if forwarded else {}
+            return ratelimit.client_ip(rf.get('/', REMOTE_ADDR=remote, **extra))
+
+        assert ip('10.0.0.5', '203.0.113.7') == '10.0.0.5'
+        settings.RATE_LIMIT_TRUSTED_PROXIES = ['10.0.0.0/8']
+        assert ip('10.0.0.5', '203.0.113.7') == '203.0.113.7'
+        # клиент подставил свой адрес в начало заголовка - верим только прокси
+        assert ip('10.0.0.5', '1.2.3.4, 203.0.113.7, 10.0.0.9') == '203.0.113.7'
+        assert ip('10.0.0.5') == '10.0.0.5'
+        # запрос не через прокси - заголовок не учитывается
+        assert ip('198.51.100.1', '203.0.113.7') == '198.51.100.1'
+
+    def test_parse_rate(self):
+        assert ratelimit.parse_rate('10/m') == (10, 60)
+        assert ratelimit.parse_rate('5/h') == (5, 3600)
+
+
+@pytest.mark.django_db
+class TestRateLimitedViews:
+
+    def test_comments_limited_per_user(self, user_client, post, settings):
+        settings.RATE_LIMITS = {'comment': {'user': '2/m'}}
+        url = f'/{post.author.username}/{post.id}/comment/'
+        for _ in range(2):
+            assert user_client.post(url, {'text': 'Комментарий'}).status_code == 302
+        response = user_client.post(url, {'text': 'Комментарий'})
+        assert response.status_code == 429
+        assert 1 <= int(response['Retry-After']) <= 30
+        assert post.comments.count() == 2
+        # чтение не ограничено
+        assert user_client.get(f'/{post.author.username}/{post.id}/').status_code == 200
+
+    def test_signup_limited_per_ip(self, client, settings):
+        settings.RATE_LIMITS = {'signup': {'ip': '1/h'}}
+        data = {'username': 'newbie', 'password1': 'Sup3r-secret', 'password2': 'Sup3r-secret'}
+        client.post('/auth/signup/', data, REMOTE_ADDR='10.0.0.1')
+        response = client.post('/auth/signup/', dict(data, username='other'), REMOTE_ADDR='10.0.0.1')
+        assert response.status_code == 429
+        assert client.post('/auth/signup/', dict(data, username='third'), REMOTE_ADDR='10.0.0.2').status_code != 429
+        assert client.get('/auth/signup/', REMOTE_ADDR='10.0.0.1').status_code == 200
+
+    def test_clients_behind_proxy_get_own_buckets(self, client, settings):
+        settings.RATE_LIMITS = {'signup': {'ip': '1/h'}}
+        settings.RATE_LIMIT_TRUSTED_PROXIES = ['127.0.0.1']
+        data = {'username': 'newbie', 'password1': 'Sup3r-secret', 'password2': 'Sup3r-secret'}
+        proxy = {'REMOTE_ADDR': '127.0.0.1'}
+        client.post('/auth/signup/', data, HTTP_X_FORWARDED_FOR='203.0.113.1', **proxy)
+        response = client.post('/auth/signup/', dict(data, username='other'), HTTP_X_FORWARDED_FOR='203.0.113.2', **proxy)
+        assert response.status_code != 429
+        response = client.post('/auth/signup/', dict(data, username='third'), HTTP_X_FORWARDED_FOR='203.0.113.1', **proxy)
+        assert response.status_code == 429
+
+
+@pytest.mark.django_db
+class TestAdmission:
+
+    def test_full_queue_sheds_writes(self, user_client, post, settings):
+        settings.WRITE_MAX_IN_FLIGHT = 1
+        settings.WRITE_QUEUE_TIMEOUT = 0.01
+        slot = writes._slot('default')
+        assert slot.acquire(timeout=1)
+        try:
+            response = user_client.post(f'/{post.author.username}/{post.id}/comment/', {'text': 'Комментарий'})
+        finally:
+            slot.release()
+        assert response.status_code == 503
+        assert 'Retry-After' in response
+        assert not post.comments.exists()
+
+    def test_nested_write_does_not_take_second_slot(self, db, settings):
+        settings.WRITE_MAX_IN_FLIGHT = 1
+        settings.WRITE_QUEUE_TIMEOUT = 0.01
+        assert writes.run(writes.run, lambda: 'ok') == 'ok'
+        slot = writes._slot('default')
+        slot.acquire()
+        try:
+            with pytest.raises(writes.Overloaded):
+                writes.run(lambda: 'ok')
+        finally:
+            slot.release()
@@ -0,0 +1,117 @@
+import sqlite3
+import time
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from posts.management.commands.replicate_db import replicate
+from yatube import db_router
+
+
+@pytest.fixture
+def with_replica():
+    with mock.patch.object(db_router, 'replica_alias', return_value='replica'):
+        yield
+
+
+def read_alias():
+    return db_router.ReplicaRouter().db_for_read(None)
+
+
+class TestReplicaRouter:
+
+    def test_without_replica_everything_reads_primary(self):
+        assert db_router.replica_alias() is None
+        assert db_router.read_from_replica(read_alias)() == 'default'
+
+    def test_only_marked_views_read_replica(self, with_replica):
+        assert read_alias() == 'default'
+        assert db_router.read_from_replica(read_alias)() == 'replica'
+
+    def test_writes_go_to_primary_and_pin_reads(self, with_replica):
+        router = db_router.ReplicaRouter()
+
+        def view(request):
+            before = router.db_for_read(None)
+            assert router.db_for_write(None) == 'default'
+            return HttpResponse(f'{before} {router.db_for_read(None)}')
+
+        middleware = db_router.ReplicaStickinessMiddleware(db_router.read_from_replica(view))
+        assert middleware(RequestFactory().get('/')).content == b'replica default'
+
+    def test_views_are_routed(self):
+        from posts import views
+        for view in (views.index, views.group_posts, views.profile, views.post_view, views.follow_index):
+            assert getattr(view, 'reads_from_replica', False), view
+        assert not getattr(views.new_post, 'reads_from_replica', False)
+
+
+class TestStickiness:
+
+    def respond(self, request, write):
+        def view(request):
+            if write:
+                db_router.ReplicaRouter().db_for_write(None)
+            return HttpResponse(db_router.read_from_replica(read_alias)())
+        return db_router.ReplicaStickinessMiddleware(view)(request)
+
+    def test_cookie_after_write(self, with_replica, settings):
+        settings.REPLICA_STICKY_SECONDS = 30
+        response = self.respond(RequestFactory().post('/new/'), write=True)
+        cookie = response.cookies[db_router.STICKY_COOKIE]
+        assert cookie['max-age'] == 30
+        assert float(cookie.value) > time.time() + 25
+        assert not self.respond(RequestFactory().get('/'), write=False).cookies
+
+    def test_reads_stick_to_primary_while_cookie_is_fresh(self, with_replica):
+        request = RequestFactory().get('/')
+        request.COOKIES[db_router.STICKY_COOKIE] = str(time.time() + 10)
+        assert self.respond(request, write=False).content == b'default'
+        request.COOKIES[db_router.STICKY_COOKIE] = str(time.time() - 1)
+        assert self.respond(request, write=False).content == b'replica'
+
+
+class TestReplicateCommand:
+
+    def test_copies_database(self, tmp_path):
+        source, target = str(tmp_path / 'db.sqlite3'), str(tmp_path / 'replica.sqlite3')
+        db = sqlite3.connect(source)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('CREATE TABLE t (x)')
+        db.execute('INSERT INTO t VALUES (1)')
+        db.commit()
+        replicate(source, target)
+        replica = sqlite3.connect(f'file:{target}?mode=ro', uri=True)
+        assert replica.execute('SELECT x FROM t').fetchall() == [(1,)]
+        assert replica.execute('PRAGMA journal_mode').fetchone() == ('delete',)
+
+        db.execute('INSERT INTO t VALUES (2)')
+        db.commit()
+        replicate(source, target)
+        # уже открытое соединение дочитывает старый снимок, новое видит свежий
+        assert replica.execute('SELECT x FROM t ORDER BY x').fetchall() == [(1,)]
+        replica = sqlite3.connect(f'file:{target}?mode=ro', uri=True)
+        assert replica.execute('SELECT x FROM t ORDER BY x').fetchall() == [(1,), (2,)]
+
+    def test_requires_target(self, settings):
+        settings.REPLICA_DATABASE_PATH = None
+        with pytest.raises(CommandError):
+            call_command('replicate_db')
+
+    @pytest.mark.parametrize('engine', ['django.db.backends.sqlite3', 'yatube.sqlite_backend'])
+    def test_accepts_sqlite_engines(self, engine, settings, monkeypatch, tmp_path):
+        from posts.management.commands import replicate_db
+        copies = []
+        monkeypatch.setattr(replicate_db, 'replicate', lambda source, target: copies.append(target))
+        monkeypatch.setitem(settings.DATABASES['default'], 'ENGINE', engine)
+        call_command('replicate_db', target=str(tmp_path / 'replica.sqlite3'), stdout=StringIO())
+        assert copies == [str(tmp_path / 'replica.sqlite3')]
+
+    def test_rejects_other_engines(self, settings, monkeypatch, tmp_path):
+        monkeypatch.setitem(settings.DATABASES['default'], 'ENGINE', 'django.db.backends.postgresql')
+        with pytest.raises(CommandError):
+            call_command('replicate_db', target=str(tmp_path / 'replica.sqlite3'))
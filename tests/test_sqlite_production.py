@@ -0,0 +1,157 @@
+import contextlib
+import sqlite3
+import threading
+from unittest import mock
+
+import pytest
+from django.db import OperationalError, connection
+
+from posts import writes
+from yatube.sqlite_backend.base import DatabaseWrapper
+
+PRODUCTION = {
+    'ENGINE': 'yatube.sqlite_backend',
+    'CONN_MAX_AGE': 600,
+    'OPTIONS': {
+        'timeout': 7,
+        'IMMEDIATE_TRANSACTIONS': True,
+        'PRAGMAS': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'cache_size': -2000,
+                    'mmap_size': 1024 * 1024},
+    },
+}
+
+
+@pytest.fixture
+def production_db(tmp_path, db):
+    settings_dict = dict(PRODUCTION, NAME=str(tmp_path / 'db.sqlite3'))
+    settings_dict.update({key: value for key, value in connection.settings_dict.items() if key not in settings_dict})
+    settings_dict['OPTIONS'] = PRODUCTION['OPTIONS']
+    wrapper = DatabaseWrapper(settings_dict, alias='production')
+    yield wrapper
+    wrapper.close()
+
+
+class TestProductionBackend:
+
+    def test_pragmas_are_applied(self, production_db):
+        with production_db.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            assert cursor.fetchone() == ('wal',)
+            cursor.execute('PRAGMA synchronous')
+            assert cursor.fetchone() == (1,)  # NORMAL
+            cursor.execute('PRAGMA cache_size')
+            assert cursor.fetchone() == (-2000,)
+        assert production_db.connection.isolation_level is None
+
+    def test_own_options_are_not_passed_to_sqlite(self, production_db):
+        params = production_db.get_connection_params()
+        assert params['timeout'] == 7
+        assert 'PRAGMAS' not in params and 'IMMEDIATE_TRANSACTIONS' not in params
+
+    def test_transactions_take_write_lock_at_begin(self, production_db):
+        production_db.ensure_connection()
+        production_db.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+        try:
+            # блокировка на запись уже взята, хотя транзакция ещё ничего не писала
+            other = sqlite3.connect(production_db.settings_dict['NAME'], timeout=0)
+            with pytest.raises(sqlite3.OperationalError, match='locked'):
+                other.execute('BEGIN IMMEDIATE')
+            other.close()
+        finally:
+            production_db.rollback()
+            production_db.set_autocommit(True)
+
+
+class TestWriteCoordinator:
+
+    def test_returns_result_inside_transaction(self, db):
+        from django.db import transaction
+        assert writes.run(lambda: transaction.get_connection().in_atomic_block) is True
+
+    def test_retries_when_transaction_cannot_start(self, db, settings):
+        settings.WRITE_RETRY_DELAY = 0
+        calls = []
+        real_enter = writes.transaction.Atomic.__enter__
+
+        def flaky_enter(self):
+            if len(calls) < 2:
+                calls.append('locked')
+                raise OperationalError('database is locked')
+            return real_enter(self)
+
+        with mock.patch.object(writes.transaction.Atomic, '__enter__', flaky_enter):
+            assert writes.run(lambda: 'done') == 'done'
+        assert calls == ['locked', 'locked']
+
+    def test_gives_up_after_attempts(self, db, settings):
+        settings.WRITE_RETRY_DELAY = 0
+        settings.WRITE_RETRY_ATTEMPTS = 3
+        enter = mock.Mock(side_effect=OperationalError('database is locked'))
+        with mock.patch.object(writes.transaction.Atomic, '__enter__', enter):
+            with pytest.raises(OperationalError):
+                writes.run(lambda: None)
+        assert enter.call_count == 3
+
+    def test_locked_write_is_retried_from_scratch(self, transactional_db, settings):
+        from posts.models import Group
+        settings.WRITE_RETRY_DELAY = 0
+        calls = []
+
+        def write():
+            calls.append(1)
+            Group.objects.create(title=f'g{len(calls)}', slug=f'g{len(calls)}', description='')
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return 'done'
+
+        assert writes.run(write) == 'done'
+        # первая попытка откатилась целиком
+        assert list(Group.objects.values_list('slug', flat=True)) == ['g2']
+
+    def test_locked_commit_is_retried(self, transactional_db, settings):
+        settings.WRITE_RETRY_DELAY = 0
+        real_exit = writes.transaction.Atomic.__exit__
+        commits = []
+
+        def flaky_exit(self, exc_type, exc_value, traceback):
+            if exc_type is None and not commits:
+                commits.append('locked')
+                real_exit(self, OperationalError, OperationalError('database is locked'), None)
+                raise OperationalError('database is locked')
+            return real_exit(self, exc_type, exc_value, traceback)
+
+        func = mock.Mock(return_value='done')
+        with mock.patch.object(writes.transaction.Atomic, '__exit__', flaky_exit):
+            assert writes.run(func) == 'done'
+        assert func.call_count == 2
+
+    def test_other_errors_are_not_retried(self, transactional_db):
+        func = mock.Mock(side_effect=OperationalError('no such table: x'))
+        with pytest.raises(OperationalError):
+            writes.run(func)
+        assert func.call_count == 1
+
+    def test_locked_write_inside_outer_transaction_is_not_retried(self, db):
+        # тест и так идёт внутри транзакции - блокировку держала бы она
+        func = mock.Mock(side_effect=OperationalError('database is locked'))
+        with pytest.raises(OperationalError):
+            writes.run(func)
+        assert func.call_count == 1
+
+    def test_writes_of_one_process_are_serialized(self):
+        active, overlaps = [], []
+
+        def write():
+            active.append(1)
+            if len(active) > 1:
+                overlaps.append(1)
+            threading.Event().wait(0.01)
+            active.pop()
+
+        with mock.patch.object(writes.transaction, 'atomic', lambda using: contextlib.nullcontext()):
+            threads = [threading.Thread(target=writes.run, args=(write,)) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert not overlaps
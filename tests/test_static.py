@@ -0,0 +1,102 @@
+import gzip
+import json
+
+import pytest
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.template import Context, Template
+
+from yatube import staticfiles
+
+CSS = 'body { background: url("../img/logo.png"); }\n' + '.row { margin: 0 auto; }\n' * 200
+
+
+@pytest.fixture
+def collected(tmp_path, settings):
+    source = tmp_path / 'assets'
+    (source / 'css').mkdir(parents=True)
+    (source / 'img').mkdir()
+    (source / 'css' / 'main.css').write_text(CSS)
+    (source / 'img' / 'logo.png').write_bytes(b'\x89PNG fake image')
+    settings.STATICFILES_DIRS = [str(source)]
+    # статика приложений (admin) не нужна, а сжатие brotli на ней заметно долгое
+    settings.STATICFILES_FINDERS = ['django.contrib.staticfiles.finders.FileSystemFinder']
+    settings.STATIC_ROOT = str(tmp_path / 'static')
+    settings.STATICFILES_STORAGE = 'yatube.staticfiles.CompressedManifestStorage'
+    call_command('collectstatic', interactive=False, verbosity=0)
+    manifest = json.loads((tmp_path / 'static' / 'staticfiles.json').read_text())['paths']
+    return tmp_path / 'static', manifest
+
+
+def body(response):
+    return b''.join(response.streaming_content)
+
+
+class TestCollectStatic:
+
+    def test_hashed_and_compressed_copies(self, collected):
+        root, manifest = collected
+        hashed = manifest['css/main.css']
+        assert hashed != 'css/main.css'
+        assert gzip.decompress((root / (hashed + '.gz')).read_bytes()) == (root / hashed).read_bytes()
+        # ссылка внутри css тоже ведёт на имя с хешем
+        assert manifest['img/logo.png'] in (root / hashed).read_text()
+        # картинки не сжимаются
+        assert not (root / (manifest['img/logo.png'] + '.gz')).exists()
+        assert (root / (hashed + '.br')).exists() == (staticfiles.brotli is not None)
+
+    def test_static_tag_uses_hashed_name(self, collected):
+        _, manifest = collected
+        rendered = Template("{% load static %}{% static 'css/main.css' %} {% static 'missing.js' %}").render(Context())
+        assert rendered == f'/static/{manifest["css/main.css"]} /static/missing.js'
+
+    def test_missing_manifest_falls_back(self, tmp_path, settings):
+        settings.STATIC_ROOT = str(tmp_path / 'empty')
+        settings.STATICFILES_STORAGE = 'yatube.staticfiles.CompressedManifestStorage'
+        assert staticfiles_storage.url('bootstrap/dist/css/bootstrap.min.css') == \
+            '/static/bootstrap/dist/css/bootstrap.min.css'
+
+
+@pytest.mark.django_db
+class TestStaticMiddleware:
+
+    def test_gzip_negotiation(self, client, collected):
+        root, manifest = collected
+        url = '/static/' + manifest['css/main.css']
+        response = client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        assert response.status_code == 200
+        assert response['Content-Encoding'] == 'gzip'
+        assert response['Content-Type'].startswith('text/css')
+        assert response['Vary'] == 'Accept-Encoding'
+        assert 'immutable' in response['Cache-Control']
+        assert gzip.decompress(body(response)).decode() == CSS.replace('../img/logo.png', '../' + manifest['img/logo.png'])
+
+        plain = client.get(url)
+        assert not plain.has_header('Content-Encoding')
+        assert body(plain) == (root / manifest['css/main.css']).read_bytes()
+        refused = client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        assert not refused.has_header('Content-Encoding')
+
+    def test_brotli_preferred_over_gzip(self, client, collected):
+        root, manifest = collected
+        if staticfiles.brotli is None:
+            pytest.skip('brotli не установлен')
+        url = '/static/' + manifest['css/main.css']
+        response = client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        assert response['Content-Encoding'] == 'br'
+        assert staticfiles.brotli.decompress(body(response)) == (root / manifest['css/main.css']).read_bytes()
+        assert client.get(url, HTTP_ACCEPT_ENCODING='gzip, br;q=0')['Content-Encoding'] == 'gzip'
+
+    def test_cache_headers(self, client, collected):
+        _, manifest = collected
+        assert client.get('/static/css/main.css')['Cache-Control'] == 'public, max-age=60'
+        response = client.get('/static/' + manifest['img/logo.png'], HTTP_ACCEPT_ENCODING='gzip')
+        assert not response.has_header('Content-Encoding')
+        assert not response.has_header('Vary')
+        again = client.get('/static/' + manifest['img/logo.png'], HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        assert again.status_code == 304
+
+    def test_only_files_inside_static_root(self, client, collected):
+        for url in ('/static/../assets/css/main.css', '/static/%2e%2e/assets/css/main.css'):
+            assert client.get(url).status_code in (400, 404)
+        assert client.get('/static/nope.css').status_code == 404
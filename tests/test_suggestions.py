@@ -0,0 +1,140 @@
+import random
+from collections import Counter
+from io import StringIO
+
+import pytest
+from django.core.cache import caches
+from django.core.management import call_command
+
+from posts import suggestions
+
+
+@pytest.fixture(params=['numpy', 'array'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        if suggestions.numpy is None:
+            pytest.skip('NumPy не установлен')
+    else:
+        monkeypatch.setattr(suggestions, 'numpy', None)
+    return request.param
+
+
+@pytest.fixture
+def graph(django_user_model, group):
+    from posts.models import Follow, Post
+    users = {name: django_user_model.objects.create_user(username=name) for name in 'abcdex'}
+    for user, author in ('ab', 'bc', 'bd', 'xc', 'ad'):
+        Follow.objects.create(user=users[user], author=users[author])
+    Post.objects.create(author=users['a'], group=group, text='Пост a')
+    Post.objects.create(author=users['e'], group=group, text='Пост e')
+    return users
+
+
+def suggested(user):
+    return [username for _, username in suggestions.for_user(user, limit=100)]
+
+
+def naive_scores(user_id, weight):
+    # то же самое в лоб - для сверки на маленьком графе
+    from posts.models import Follow, Post
+    following = set(Follow.objects.filter(user_id=user_id).values_list('author_id', flat=True))
+    scores = Counter(Follow.objects.filter(user_id__in=following).values_list('author_id', flat=True))
+    groups = set(Post.objects.filter(author_id__in=following | {user_id}, group__isnull=False)
+                 .values_list('group_id', flat=True))
+    for author_id in Post.objects.filter(group_id__in=groups).values_list('author_id', flat=True).distinct():
+        scores[author_id] += weight * len(
+            groups & set(Post.objects.filter(author_id=author_id).values_list('group_id', flat=True)))
+    return {author_id: score for author_id, score in scores.items()
+            if score and author_id != user_id and author_id not in following}
+
+
+@pytest.fixture
+def random_graph(django_user_model):
+    from posts.models import Follow, Group, Post
+    rng = random.Random(5)
+    users = [django_user_model.objects.create_user(username=f'user{i}') for i in range(30)]
+    groups = [Group.objects.create(title=f'g{i}', slug=f'g{i}', description='') for i in range(4)]
+    for user in users:
+        for author in rng.sample(users, 4):
+            if author != user:
+                Follow.objects.get_or_create(user=user, author=author)
+        if rng.random() < 0.5:
+            Post.objects.create(author=user, group=rng.choice(groups), text='Пост')
+    return users
+
+
+@pytest.mark.django_db
+class TestRebuild:
+
+    def test_friends_of_friends_and_groups(self, graph, backend):
+        suggestions.rebuild()
+        # c - через b, e - пишет в той же группе, b и d уже в подписках
+        assert suggested(graph['a']) == ['c', 'e']
+        assert suggested(graph['x']) == []
+        assert suggested(graph['b']) == []
+
+    def test_matches_naive_scores(self, random_graph, backend, settings):
+        users = random_graph
+        settings.SUGGESTIONS_SIZE = 100
+        suggestions.rebuild(batch_size=7)
+        for user in users:
+            cached = {entry[0]: entry[2] for entry in caches['default'].get(suggestions.cache_key(user.pk), [])}
+            assert cached == pytest.approx(naive_scores(user.pk, settings.SUGGESTIONS_GROUP_WEIGHT))
+
+    def test_numpy_batches_match_array_fallback(self, random_graph, monkeypatch):
+        if suggestions.numpy is None:
+            pytest.skip('NumPy не установлен')
+        user_ids = [user.pk for user in random_graph]
+        batched = suggestions.FollowGraph().top_many(user_ids, 10)
+        monkeypatch.setattr(suggestions, 'numpy', None)
+        one_by_one = suggestions.FollowGraph().top_many(user_ids, 10)
+        assert batched.keys() == one_by_one.keys()
+        for user_id in user_ids:
+            assert [author for author, _ in batched[user_id]] == [author for author, _ in one_by_one[user_id]]
+            assert [score for _, score in batched[user_id]] == \
+                pytest.approx([score for _, score in one_by_one[user_id]])
+
+    def test_only_active_users_with_expiry(self, graph, backend, settings, django_user_model):
+        from datetime import timedelta
+
+        from django.utils import timezone
+        long_ago = timezone.now() - timedelta(days=settings.SUGGESTIONS_ACTIVE_DAYS + 1)
+        django_user_model.objects.filter(pk=graph['x'].pk).update(date_joined=long_ago, last_login=long_ago)
+        django_user_model.objects.filter(pk=graph['b'].pk).update(date_joined=long_ago, last_login=timezone.now())
+        assert suggestions.rebuild() == 5
+        cache = caches['default']
+        assert cache.get(suggestions.cache_key(graph['x'].pk)) is None
+        assert cache.get(suggestions.cache_key(graph['b'].pk)) is None  # активен, но подсказать некого
+        key = cache.make_key(suggestions.cache_key(graph['a'].pk))
+        # запись не вечная и не вытесняет остальной кеш навсегда
+        assert cache._expire_info[key] is not None
+
+    def test_command(self, graph):
+        out = StringIO()
+        call_command('rebuild_suggestions', stdout=out)
+        assert 'Подсказки перестроены для 6 активных' in out.getvalue()
+
+
+@pytest.mark.django_db
+class TestIncrementalUpdates:
+
+    def test_follow_and_unfollow(self, graph):
+        from posts.models import Follow
+        suggestions.rebuild()
+        Follow.objects.create(user=graph['x'], author=graph['b'])
+        # подписался на b - подсказаны его авторы, кроме уже читаемого c
+        assert suggested(graph['x']) == ['d']
+        Follow.objects.create(user=graph['a'], author=graph['c'])
+        assert 'c' not in suggested(graph['a'])
+        Follow.objects.filter(user=graph['x'], author=graph['b']).delete()
+        assert suggested(graph['x']) == []
+
+    def test_pages_show_suggestions(self, graph, client):
+        suggestions.rebuild()
+        client.force_login(graph['a'])
+        for url in ('/follow/', '/b/'):
+            response = client.get(url)
+            assert 'Кого почитать' in response.content.decode()
+            assert '/c/follow' in response.content.decode()
+        client.force_login(graph['x'])
+        assert 'Кого почитать' not in client.get('/follow/').content.decode()
@@ -0,0 +1,40 @@
+import pytest
+from django.template import engines
+
+from yatube import template_warmup
+
+LOADERS = ['django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader']
+
+
+def with_loaders(settings, loaders, **options):
+    template = settings.TEMPLATES[0]
+    settings.TEMPLATES = [dict(template, OPTIONS=dict(template['OPTIONS'], loaders=loaders), **options)]
+
+
+@pytest.fixture
+def cached_loader(settings):
+    with_loaders(settings, [('django.template.loaders.cached.Loader', LOADERS)])
+    return engines['django'].engine.template_loaders[0]
+
+
+class TestWarmUp:
+
+    def test_compiles_project_and_app_templates(self, cached_loader):
+        names = template_warmup.cached_template_names(engines['django'].engine)
+        # nav.html и footer.html лежат в users/templates
+        for name in ('post_item.html', 'flatpages/default.html', 'nav.html', 'footer.html'):
+            assert name in names
+        assert template_warmup.warm_up() == len(names)
+        for name in names:
+            assert name in cached_loader.get_template_cache
+
+    def test_broken_template_does_not_stop_warmup(self, cached_loader, settings, tmp_path):
+        (tmp_path / 'broken.html').write_text('{% if %}')
+        (tmp_path / 'ok.html').write_text('{{ value }}')
+        with_loaders(settings, [('django.template.loaders.cached.Loader', LOADERS[:1])], DIRS=[str(tmp_path)])
+        assert template_warmup.warm_up() == 1
+
+    def test_nothing_to_warm_without_cached_loader(self, settings):
+        # при DEBUG шаблоны не кешируются и перечитываются с диска
+        with_loaders(settings, LOADERS)
+        assert template_warmup.warm_up() == 0
@@ -0,0 +1,112 @@
+import pytest
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from posts import trending
+
+HOUR = 60 * 60
+NOW = 1000 * HOUR
+
+
+@pytest.fixture
+def posts(user, group):
+    from posts.models import Post, TrendCounter
+    created = [Post.objects.create(text=f'Пост {i}', author=user, group=group if i % 2 else None) for i in range(25)]
+    # счётчики публикации мешают считать оценки в тестах
+    TrendCounter.objects.all().delete()
+    return created
+
+
+def ranked_ids(scope='posts'):
+    return [pk for _, pk in caches['default'].get(trending.cache_key(scope))]
+
+
+@pytest.mark.django_db
+class TestCounters:
+
+    def test_new_post_and_comment_are_counted(self, user, group):
+        from posts.models import Comment, Post, TrendCounter
+        post = Post.objects.create(text='Пост', author=user, group=group)
+        Comment.objects.create(post=post, author=user, text='Первый')
+        Comment.objects.create(post=post, author=user, text='Второй')
+        counter = TrendCounter.objects.get(post=post)
+        assert (counter.group_id, counter.posts, counter.comments) == (group.pk, 1, 2)
+        assert counter.bucket == trending.current_bucket()
+
+    def test_one_row_per_bucket(self, posts):
+        from posts.models import TrendCounter
+        for now in (NOW, NOW + 10, NOW + HOUR):
+            trending.record(posts[0].pk, comments=1, now=now)
+        assert sorted(TrendCounter.objects.values_list('bucket', 'comments')) == \
+            [(NOW // HOUR, 2), (NOW // HOUR + 1, 1)]
+
+
+@pytest.mark.django_db
+class TestRebuild:
+
+    def test_recent_activity_ranks_higher(self, posts):
+        old, fresh, quiet = posts[:3]
+        for _ in range(3):
+            trending.record(old.pk, comments=1, now=NOW - 5 * HOUR)
+        for _ in range(2):
+            trending.record(fresh.pk, comments=1, now=NOW)
+        trending.record(quiet.pk, comments=1, now=NOW - HOUR)
+        trending.rebuild(now=NOW)
+        # 2 сейчас > 3 * 0.8^5 и > 1 * 0.8
+        assert ranked_ids() == [fresh.pk, old.pk, quiet.pk]
+
+    def test_rollover_drops_old_buckets(self, posts, settings):
+        from posts.models import TrendCounter
+        trending.record(posts[0].pk, comments=1, now=NOW - settings.TRENDING_WINDOW * HOUR)
+        trending.record(posts[1].pk, comments=1, now=NOW - (settings.TRENDING_WINDOW - 1) * HOUR)
+        trending.rebuild(now=NOW)
+        assert ranked_ids() == [posts[1].pk]
+        assert list(TrendCounter.objects.values_list('post_id', flat=True)) == [posts[1].pk]
+
+    def test_groups(self, posts, group):
+        grouped = [post for post in posts if post.group_id]
+        trending.record(grouped[0].pk, comments=1, now=NOW)
+        trending.record(posts[0].pk, comments=5, now=NOW)
+        trending.rebuild(now=NOW)
+        assert ranked_ids(f'group:{group.pk}') == [grouped[0].pk]
+        assert ranked_ids('groups') == [group.pk]
+        # активность группы выпала из окна - её рейтинг пустеет
+        trending.rebuild(now=NOW + 100 * HOUR)
+        assert ranked_ids(f'group:{group.pk}') == []
+
+    def test_command(self, posts):
+        trending.record(posts[0].pk, comments=1)
+        call_command('update_trending')
+        assert ranked_ids() == [posts[0].pk]
+
+
+@pytest.mark.django_db
+class TestTrendingPages:
+
+    def test_cursor_walk(self, client, posts):
+        for score, post in enumerate(posts):
+            trending.record(post.pk, comments=score + 1)
+        trending.rebuild()
+        seen = []
+        url = '/trending/'
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+            # посты страницы и активные группы
+            assert len(queries) <= 2
+            page = response.context['page']
+            seen += [post.pk for post in page]
+            url = f'/trending/?after={page.next_cursor}' if page.has_next() else None
+        assert seen == [post.pk for post in reversed(posts)]
+
+    def test_group_page(self, client, posts, group):
+        for post in posts:
+            trending.record(post.pk, comments=1)
+        trending.rebuild()
+        response = client.get(f'/group/{group.slug}/trending/')
+        assert response.status_code == 200
+        assert all(post.group_id == group.pk for post in response.context['page'])
+        assert client.get('/group/missing/trending/').status_code == 404
+        assert group.title in client.get('/trending/').content.decode()
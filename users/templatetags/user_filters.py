@@ -8,6 +8,12 @@ register = template.Library()
 def addclass(field, css):
         return field.as_widget(attrs={"class": css})
 
+
+@register.filter
+def is_author(user, post):
+        # сравниваем по id, чтобы не загружать автора поста
+        return getattr(user, 'is_authenticated', False) and user.pk == post.author_id
+
 # синтаксис @register... , под которой описан класс addclass() - 
 # это применение "декораторов", функций, обрабатывающих функции
 # мы скоро про них расскажем. Не бойтесь соб@к
\ No newline at end of file
@@ -1,10 +1,14 @@
 # Create your views here.
 # позволяет узнать ссылку на URL по его имени, параметр name функции path
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views.generic import CreateView
+from yatube.ratelimit import rate_limit
 from .forms import CreationForm
 
 
+# регистрацию ограничиваем по IP - у нового посетителя ещё нет пользователя
+@method_decorator(rate_limit("signup"), name="dispatch")
 class SignUp(CreateView):
         form_class = CreationForm
         success_url = "/auth/login/"
@@ -0,0 +1,100 @@
+"""
+Пользователь запроса из общего кеша.
+
+Стандартный AuthenticationMiddleware на каждый запрос вошедшего
+пользователя читает из базы строку auth_user. CachedAuthenticationMiddleware
+проверяет сессию так же, как django.contrib.auth.get_user, но саму
+запись пользователя берёт из кеша (ключ "auth_user:<id>", живёт
+settings.AUTH_USER_CACHE_TIMEOUT секунд). В кеше лежит только снимок:
+поля из SNAPSHOT_FIELDS и хеш для проверки сессии, без хеша пароля.
+Остальные поля (пароль, email, даты) восстановленный пользователь
+дочитывает из базы при обращении, а save() пишет только загруженные поля.
+Сессии хранятся в cached_db (settings.SESSION_ENGINE), поэтому строка
+сессии тоже читается из кеша.
+
+Снимок удаляется при сохранении или удалении пользователя (правка в
+админке, смена пароля, вход - обновляется last_login) и при выходе
+(posts/signals.py). Смена пароля дополнительно завершает остальные сессии:
+хеш пароля в сессии перестаёт совпадать со снимком.
+"""
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY, HASH_SESSION_KEY, _get_user_session_key, get_user_model, load_backend,
+)
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.base import DEFERRED
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+# поля, которых хватает шаблонам, проверкам прав и ссылкам на автора
+SNAPSHOT_FIELDS = ("id", "username", "first_name", "last_name", "is_active", "is_staff", "is_superuser")
+
+
+def cache_timeout():
+    return getattr(settings, "AUTH_USER_CACHE_TIMEOUT", 15 * 60)
+
+
+def cache_key(user_id):
+    return "auth_user:%s" % user_id
+
+
+def forget(user_id):
+    """Удаляет снимок пользователя, следующий запрос прочитает его из базы."""
+    cache.delete(cache_key(user_id))
+
+
+def snapshot(user):
+    return {
+        "fields": [getattr(user, name) for name in SNAPSHOT_FIELDS],
+        "session_hash": user.get_session_auth_hash(),
+    }
+
+
+def restore(data):
+    """Пользователь из снимка; не попавшие в снимок поля отложены (deferred)."""
+    model = get_user_model()
+    names = [field.attname for field in model._meta.concrete_fields]
+    values = dict(zip(SNAPSHOT_FIELDS, data["fields"]))
+    return model.from_db(DEFAULT_DB_ALIAS, names, [values.get(name, DEFERRED) for name in names])
+
+
+def cached_user(backend_path, user_id):
+    """(пользователь, хеш для проверки сессии) или (None, None)."""
+    key = cache_key(user_id)
+    data = cache.get(key)
+    if data is not None:
+        return restore(data), data["session_hash"]
+    user = load_backend(backend_path).get_user(user_id)
+    if user is None:
+        return None, None
+    data = snapshot(user)
+    cache.set(key, data, cache_timeout())
+    return user, data["session_hash"]
+
+
+def get_user(request):
+    """То же, что django.contrib.auth.get_user, но пользователь берётся из кеша."""
+    try:
+        user_id = _get_user_session_key(request)
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+    user, user_hash = cached_user(backend_path, user_id)
+    if user is None:
+        return AnonymousUser()
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    if not (session_hash and constant_time_compare(session_hash, user_hash)):
+        request.session.flush()
+        return AnonymousUser()
+    return user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
@@ -0,0 +1,97 @@
+"""
+Чтение из реплики базы.
+
+Страницы, отмеченные декоратором read_from_replica (ленты, профиль, пост),
+читают из базы settings.REPLICA_DATABASE_ALIAS, всё остальное и все записи
+идут в основную базу. Реплика включается, только если её псевдоним есть
+в settings.DATABASES; иначе всё читается из основной базы.
+
+Чтобы пользователь сразу видел свой пост или комментарий, после любой
+записи ReplicaStickinessMiddleware ставит куку, и пока она действует
+(settings.REPLICA_STICKY_SECONDS), его запросы читают из основной базы.
+
+Локально реплика - копия файла SQLite, которую обновляет команда
+manage.py replicate_db.
+"""
+import functools
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_COOKIE = "use_primary"
+
+_local = threading.local()
+
+
+def replica_alias():
+    """Псевдоним реплики или None, если реплика не настроена."""
+    alias = getattr(settings, "REPLICA_DATABASE_ALIAS", "replica")
+    return alias if alias in settings.DATABASES else None
+
+
+def sticky_seconds():
+    return getattr(settings, "REPLICA_STICKY_SECONDS", 10)
+
+
+def read_from_replica(view):
+    """Декоратор для страниц, которые только читают."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        previous = getattr(_local, "replica", False)
+        _local.replica = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _local.replica = previous
+    wrapper.reads_from_replica = True
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if alias and getattr(_local, "replica", False) and not getattr(_local, "pinned", False):
+            return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # после записи запрос и следующие за ним читают из основной базы
+        if getattr(_local, "in_request", False):
+            _local.pinned = _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплика - копия основной базы, объекты из них совместимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # схема реплики приходит вместе с данными при репликации
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaStickinessMiddleware:
+    """Держит пользователя на основной базе в течение sticky_seconds() после записи."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            until = float(request.COOKIES.get(STICKY_COOKIE, 0))
+        except ValueError:
+            until = 0
+        _local.pinned = until > time.time()
+        _local.wrote = False
+        _local.in_request = True
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = _local.wrote
+            _local.pinned = _local.wrote = _local.in_request = False
+        if wrote and replica_alias():
+            seconds = sticky_seconds()
+            response.set_cookie(STICKY_COOKIE, str(int(time.time() + seconds)), max_age=seconds,
+                                httponly=True, samesite="Lax")
+        return response
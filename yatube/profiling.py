@@ -0,0 +1,256 @@
+"""
+Профилирование запросов.
+
+ProfilingMiddleware считает для каждого запроса число и время SQL-запросов,
+время отрисовки шаблонов, попадания и промахи кеша и общее время. Итог
+уходит в заголовок Server-Timing и копится в гистограммах по имени
+страницы (resolver_match.url_name). Гистограммы отдаются в текстовом
+формате Prometheus по адресу, который включается настройкой
+PROFILING_METRICS_URL и доступен только сотрудникам (is_staff).
+
+Гистограммы свои у каждого процесса-воркера.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import PermissionDenied
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.template.backends.django import Template
+
+# границы корзин гистограмм
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+_local = threading.local()
+
+
+class RequestProfile:
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # вложенные вызовы (шаблон внутри шаблона, get внутри get_many) не считаем
+        # дважды; у шаблонов и кеша свои счётчики: {% cache %} читает кеш
+        # во время отрисовки, и эти чтения тоже надо считать
+        self.template_depth = 0
+        self.cache_depth = 0
+
+
+def current():
+    """Профиль текущего запроса или None вне ProfilingMiddleware."""
+    return getattr(_local, "profile", None)
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    profile = current()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if profile is not None:
+            profile.sql_count += 1
+            profile.sql_time += time.perf_counter() - started
+
+
+def _timed_render(render):
+    def wrapper(self, *args, **kwargs):
+        profile = current()
+        if profile is None or profile.template_depth:
+            return render(self, *args, **kwargs)
+        profile.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            profile.template_time += time.perf_counter() - started
+            profile.template_depth -= 1
+    wrapper.profiled = True
+    return wrapper
+
+
+def _counted_get(get):
+    def wrapper(self, key, *args, **kwargs):
+        profile = current()
+        if profile is None or profile.cache_depth:
+            return get(self, key, *args, **kwargs)
+        marker = object()
+        default = kwargs.pop("default", args[0] if args else None)
+        profile.cache_depth += 1
+        try:
+            value = get(self, key, marker, *args[1:], **kwargs)
+        finally:
+            profile.cache_depth -= 1
+        if value is marker:
+            profile.cache_misses += 1
+            return default
+        profile.cache_hits += 1
+        return value
+    wrapper.profiled = True
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    def wrapper(self, keys, *args, **kwargs):
+        profile = current()
+        if profile is None or profile.cache_depth:
+            return get_many(self, keys, *args, **kwargs)
+        keys = list(keys)
+        profile.cache_depth += 1
+        try:
+            found = get_many(self, keys, *args, **kwargs)
+        finally:
+            profile.cache_depth -= 1
+        profile.cache_hits += len(found)
+        profile.cache_misses += len(keys) - len(found)
+        return found
+    wrapper.profiled = True
+    return wrapper
+
+
+def _patch(cls, name, decorator):
+    method = getattr(cls, name)
+    if not getattr(method, "profiled", False):
+        setattr(cls, name, decorator(method))
+
+
+def instrument():
+    """Подключает счётчики к шаблонам Django и к классам настроенных кешей."""
+    _patch(Template, "render", _timed_render)
+    for alias in settings.CACHES:
+        cls = type(caches[alias])
+        _patch(cls, "get", _counted_get)
+        _patch(cls, "get_many", _counted_get_many)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    """Гистограммы и счётчики по страницам, с блокировкой на запись."""
+
+    HISTOGRAMS = {
+        "yatube_request_duration_seconds": ("Полное время обработки запроса", SECONDS_BUCKETS),
+        "yatube_sql_duration_seconds": ("Время SQL-запросов за запрос", SECONDS_BUCKETS),
+        "yatube_template_duration_seconds": ("Время отрисовки шаблонов за запрос", SECONDS_BUCKETS),
+        "yatube_sql_queries": ("Число SQL-запросов за запрос", QUERIES_BUCKETS),
+    }
+    COUNTERS = {
+        "yatube_cache_hits_total": "Попадания в кеш",
+        "yatube_cache_misses_total": "Промахи кеша",
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {name: {} for name in self.HISTOGRAMS}
+        self.counters = {name: {} for name in self.COUNTERS}
+
+    def observe(self, view, profile, total):
+        values = {
+            "yatube_request_duration_seconds": total,
+            "yatube_sql_duration_seconds": profile.sql_time,
+            "yatube_template_duration_seconds": profile.template_time,
+            "yatube_sql_queries": profile.sql_count,
+        }
+        with self.lock:
+            for name, value in values.items():
+                histogram = self.histograms[name].get(view)
+                if histogram is None:
+                    histogram = self.histograms[name][view] = Histogram(self.HISTOGRAMS[name][1])
+                histogram.observe(value)
+            for name, value in (("yatube_cache_hits_total", profile.cache_hits),
+                                ("yatube_cache_misses_total", profile.cache_misses)):
+                self.counters[name][view] = self.counters[name].get(view, 0) + value
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {name: {} for name in self.HISTOGRAMS}
+            self.counters = {name: {} for name in self.COUNTERS}
+
+    def exposition(self):
+        """Текст в формате Prometheus (text/plain; version=0.0.4)."""
+        lines = []
+        with self.lock:
+            for name, (help_text, buckets) in self.HISTOGRAMS.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for view, histogram in sorted(self.histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(buckets + ("+Inf",), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{view="{view}"}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{view="{view}"}} {cumulative}')
+            for name, help_text in self.COUNTERS.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for view, value in sorted(self.counters[name].items()):
+                    lines.append(f'{name}{{view="{view}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    return match.view_name or match.url_name or "unnamed"
+
+
+def server_timing(profile, total):
+    ms = lambda seconds: round(seconds * 1000, 2)  # noqa: E731
+    return ", ".join([
+        f'sql;dur={ms(profile.sql_time)};desc="SQL ({profile.sql_count})"',
+        f'tpl;dur={ms(profile.template_time)};desc="Templates"',
+        f'cache;desc="hit={profile.cache_hits} miss={profile.cache_misses}"',
+        f"total;dur={ms(total)}",
+    ])
+
+
+class ProfilingMiddleware:
+    """Ставится первым в MIDDLEWARE, чтобы общее время включало остальные middleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrument()
+
+    def __call__(self, request):
+        profile = _local.profile = RequestProfile()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(_sql_wrapper))
+                response = self.get_response(request)
+        finally:
+            _local.profile = None
+        total = time.perf_counter() - started
+        registry.observe(view_name(request), profile, total)
+        if getattr(settings, "PROFILING_SERVER_TIMING", True):
+            response["Server-Timing"] = server_timing(profile, total)
+        return response
+
+
+def metrics(request):
+    """Гистограммы в формате Prometheus; только для сотрудников."""
+    if not getattr(settings, "PROFILING_METRICS_URL", None):
+        raise Http404
+    if not (request.user.is_active and request.user.is_staff):
+        raise PermissionDenied
+    return HttpResponse(registry.exposition(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,126 @@
+"""
+Ограничение частоты запросов на запись.
+
+Каждому пользователю и каждому IP выдаётся ведро токенов (token bucket):
+запрос забирает токен, токены возвращаются равномерно со скоростью из
+settings.RATE_LIMITS. Вёдра лежат в общем кеше, поэтому лимит один на все
+воркеры. Пустое ведро - ответ 429 с заголовком Retry-After.
+
+    @rate_limit("comment")
+    def add_comment(request, ...):
+
+Там же запрос, не дождавшийся места в очереди записей (posts.writes.Overloaded),
+получает 503 вместо того, чтобы висеть, пока база занята.
+
+Чтение и запись ведра не атомарны (cache.get, затем cache.set), поэтому
+при одновременных запросах лимит может быть превышен на несколько
+запросов - для защиты от скриптов этого достаточно.
+
+За обратным прокси REMOTE_ADDR у всех запросов - адрес прокси, и все
+клиенты делили бы одно ведро. Прокси перечисляются в
+settings.RATE_LIMIT_TRUSTED_PROXIES, и для запросов от них адрес клиента
+берётся из X-Forwarded-For.
+"""
+import functools
+import ipaddress
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from posts.writes import Overloaded, queue_timeout
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """"10/m" -> (10, 60): не больше 10 запросов за минуту."""
+    count, period = rate.split("/")
+    return int(count), PERIODS[period]
+
+
+def trusted_proxies():
+    """Адреса и сети ("10.0.0.0/8") прокси, которым можно верить в X-Forwarded-For."""
+    return [ipaddress.ip_network(proxy, strict=False) for proxy in getattr(settings, "RATE_LIMIT_TRUSTED_PROXIES", ())]
+
+
+def is_trusted(address, proxies):
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(address in network for network in proxies)
+
+
+def client_ip(request):
+    """
+    Адрес клиента. Если запрос пришёл от доверенного прокси, это самый
+    правый адрес X-Forwarded-For, не принадлежащий прокси: левые адреса
+    заголовка клиент может прислать сам.
+    """
+    address = request.META.get("REMOTE_ADDR") or "unknown"
+    proxies = trusted_proxies()
+    if not proxies or not is_trusted(address, proxies):
+        return address
+    forwarded = [hop.strip() for hop in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",") if hop.strip()]
+    for hop in reversed(forwarded):
+        if not is_trusted(hop, proxies):
+            return hop
+    # цепочка целиком из прокси - берём самый первый адрес
+    return forwarded[0] if forwarded else address
+
+
+def buckets(request, scope):
+    """Вёдра, из которых запрос должен взять токен: [(ключ, лимит), ...]."""
+    limits = getattr(settings, "RATE_LIMITS", {}).get(scope, {})
+    result = []
+    if "user" in limits and request.user.is_authenticated:
+        result.append(("ratelimit:%s:user:%s" % (scope, request.user.pk), limits["user"]))
+    if "ip" in limits:
+        result.append(("ratelimit:%s:ip:%s" % (scope, client_ip(request)), limits["ip"]))
+    return result
+
+
+def take(key, rate, now=None):
+    """
+    Забирает токен из ведра. Возвращает 0, если токен был, иначе - сколько
+    секунд ждать до следующего. get и set не атомарны: параллельные
+    запросы могут взять один и тот же токен.
+    """
+    capacity, period = parse_rate(rate)
+    now = time.time() if now is None else now
+    tokens, stamp = cache.get(key) or (capacity, now)
+    tokens = min(capacity, tokens + (now - stamp) * capacity / period)
+    if tokens < 1:
+        return (1 - tokens) * period / capacity
+    cache.set(key, (tokens - 1, now), period)
+    return 0
+
+
+def error_response(status, message, retry_after):
+    response = HttpResponse(message, status=status, content_type="text/plain; charset=utf-8")
+    response["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def rate_limit(scope, methods=("POST",)):
+    """Декоратор страницы: лимит settings.RATE_LIMITS[scope] для запросов methods."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                wait = 0
+                for key, rate in buckets(request, scope):
+                    wait = take(key, rate)
+                    if wait:
+                        break
+                if wait:
+                    return error_response(429, "Слишком много запросов, попробуйте позже.", wait)
+            try:
+                return view(request, *args, **kwargs)
+            except Overloaded:
+                return error_response(503, "Сервер перегружен, попробуйте позже.", queue_timeout())
+        return wrapper
+    return decorator
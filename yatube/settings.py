@@ -51,11 +51,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # собранная статика отдаётся сразу, без сессий и профилирования (yatube/staticfiles.py)
+    'yatube.staticfiles.StaticFilesMiddleware',
+    # первым из остальных, чтобы в общее время запроса попали все middleware после него
+    'yatube.profiling.ProfilingMiddleware',
+    # после записи держит пользователя на основной базе, пока реплика не догонит
+    'yatube.db_router.ReplicaStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # пользователь запроса берётся из общего кеша (yatube/auth.py)
+    'yatube.auth.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -63,12 +70,20 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
+template_loaders = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # без DEBUG скомпилированные шаблоны хранятся в памяти процесса;
+            # при разработке шаблоны перечитываются, правки видны сразу
+            'loaders': template_loaders if DEBUG else [
+                ('django.template.loaders.cached.Loader', template_loaders),
+            ],
             'context_processors': [
                 'yatube.context_processors.year',
                 'django.template.context_processors.debug',
@@ -81,6 +96,9 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# компилировать все шаблоны (TEMPLATES_DIR и templates/ приложений) при старте
+# WSGI-процесса; работает, только если включён кеширующий загрузчик
+TEMPLATE_WARMUP = True
 
 
 # Database
@@ -93,6 +111,50 @@ DATABASES = {
     }
 }
 
+# Профиль базы для продакшена: YATUBE_DB_PROFILE=production. Включает WAL
+# (читатели не ждут писателя), постоянные соединения, ожидание блокировки
+# вместо мгновенного "database is locked" и BEGIN IMMEDIATE для транзакций
+# (yatube/sqlite_backend). Для разработки и тестов остаётся обычный SQLite
+DATABASE_PROFILE = os.environ.get('YATUBE_DB_PROFILE', 'development')
+if DATABASE_PROFILE == 'production':
+    DATABASES['default'].update({
+        'ENGINE': 'yatube.sqlite_backend',
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'timeout': 20,  # секунд ждать блокировку на запись
+            'IMMEDIATE_TRANSACTIONS': True,
+            'PRAGMAS': {
+                'journal_mode': 'WAL',
+                # в WAL-режиме NORMAL не теряет целостность, только последние транзакции при сбое питания
+                'synchronous': 'NORMAL',
+                'cache_size': -64000,  # 64 МБ страничного кеша на соединение
+                'mmap_size': 256 * 1024 * 1024,
+                'temp_store': 'MEMORY',
+            },
+        },
+    })
+
+# Короткие записи (posts/writes.py) при занятой базе повторяются:
+# не больше WRITE_RETRY_ATTEMPTS раз, пауза от WRITE_RETRY_DELAY секунд и удваивается
+WRITE_RETRY_ATTEMPTS = 5
+WRITE_RETRY_DELAY = 0.05
+
+# Реплика для чтения лент и профилей (yatube/db_router.py). Путь к файлу-копии
+# задаётся переменной окружения YATUBE_REPLICA_DB, копию обновляет
+# manage.py replicate_db. Без переменной всё читается из основной базы
+REPLICA_DATABASE_ALIAS = 'replica'
+REPLICA_DATABASE_PATH = os.environ.get('YATUBE_REPLICA_DB')
+if REPLICA_DATABASE_PATH:
+    DATABASES[REPLICA_DATABASE_ALIAS] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        # только чтение: реплику меняет лишь команда репликации
+        'NAME': 'file:%s?mode=ro' % REPLICA_DATABASE_PATH,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['yatube.db_router.ReplicaRouter']
+# сколько секунд после записи пользователь читает из основной базы
+REPLICA_STICKY_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -112,6 +174,11 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Сессии читаются из кеша и пишутся в базу, пользователь запроса тоже
+# берётся из кеша (yatube/auth.py) и хранится там столько секунд
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTH_USER_CACHE_TIMEOUT = 15 * 60
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
@@ -136,6 +203,12 @@ STATIC_URL = "/static/"
 
 # задаём адрес директории, куда командой *collectstatic* будет собрана вся статика
 STATIC_ROOT = os.path.join(BASE_DIR, "static")
+# collectstatic добавляет к именам файлов хеш содержимого и кладёт рядом сжатые
+# копии .gz и .br; отдаёт их yatube.staticfiles.StaticFilesMiddleware
+STATICFILES_STORAGE = "yatube.staticfiles.CompressedManifestStorage"
+# сколько секунд браузер может хранить файлы с хешем в имени и без него
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+STATIC_MAX_AGE = 60
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
@@ -155,10 +228,18 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 # Мультисайтовость нам не понадобится, так что укажем в настройках ID текущего сайта и забудем об этом
 SITE_ID = 1
 
-# Подключения бэкенда кеширования
+# Подключения бэкенда кеширования.
+# Кеш лежит в файле SQLite и общий для всех воркеров (yatube/sqlite_cache.py),
+# поэтому сброс кеша в одном процессе виден остальным
 CACHES = {
         'default': {
-                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'BACKEND': 'yatube.sqlite_cache.SQLiteCache',
+                'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+                'TIMEOUT': 300,
+                'OPTIONS': {
+                        'MAX_SIZE': 256 * 1024 * 1024,  # байт
+                        'MAX_ENTRIES': 200000,
+                },
         }
 }
 
@@ -168,8 +249,80 @@ TEST_CACHES = {
     }
 }
 
- 
-
- 
+# Тестам, которые проверяют кеширование, нужен работающий кеш - свой, в памяти
+# процесса: cache.sqlite3 общий с запущенными воркерами, тесты его не трогают
+TEST_LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'yatube-tests',
+    }
+}
 
+# Лента подписок (posts/timeline.py): посты авторов, у которых подписчиков больше
+# TIMELINE_FANOUT_LIMIT, не раскладываются по лентам, а подмешиваются при чтении
+TIMELINE_FANOUT_LIMIT = 5000
+# сколько последних постов автора попадает в ленту сразу после подписки
+TIMELINE_BACKFILL_SIZE = 500
 
+# Превью картинок постов готовятся заранее в пуле процессов (posts/thumbnails.py).
+# Размеры должны совпадать с теми, что запрашивают шаблоны
+THUMBNAIL_GEOMETRIES = [
+        ("960x339", {"crop": "center", "upscale": True}),
+]
+# число процессов пула; 0 - готовить превью сразу в текущем процессе
+THUMBNAIL_WORKERS = 2
+
+# Загрузка картинок постов (posts/images.py): картинки больше POST_IMAGE_MAX_PIXELS
+# отклоняются, остальные уменьшаются до POST_IMAGE_MAX_SIDE по большей стороне
+POST_IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+POST_IMAGE_MAX_SIDE = 2560
+POST_IMAGE_QUALITY = 85
+
+# Профилирование запросов (yatube/profiling.py): заголовок Server-Timing в ответах
+# и гистограммы по страницам. Адрес для Prometheus доступен только сотрудникам
+# и включается, если задать путь, например "metrics/"
+PROFILING_SERVER_TIMING = True
+PROFILING_METRICS_URL = None
+
+# Ленты RSS и Atom (posts/feeds.py): сколько последних постов в ленте и сколько
+# хранить готовый XML; при новом посте в ленте кеш сбрасывается сам
+FEED_SIZE = 20
+FEED_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Ограничение частоты записей (yatube/ratelimit.py): "сколько/период", период -
+# s, m, h или d. Лимит "user" считается по пользователю, "ip" - по адресу клиента
+RATE_LIMITS = {
+    "post": {"user": "10/m", "ip": "30/m"},
+    "comment": {"user": "20/m", "ip": "60/m"},
+    "follow": {"user": "60/m", "ip": "120/m"},
+    "signup": {"ip": "5/h"},
+}
+# Адреса или сети обратных прокси перед приложением: для их запросов адрес клиента
+# для лимитов "ip" берётся из X-Forwarded-For. Пусто - используется REMOTE_ADDR
+RATE_LIMIT_TRUSTED_PROXIES = []
+# Сколько записей в одном процессе-воркере могут выполняться или ждать очереди
+# (posts/writes.py); лимит не общий: N воркеров пускают до N * WRITE_MAX_IN_FLIGHT.
+# Запись, не получившая места за WRITE_QUEUE_TIMEOUT секунд, отвечает 503
+WRITE_MAX_IN_FLIGHT = 8
+WRITE_QUEUE_TIMEOUT = 2
+
+# Подсказки "кого почитать" (posts/suggestions.py) перестраивает команда
+# rebuild_suggestions: сколько кандидатов хранить на пользователя, вес общей группы
+# относительно одной общей подписки и сколько активных авторов группы рассматривать.
+# Считаются только пользователи, зарегистрированные или входившие за SUGGESTIONS_ACTIVE_DAYS
+# дней; записи живут в кеше SUGGESTIONS_CACHE_TIMEOUT секунд - дольше периода перестройки
+SUGGESTIONS_SIZE = 20
+SUGGESTIONS_GROUP_WEIGHT = 0.5
+SUGGESTIONS_GROUP_CANDIDATES = 50
+SUGGESTIONS_ACTIVE_DAYS = 30
+SUGGESTIONS_CACHE_TIMEOUT = 2 * 24 * 60 * 60
+
+# Популярное (posts/trending.py): активность считается по интервалам в TRENDING_BUCKET_SECONDS,
+# в рейтинг входят последние TRENDING_WINDOW интервалов, каждый следующий в прошлое
+# весит в TRENDING_DECAY раз меньше. Рейтинги пересчитывает команда update_trending
+TRENDING_BUCKET_SECONDS = 60 * 60
+TRENDING_WINDOW = 24
+TRENDING_DECAY = 0.8
+# новый пост весит как столько комментариев
+TRENDING_POST_WEIGHT = 3
+TRENDING_SIZE = 500
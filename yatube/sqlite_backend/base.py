@@ -0,0 +1,46 @@
+"""
+Бэкенд SQLite для продакшена.
+
+От стандартного отличается двумя вещами:
+
+* в OPTIONS можно передать PRAGMAS - они выполняются на каждом новом
+  соединении (journal_mode=WAL, synchronous, cache_size, mmap_size...);
+* при IMMEDIATE_TRANSACTIONS транзакции atomic() начинаются с BEGIN IMMEDIATE:
+  блокировка на запись берётся сразу, и конкурирующий писатель ждёт её
+  busy timeout'ом (OPTIONS timeout), а не получает "database is locked"
+  посреди транзакции при попытке повысить блокировку чтения до записи.
+
+    'ENGINE': 'yatube.sqlite_backend',
+    'OPTIONS': {
+        'timeout': 20,
+        'PRAGMAS': {'journal_mode': 'WAL', 'synchronous': 'NORMAL'},
+        'IMMEDIATE_TRANSACTIONS': True,
+    },
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        # свои ключи не передаём в sqlite3.connect()
+        params.pop("PRAGMAS", None)
+        params.pop("IMMEDIATE_TRANSACTIONS", None)
+        return params
+
+    @property
+    def pragmas(self):
+        return self.settings_dict["OPTIONS"].get("PRAGMAS", {})
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute("PRAGMA %s = %s" % (name, value))
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.settings_dict["OPTIONS"].get("IMMEDIATE_TRANSACTIONS"):
+            self.cursor().execute("BEGIN IMMEDIATE")
+        else:
+            super()._start_transaction_under_autocommit()
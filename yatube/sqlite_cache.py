@@ -0,0 +1,246 @@
+"""
+Кеш в файле SQLite (режим WAL), общий для всех процессов-воркеров на одной машине.
+
+Подключается в settings.CACHES:
+
+    'default': {
+        'BACKEND': 'yatube.sqlite_cache.SQLiteCache',
+        'LOCATION': '/path/to/cache.sqlite3',
+        'OPTIONS': {'MAX_SIZE': 64 * 1024 * 1024, 'MAX_ENTRIES': 100000},
+    }
+
+Когда размер данных или число записей выходит за пределы, удаляются
+просроченные записи, а затем давно не читавшиеся (LRU).
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+CREATE TABLE IF NOT EXISTS cache_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    size INTEGER NOT NULL,
+    entries INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_totals (id, size, entries) VALUES (1, 0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+    UPDATE cache_totals SET size = size + NEW.size, entries = entries + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+    UPDATE cache_totals SET size = size - OLD.size, entries = entries - 1;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache BEGIN
+    UPDATE cache_totals SET size = size - OLD.size + NEW.size;
+END;
+"""
+
+# время последнего чтения обновляем не чаще, чем раз в столько секунд,
+# чтобы чтения не превращались в запись на каждом обращении
+ACCESS_GRANULARITY = 5
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        options = params.get("OPTIONS", {})
+        self.max_size = int(options.get("MAX_SIZE", 64 * 1024 * 1024))
+        self.busy_timeout = float(options.get("BUSY_TIMEOUT", 5))
+        self._local = threading.local()
+
+    # соединения
+
+    def _connection(self):
+        # соединение своё у каждого потока; после fork открываем новое
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _write(self, callback):
+        """Выполняет callback(conn) в одной пишущей транзакции."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = callback(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expiry(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    # чтение
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        made = {self._key(key, version): key for key in keys}
+        now = time.time()
+        conn = self._connection()
+        rows = conn.execute(
+            "SELECT key, value, expires, accessed FROM cache WHERE key IN (%s)"
+            % ", ".join("?" * len(made)),
+            list(made),
+        ).fetchall()
+        result, stale, touched = {}, [], []
+        for key, value, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                stale.append(key)
+                continue
+            result[made[key]] = pickle.loads(value)
+            if accessed < now - ACCESS_GRANULARITY:
+                touched.append(key)
+        if stale or touched:
+            self._write(lambda conn: self._after_read(conn, stale, touched, now))
+        return result
+
+    def _after_read(self, conn, stale, touched, now):
+        conn.executemany("DELETE FROM cache WHERE key = ? AND expires <= ?", [(key, now) for key in stale])
+        conn.executemany("UPDATE cache SET accessed = ? WHERE key = ?", [(now, key) for key in touched])
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._connection().execute(
+            "SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    # запись
+
+    def _store(self, conn, key, value, timeout, only_new=False):
+        now = time.time()
+        expires = self._expiry(timeout)
+        if only_new:
+            conn.execute("DELETE FROM cache WHERE key = ? AND expires <= ?", (key, now))
+            if conn.execute("SELECT 1 FROM cache WHERE key = ?", (key,)).fetchone():
+                return False
+        if expires is not None and expires <= now:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return True
+        data = pickle.dumps(value, self.pickle_protocol)
+        conn.execute(
+            "INSERT INTO cache (key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, "
+            "accessed = excluded.accessed, size = excluded.size",
+            (key, data, expires, now, len(data)),
+        )
+        return True
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self._write(lambda conn: (self._store(conn, key, value, timeout), self._cull(conn)))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+
+        def add(conn):
+            added = self._store(conn, key, value, timeout, only_new=True)
+            if added:
+                self._cull(conn)
+            return added
+        return self._write(add)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        items = [(self._key(key, version), value) for key, value in data.items()]
+
+        def store(conn):
+            for key, value in items:
+                self._store(conn, key, value, timeout)
+            self._cull(conn)
+        self._write(store)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        cursor = self._write(lambda conn: conn.execute(
+            "UPDATE cache SET expires = ?, accessed = ? WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (self._expiry(timeout), now, key, now),
+        ))
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+
+        def incr(conn):
+            row = conn.execute(
+                "SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, time.time())
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            data = pickle.dumps(value, self.pickle_protocol)
+            conn.execute("UPDATE cache SET value = ?, size = ? WHERE key = ?", (data, len(data), key))
+            return value
+        return self._write(incr)
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        self._write(lambda conn: conn.execute("DELETE FROM cache WHERE key = ?", (key,)))
+
+    def delete_many(self, keys, version=None):
+        keys = [(self._key(key, version),) for key in keys]
+        self._write(lambda conn: conn.executemany("DELETE FROM cache WHERE key = ?", keys))
+
+    def clear(self):
+        self._write(lambda conn: conn.execute("DELETE FROM cache"))
+
+    def close(self, **kwargs):
+        # соединения держим открытыми между запросами
+        pass
+
+    # вытеснение
+
+    def _cull(self, conn):
+        size, entries = conn.execute("SELECT size, entries FROM cache_totals").fetchone()
+        if size <= self.max_size and entries <= self._max_entries:
+            return
+        conn.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        size, entries = conn.execute("SELECT size, entries FROM cache_totals").fetchone()
+        if size <= self.max_size and entries <= self._max_entries:
+            return
+        if not self._cull_frequency:
+            conn.execute("DELETE FROM cache")
+            return
+        # удаляем долю давно не читавшихся записей, пока не уложимся в лимиты
+        while entries and (size > self.max_size or entries > self._max_entries):
+            count = max(1, entries // self._cull_frequency)
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)", (count,)
+            )
+            size, entries = conn.execute("SELECT size, entries FROM cache_totals").fetchone()
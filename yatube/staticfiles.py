@@ -0,0 +1,166 @@
+"""
+Статика для продакшена: имена с хешем содержимого и заранее сжатые копии.
+
+CompressedManifestStorage при collectstatic добавляет к именам файлов хеш
+(main.css -> main.3f2a1b.css, {% static %} выдаёт уже такие адреса) и
+рядом с каждым текстовым файлом кладёт сжатые копии: .gz и .br (пакет
+brotli из requirements.txt; без него собираются только .gz).
+
+StaticFilesMiddleware отдаёт файлы из STATIC_ROOT, не доходя до
+остальных middleware и представлений: выбирает сжатую копию по
+Accept-Encoding клиента, отдаёт файл через FileResponse (WSGI-сервер
+отправляет его через sendfile) и разрешает кешировать файлы с хешем в
+имени навсегда - при изменении файла изменится и его адрес.
+"""
+import gzip
+import json
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, StaticFilesStorage, staticfiles_storage
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - без brotli только .gz
+    brotli = None
+
+COMPRESSIBLE = (".css", ".js", ".map", ".json", ".svg", ".txt", ".html", ".xml", ".ico", ".ttf", ".otf", ".eot")
+# сжатая копия должна быть меньше оригинала хотя бы на столько
+MIN_SAVING = 0.05
+
+# расширение сжатой копии по значению Content-Encoding, в порядке предпочтения
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def immutable_max_age():
+    return getattr(settings, "STATIC_IMMUTABLE_MAX_AGE", 365 * 24 * 60 * 60)
+
+
+def mutable_max_age():
+    # файлы без хеша в имени (например, собранные до включения манифеста)
+    return getattr(settings, "STATIC_MAX_AGE", 60)
+
+
+def compressors():
+    yield ".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield ".br", lambda data: brotli.compress(data, quality=11)
+
+
+class CompressedManifestStorage(ManifestStaticFilesStorage):
+    # без манифеста (collectstatic не запускали) {% static %} отдаёт адрес без хеша
+    manifest_strict = False
+
+    def url(self, name, force=False):
+        try:
+            return super().url(name, force)
+        except ValueError:
+            # файла нет ни в манифесте, ни на диске - хеш посчитать не из чего
+            return StaticFilesStorage.url(self, name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        # css с url() обрабатываются в несколько проходов - сжимаем итоговые имена
+        final = {}
+        for name, hashed_name, done in super().post_process(paths, dry_run, **options):
+            if not isinstance(done, Exception):
+                final[name] = hashed_name
+            yield name, hashed_name, done
+        if dry_run:
+            return
+        for name, hashed_name in final.items():
+            if name.endswith(COMPRESSIBLE):
+                self.compress(name)
+                self.compress(hashed_name)
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, "rb") as source:
+            data = source.read()
+        for suffix, compress in compressors():
+            compressed = compress(data)
+            if len(compressed) <= len(data) * (1 - MIN_SAVING):
+                with open(path + suffix, "wb") as target:
+                    target.write(compressed)
+            elif os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def accepted_encodings(request):
+    header = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        # "gzip;q=0" - клиент явно отказывается от кодировки
+        if re.search(r"q\s*=\s*0(\.0*)?\s*$", params):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticFilesMiddleware:
+    """Отдаёт собранную статику из STATIC_ROOT со сжатием и долгим кешем."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._manifest = (None, frozenset())
+
+    def __call__(self, request):
+        prefix = settings.STATIC_URL
+        if settings.STATIC_ROOT and request.path.startswith(prefix) and request.method in ("GET", "HEAD"):
+            response = self.serve(request, request.path[len(prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def hashed_names(self):
+        """Имена с хешем из манифеста; манифест перечитывается после collectstatic."""
+        path = os.path.join(settings.STATIC_ROOT, getattr(staticfiles_storage, "manifest_name", "staticfiles.json"))
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return frozenset()
+        if self._manifest[0] != mtime:
+            with open(path, encoding="utf-8") as manifest:
+                names = frozenset(json.load(manifest).get("paths", {}).values())
+            self._manifest = (mtime, names)
+        return self._manifest[1]
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except ValueError:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        content_type, _ = mimetypes.guess_type(path)
+        encoding = None
+        if name.endswith(COMPRESSIBLE):
+            accepted = accepted_encodings(request)
+            for coding, suffix in ENCODINGS:
+                if coding in accepted and os.path.isfile(path + suffix):
+                    encoding, path = coding, path + suffix
+                    break
+        stat = os.stat(path)
+        if not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"), stat.st_mtime, stat.st_size):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(open(path, "rb"), content_type=content_type or "application/octet-stream")
+            response["Content-Length"] = stat.st_size
+        response["Last-Modified"] = http_date(stat.st_mtime)
+        if encoding:
+            response["Content-Encoding"] = encoding
+        if name.endswith(COMPRESSIBLE):
+            # ответ зависит от Accept-Encoding - кеши должны хранить варианты отдельно
+            response["Vary"] = "Accept-Encoding"
+        if name in self.hashed_names():
+            response["Cache-Control"] = "public, max-age=%d, immutable" % immutable_max_age()
+        else:
+            response["Cache-Control"] = "public, max-age=%d" % mutable_max_age()
+        return response
@@ -0,0 +1,64 @@
+"""
+Прогрев шаблонов при старте процесса.
+
+Кеширующий загрузчик (django.template.loaders.cached, включён при
+DEBUG = False) компилирует шаблон при первом обращении к нему, и первые
+запросы каждого воркера после выкладки платят за разбор base.html,
+post_item.html, nav.html и остальных. warm_up() заранее компилирует все
+шаблоны из каталогов загрузчиков - DIRS и templates/ приложений,
+вызывается из yatube/wsgi.py, если settings.TEMPLATE_WARMUP включён.
+"""
+import logging
+import os
+import time
+
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.template.loaders.cached import Loader as CachedLoader
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = (".html", ".txt", ".xml")
+
+
+def template_names(directory):
+    for root, _, files in os.walk(directory):
+        for file in sorted(files):
+            if file.endswith(EXTENSIONS):
+                yield os.path.relpath(os.path.join(root, file), directory).replace(os.sep, "/")
+
+
+def cached_template_names(engine):
+    """Имена шаблонов, которые попадут в кеширующие загрузчики движка."""
+    names = {}
+    for loader in engine.template_loaders:
+        if not isinstance(loader, CachedLoader):
+            continue
+        for inner in loader.loaders:
+            for directory in inner.get_dirs():
+                # одинаковые имена в разных каталогах - один шаблон, как при загрузке
+                names.update(dict.fromkeys(template_names(directory)))
+    return list(names)
+
+
+def warm_up():
+    """
+    Компилирует шаблоны в кеширующие загрузчики всех движков Django,
+    возвращает их число. Без кеширующего загрузчика (DEBUG) ничего не делает.
+    """
+    started = time.perf_counter()
+    compiled = 0
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for name in cached_template_names(engine.engine):
+            try:
+                engine.get_template(name)
+            except TemplateSyntaxError as error:
+                # сломанный шаблон покажет ошибку при отрисовке, старт не прерываем
+                logger.error("Не удалось скомпилировать шаблон %s: %s", name, error)
+                continue
+            compiled += 1
+    if compiled:
+        logger.info("Скомпилировано шаблонов: %s за %.0f мс", compiled, (time.perf_counter() - started) * 1000)
+    return compiled
@@ -52,6 +52,17 @@ urlpatterns += [
         path('about-spec/', views.flatpage, {'url': '/about-spec/'}, name='about-spec'),
 ]
 
+# гистограммы профилирования для Prometheus (yatube/profiling.py), по умолчанию выключены;
+# путь регистрируем до posts.urls, иначе его перехватит страница профиля
+if settings.PROFILING_METRICS_URL:
+        from yatube.profiling import metrics
+        urlpatterns += [path(settings.PROFILING_METRICS_URL, metrics, name='metrics')]
+
+# JSON API для мобильных клиентов (posts/api.py)
+urlpatterns += [
+        path("api/v1/", include("posts.api_urls")),
+]
+
 urlpatterns += [
     # обработчик для главной страницы ищем в urls.py приложения posts
         path("", include("posts.urls")),
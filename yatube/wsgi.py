@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# шаблоны компилируются до первого запроса, а не в первых запросах воркера
+if getattr(settings, 'TEMPLATE_WARMUP', False):
+    from yatube.template_warmup import warm_up
+    warm_up()